@@ -0,0 +1,67 @@
+"""并发会话压测：对比阻塞式调用（旧的 _arun 直接调用 _run）和真正的异步数据库路径
+
+每个会话依次执行 表注释/表结构/校验/查询 四个工具调用，查询是一个刻意放慢的递归 CTE。
+同时运行一个心跳协程统计事件循环的最大延迟，用来观察队头阻塞。
+
+用法: python -m benchmarks.bench_async_sessions
+"""
+import asyncio
+import time
+
+from agent.tools.test_to_sql_tools import SQLQueryTool, SQLQueryValidationTool, TableSchemaTool
+from agent.utils.db_utils import MySQLDataBaseManager
+from benchmarks.fixtures import create_sqlite_fixture
+
+SESSION_COUNTS = [1, 4, 16, 64]
+SLOW_QUERY = ("WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < 200000) "
+              "SELECT count(*), sum(i) FROM n")
+
+
+async def _heartbeat(stop: asyncio.Event, lags: list, interval: float = 0.005):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(time.perf_counter() - start - interval)
+
+
+async def _session(tools, blocking: bool):
+    schema_tool, validation_tool, query_tool = tools
+    calls = [
+        (schema_tool, {"table_names": ["t_0000", "t_0001"]}),
+        (validation_tool, {"query": SLOW_QUERY}),
+        (query_tool, {"query": SLOW_QUERY}),
+    ]
+    for tool, args in calls:
+        if blocking:
+            await asyncio.sleep(0)
+            tool.invoke(args)
+        else:
+            await tool.ainvoke(args)
+
+
+async def _run_mode(manager: MySQLDataBaseManager, sessions: int, blocking: bool):
+    tools = (TableSchemaTool(db_manager=manager), SQLQueryValidationTool(db_manager=manager),
+             SQLQueryTool(db_manager=manager))
+    stop, lags = asyncio.Event(), []
+    heartbeat = asyncio.create_task(_heartbeat(stop, lags))
+    start = time.perf_counter()
+    await asyncio.gather(*[_session(tools, blocking) for _ in range(sessions)])
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await heartbeat
+    return elapsed, max(lags, default=0.0)
+
+
+async def run():
+    connection = create_sqlite_fixture(10, rows_per_table=100)
+    manager = MySQLDataBaseManager(connection)
+    print(f"{'sessions':>8} | {'mode':>8} | {'seconds':>8} | {'sessions/s':>10} | {'max loop lag':>12}")
+    for sessions in SESSION_COUNTS:
+        for mode, blocking in (("blocking", True), ("async", False)):
+            elapsed, lag = await _run_mode(manager, sessions, blocking)
+            print(f"{sessions:>8} | {mode:>8} | {elapsed:>8.3f} | {sessions / elapsed:>10.1f} | {lag:>12.3f}")
+    await manager.aclose()
+
+
+if __name__ == "__main__":
+    asyncio.run(run())
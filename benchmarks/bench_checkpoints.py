@@ -0,0 +1,82 @@
+"""checkpoint 存储压测：大量会话多轮对话后，每一步的写入成本和磁盘占用
+
+用脚本化的假模型驱动 agent（每轮调用一次工具，工具返回约 2KB 文本），对比
+- full: 每一步保存完整的消息列表，不清理（相当于 InMemorySaver 的持久化方式）
+- delta: 增量编码 + 压缩，不清理
+- delta+retention: 增量编码 + 压缩，每个会话保留最近 20 个 checkpoint
+
+用法: python -m benchmarks.bench_checkpoints [--threads 200] [--turns 20]
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+from langchain.agents import create_agent
+
+from agent.utils.checkpoint_store import SQLiteCheckpointSaver
+from benchmarks.fake_models import ScriptedChatModel
+
+
+def lookup(keyword: str) -> str:
+    """返回与关键词相关的长文本"""
+    return "\n".join(f"{keyword} 第 {i} 行：部门、岗位、用户数量与最近一次登录时间的统计结果" for i in range(40))
+
+
+class _TimedSaver(SQLiteCheckpointSaver):
+    """记录每次 put 的耗时和所在轮次"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.put_seconds = {}
+        self.turn = 0
+
+    def put(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return super().put(*args, **kwargs)
+        finally:
+            self.put_seconds.setdefault(self.turn, []).append(time.perf_counter() - start)
+
+
+def run_variant(name: str, threads: int, turns: int, **options) -> None:
+    path = tempfile.mktemp(prefix="checkpoints_", suffix=".db")
+    saver = _TimedSaver(path, compact_interval=None, **options)
+    model = ScriptedChatModel(script={}, default_steps=[("lookup", {"keyword": "用户统计"})])
+    graph = create_agent(model, tools=[lookup], checkpointer=saver)
+    start = time.perf_counter()
+    try:
+        for turn in range(turns):
+            saver.turn = turn
+            for t in range(threads):
+                graph.invoke({"messages": [{"role": "user", "content": f"第 {turn} 个问题"}]},
+                             {"configurable": {"thread_id": f"thread-{t}"}})
+        elapsed = time.perf_counter() - start
+        stats = saver.compact()
+        first = statistics.mean(saver.put_seconds[0]) * 1000
+        last = statistics.mean(saver.put_seconds[turns - 1]) * 1000
+        print(f"  {name:<18} put turn 1 {first:>6.3f} ms  turn {turns} {last:>6.3f} ms  "
+              f"disk {stats['file_bytes'] / 1024 / 1024:>8.2f} MB  checkpoints {stats['checkpoints']:>6}  "
+              f"total {elapsed:>6.1f} s")
+    finally:
+        saver.close()
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="checkpoint 存储压测")
+    parser.add_argument("--threads", type=int, default=200)
+    parser.add_argument("--turns", type=int, default=20)
+    args = parser.parse_args()
+    print(f"checkpoints ({args.threads} threads x {args.turns} turns)")
+    run_variant("full", args.threads, args.turns, snapshot_interval=1, compress_min_bytes=1 << 62,
+                keep_last=None, thread_ttl=None)
+    run_variant("delta", args.threads, args.turns, keep_last=None, thread_ttl=None)
+    run_variant("delta+retention", args.threads, args.turns, keep_last=20, thread_ttl=None)
+
+
+if __name__ == "__main__":
+    main()
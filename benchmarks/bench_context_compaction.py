@@ -0,0 +1,79 @@
+"""上下文压缩压测：同一个会话连续追问时，每轮发给模型的 token 数（有 / 无压缩）
+
+每轮问题都查看表结构、检索表并执行查询，工具输出都留在会话历史中。
+无压缩时每次模型调用都要重新发送之前所有的表结构和查询结果，有压缩时较早的结果替换为摘要。
+
+用法: python -m benchmarks.bench_context_compaction [--turns 6] [--budget 8000]
+"""
+import argparse
+import os
+
+from langchain.agents import create_agent
+from langgraph.checkpoint.memory import InMemorySaver
+
+from agent.text_to_sql_agent import get_tools, system_prompt
+from agent.utils.context_compaction import ToolResultCompactionMiddleware
+from benchmarks.fake_models import ScriptedChatModel
+from benchmarks.fixtures import create_sqlite_fixture
+
+
+def _questions(turns: int) -> dict:
+    script = {}
+    for turn in range(turns):
+        tables = [f"t_{(turn * 3 + k) % 40:04d}" for k in range(3)]
+        question = f"第 {turn + 1} 个问题：比较 {'、'.join(tables)} 的金额"
+        script[question] = [
+            ("sql_db_table_schema", {"table_names": tables}),
+            ("sql_db_discover_tables", {"question": f"{tables[0]} 金额"}),
+            ("sql_db_query", {"query": f"SELECT id, name, status, amount, create_time FROM {tables[0]} LIMIT 60"}),
+        ]
+    return script
+
+
+class _PromptRecorder(ScriptedChatModel):
+    prompt_tokens: list = []
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        result = super()._generate(messages, stop, run_manager, **kwargs)
+        self.prompt_tokens.append(result.generations[0].message.usage_metadata["input_tokens"])
+        return result
+
+
+def run(turns: int, budget: int) -> None:
+    connection = create_sqlite_fixture(40, rows_per_table=80)
+    try:
+        tools = get_tools(connection)
+        script = _questions(turns)
+        print(f"context compaction ({turns} turns, budget {budget} tokens)")
+        for name, middleware in (("none", []), ("compaction", [ToolResultCompactionMiddleware(max_tokens=budget)])):
+            model = _PromptRecorder(script=script, prompt_tokens=[])
+            graph = create_agent(model, tools=tools, system_prompt=system_prompt, middleware=middleware,
+                                 checkpointer=InMemorySaver())
+            config = {"configurable": {"thread_id": name}}
+            per_turn = []
+            for question in script:
+                start = len(model.prompt_tokens)
+                messages = graph.invoke({"messages": [{"role": "user", "content": question}]}, config)["messages"]
+                saved = sum(m.response_metadata.get("context_compaction", {}).get("tokens_saved", 0)
+                            for m in messages[-4:] if m.type == "ai")
+                per_turn.append((sum(model.prompt_tokens[start:]), max(model.prompt_tokens[start:]), saved))
+            print(f"  {name}")
+            for i, (total, peak, saved) in enumerate(per_turn, 1):
+                print(f"    turn {i}  prompt tokens {total:>7}  largest call {peak:>6}  saved {saved:>6}")
+            print(f"    total prompt tokens {sum(t for t, _, _ in per_turn)}")
+            if middleware:
+                print(f"    {middleware[0].stats()}")
+    finally:
+        os.remove(connection[len("sqlite:///"):])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="上下文压缩压测")
+    parser.add_argument("--turns", type=int, default=6)
+    parser.add_argument("--budget", type=int, default=8000)
+    args = parser.parse_args()
+    run(args.turns, args.budget)
+
+
+if __name__ == "__main__":
+    main()
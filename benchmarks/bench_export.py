@@ -0,0 +1,69 @@
+"""大结果集导出压测：sql_db_query_export 流式写文件的耗时、峰值内存和返回给模型的文本长度
+
+对比一次性 fetchall 全部结果再返回表格文本（假设不受 TOP_K 限制）的做法。
+
+用法: python -m benchmarks.bench_export [--rows 500000] [--chunk-size 10000]
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+import tracemalloc
+
+from sqlalchemy import text
+
+from agent.tools.test_to_sql_tools import SQLQueryExportTool
+from agent.utils.db_options import ExportOptions
+from agent.utils.db_utils import MySQLDataBaseManager
+from agent.utils.format_utils import estimate_tokens
+from benchmarks.fixtures import create_sqlite_fixture
+
+QUERY = "SELECT id, name, status, amount, create_time FROM t_0000"
+
+
+def _measure(func):
+    # tracemalloc 会明显拖慢执行，耗时和峰值内存分两次测量
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def run(rows: int, chunk_size: int) -> None:
+    connection = create_sqlite_fixture(1, rows_per_table=rows)
+    export_dir = tempfile.mkdtemp(prefix="exports_")
+    try:
+        manager = MySQLDataBaseManager(connection, export=ExportOptions(export_dir, chunk_size=chunk_size))
+        tool = SQLQueryExportTool(db_manager=manager, export_format="csv")
+        print(f"export ({rows} rows, chunk size {chunk_size})")
+
+        def fetch_all():
+            with manager.engine.connect() as conn:
+                result = conn.execute(text(QUERY))
+                return "\n".join(str(tuple(row)) for row in result.fetchall())
+
+        for name, func in (("fetchall", fetch_all), ("export", lambda: tool.invoke({"query": QUERY}))):
+            output, elapsed, peak = _measure(func)
+            print(f"  {name:<9} {elapsed:>6.2f} s  peak memory {peak / 1024 / 1024:>7.1f} MB  "
+                  f"output {estimate_tokens(output):>9} tokens")
+        print(output)
+    finally:
+        shutil.rmtree(export_dir, ignore_errors=True)
+        os.remove(connection[len("sqlite:///"):])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="大结果集导出压测")
+    parser.add_argument("--rows", type=int, default=500000)
+    parser.add_argument("--chunk-size", type=int, default=10000)
+    args = parser.parse_args()
+    run(args.rows, args.chunk_size)
+
+
+if __name__ == "__main__":
+    main()
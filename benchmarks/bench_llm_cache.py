@@ -0,0 +1,91 @@
+"""模型调用缓存压测：多个会话同时提出问题时，实际发往模型的调用数、总耗时和服务端限流错误数
+
+用离线桩模型模拟服务端：每次调用有固定延迟，同时进行的调用超过 provider_limit 时返回限流错误。
+对比直接调用模型与经过 CachedChatModel（缓存 + 请求合并 + 限流）两种情况。
+
+用法: python -m benchmarks.bench_llm_cache [--sessions 64] [--questions 8] [--latency 0.2] [--provider-limit 8]
+"""
+import argparse
+import asyncio
+import time
+
+from langchain_core.messages import HumanMessage, SystemMessage
+
+from agent.utils.llm_cache import StubChatModel, wrap_chat_model
+
+
+class RateLimitError(Exception):
+    pass
+
+
+class LimitedStubChatModel(StubChatModel):
+    """同时进行的调用超过 provider_limit 时抛出限流错误的桩模型"""
+
+    provider_limit: int = 8
+    rejected: int = 0
+    active: int = 0
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        self.active += 1
+        try:
+            if self.active > self.provider_limit:
+                self.rejected += 1
+                raise RateLimitError("429 Too Many Requests")
+            return await super()._agenerate(messages, stop, run_manager, **kwargs)
+        finally:
+            self.active -= 1
+
+
+async def _session(llm, questions, index: int, unique: bool, retries: int = 3) -> tuple:
+    errors = failed = 0
+    for question in questions[index % len(questions):] + questions[:index % len(questions)]:
+        if unique:
+            question = f"{question}（会话 {index}）"
+        messages = [SystemMessage("你是一个 SQL 助手"), HumanMessage(question)]
+        for attempt in range(retries + 1):
+            try:
+                await llm.ainvoke(messages)
+                break
+            except RateLimitError:
+                errors += 1
+                # 客户端退避重试
+                await asyncio.sleep(0.05 * 2 ** attempt)
+        else:
+            failed += 1
+    return errors, failed
+
+
+async def _run(llm, sessions: int, questions, unique: bool) -> tuple:
+    start = time.perf_counter()
+    results = await asyncio.gather(*[_session(llm, questions, i, unique) for i in range(sessions)])
+    return time.perf_counter() - start, sum(e for e, _ in results), sum(f for _, f in results)
+
+
+def run(sessions: int, question_count: int, latency: float, provider_limit: int) -> None:
+    questions = [f"统计第 {i} 类订单上个月的金额" for i in range(question_count)]
+    print(f"llm cache ({sessions} sessions x {question_count} questions, latency {latency}s, "
+          f"provider limit {provider_limit})")
+    # unique：每个会话的问题都不同，缓存和请求合并不起作用，只有限流
+    for unique in (False, True):
+        print(f"  {'unique' if unique else 'shared'} questions")
+        for name in ("direct", "cached"):
+            model = LimitedStubChatModel(latency=latency, provider_limit=provider_limit)
+            llm = model if name == "direct" else \
+                wrap_chat_model(model, cache_path=None, max_concurrency=provider_limit)
+            seconds, errors, failed = asyncio.run(_run(llm, sessions, questions, unique))
+            print(f"    {name:<7} {seconds:>6.2f} s  model calls {model.calls:>5}  rate-limit errors {errors:>5}  "
+                  f"failed requests {failed:>4}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="模型调用缓存压测")
+    parser.add_argument("--sessions", type=int, default=64)
+    parser.add_argument("--questions", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--provider-limit", type=int, default=8)
+    args = parser.parse_args()
+    run(args.sessions, args.questions, args.latency, args.provider_limit)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+"""统计不同输出格式下工具输出的字符数和 token 数
+
+token 数同时给出 format_utils.estimate_tokens 的估算值，以及安装了 tiktoken 时 cl100k_base 编码的精确值。
+
+用法: python -m benchmarks.bench_output_formats
+"""
+from agent.tools.test_to_sql_tools import ListTablesTool, SQLQueryTool, TableSchemaTool
+from agent.utils.db_options import GuardOptions
+from agent.utils.db_utils import MySQLDataBaseManager
+from agent.utils.format_utils import RESULT_FORMATS, SCHEMA_FORMATS, TABLE_LIST_FORMATS, estimate_tokens
+from benchmarks.fixtures import create_sqlite_fixture
+
+try:
+    import tiktoken
+
+    _encoding = tiktoken.get_encoding("cl100k_base")
+except Exception:  # tiktoken 未安装或无法下载编码表
+    _encoding = None
+
+QUERY = "SELECT id, name, status, amount FROM t_0001 ORDER BY id"
+
+
+def _report(tool: str, output_format: str, output: str):
+    exact = len(_encoding.encode(output)) if _encoding is not None else "-"
+    print(f"{tool:>14} | {output_format:>8} | {len(output):>7} | {estimate_tokens(output):>10} | {exact:>8}")
+
+
+def run():
+    connection = create_sqlite_fixture(50, rows_per_table=100)
+    manager = MySQLDataBaseManager(connection, guard=GuardOptions(max_result_rows=None, max_result_bytes=None))
+    print(f"{'tool':>14} | {'format':>8} | {'chars':>7} | {'est tokens':>10} | {'tiktoken':>8}")
+    for output_format in TABLE_LIST_FORMATS:
+        _report("list_tables", output_format, ListTablesTool(db_manager=manager, output_format=output_format).invoke({}))
+    tables = [f"t_{i:04d}" for i in range(10)]
+    for output_format in SCHEMA_FORMATS:
+        tool = TableSchemaTool(db_manager=manager, output_format=output_format)
+        _report("table_schema", output_format, tool.invoke({"table_names": tables}))
+    for output_format in RESULT_FORMATS:
+        tool = SQLQueryTool(db_manager=manager, output_format=output_format, max_column_width=32)
+        _report("query", output_format, tool.invoke({"query": QUERY}))
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,78 @@
+"""成本检查、执行超时和取消：在本地 SQLite 测试库上用一个刻意昂贵的笛卡尔积查询验证
+
+- reject: 成本检查根据执行计划估算行数直接拒绝，数据库不执行查询
+- timeout: 关闭成本检查、设置执行时间上限，查询在上限附近被中断
+- cancel: 异步调用被放弃（asyncio.wait_for 超时）时中断查询，连接池随后可以立即复用
+
+用法: python -m benchmarks.bench_query_guard [--rows 100000]
+"""
+import argparse
+import asyncio
+import os
+import time
+
+from agent.utils.db_options import GuardOptions
+from agent.utils.db_utils import MySQLDataBaseManager
+from benchmarks.fixtures import create_sqlite_fixture
+
+EXPENSIVE_QUERY = "SELECT count(*) FROM t_0000 a CROSS JOIN t_0001 b WHERE a.name <> b.name"
+CHEAP_QUERY = "SELECT count(*) FROM t_0001 WHERE id < 100"
+
+
+def _timed(fn):
+    start = time.perf_counter()
+    try:
+        result = fn()
+    except ValueError as e:
+        result = e
+    return time.perf_counter() - start, result
+
+
+def run(rows: int) -> None:
+    connection = create_sqlite_fixture(2, rows_per_table=rows)
+    try:
+        guarded = MySQLDataBaseManager(connection, guard=GuardOptions(cost_guard="reject", max_estimated_rows=1_000_000))
+        seconds, result = _timed(lambda: guarded.execute_query(EXPENSIVE_QUERY))
+        assert isinstance(result, ValueError) and "查询成本过高" in str(result), result
+        print(f"  reject   {seconds * 1000:>9.1f} ms  {result}")
+        seconds, result = _timed(lambda: guarded.execute_query(CHEAP_QUERY))
+        assert not isinstance(result, ValueError), result
+        print(f"  cheap    {seconds * 1000:>9.1f} ms  {result}")
+
+        limited = MySQLDataBaseManager(connection, guard=GuardOptions(statement_timeout=1.0))
+        seconds, result = _timed(lambda: limited.execute_query(EXPENSIVE_QUERY))
+        assert isinstance(result, ValueError) and "已被取消" in str(result), result
+        assert seconds < 2.0, seconds
+        print(f"  timeout  {seconds * 1000:>9.1f} ms  {result}")
+
+        async def cancel():
+            manager = MySQLDataBaseManager(connection)
+            start = time.perf_counter()
+            try:
+                await asyncio.wait_for(manager.aexecute_query(EXPENSIVE_QUERY), timeout=0.5)
+            except asyncio.TimeoutError:
+                pass
+            cancelled_at = time.perf_counter() - start
+            # 被中断的查询释放了数据库，后续查询不需要等待昂贵查询执行完
+            result = await manager.aexecute_query(CHEAP_QUERY)
+            followup = time.perf_counter() - start - cancelled_at
+            stats = manager.get_pool_stats()
+            await manager.aclose()
+            return cancelled_at, followup, result, stats
+
+        cancelled_at, followup, result, stats = asyncio.run(cancel())
+        assert followup < 1.0, followup
+        print(f"  cancel   {cancelled_at * 1000:>9.1f} ms  follow-up query {followup * 1000:.1f} ms  {result}")
+    finally:
+        os.remove(connection[len("sqlite:///"):])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="成本检查与执行超时压测")
+    parser.add_argument("--rows", type=int, default=100_000)
+    args = parser.parse_args()
+    run(args.rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""只读副本路由压测：用多个本地 SQLite 文件模拟主库和副本
+
+每个节点用一把锁串行处理语句、每条语句占用固定时间，模拟单个数据库实例的处理能力。
+对比只用主库和路由到副本时的并发查询吞吐，然后在压测过程中让一个副本复制延迟超限、
+另一个副本宕机，统计各节点承担的请求数和失败的请求数。
+
+用法: python -m benchmarks.bench_replicas [--replicas 3] [--queries 600] [--concurrency 16] [--service-ms 2]
+"""
+import argparse
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import event, text
+
+from agent.utils.db_options import RoutingOptions
+from agent.utils.db_utils import MySQLDataBaseManager
+from benchmarks.fixtures import create_sqlite_fixture
+
+QUERY = "SELECT status, count(*), sum(amount) FROM t_0001 GROUP BY status"
+
+
+def simulate_capacity(engine, service_time: float) -> None:
+    # 同一个节点上的语句串行执行，每条占用 service_time 秒；以 "--" 开头的是 pragma 内部语句，不计入
+    lock = threading.Lock()
+
+    def serve(statement):
+        if not statement.startswith("--"):
+            with lock:
+                time.sleep(service_time)
+
+    @event.listens_for(engine, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        dbapi_connection.set_trace_callback(serve)
+
+
+def lag_probe(connection):
+    # 副本文件中的 replica_lag 表记录模拟的复制延迟（秒）
+    return connection.execute(text("SELECT seconds FROM replica_lag")).scalar()
+
+
+def create_replicas(primary_path: str, count: int):
+    urls = []
+    for i in range(count):
+        path = f"{primary_path}.replica{i}"
+        shutil.copy(primary_path, path)
+        with sqlite3.connect(path) as connection:
+            connection.execute("CREATE TABLE replica_lag (seconds REAL)")
+            connection.execute("INSERT INTO replica_lag VALUES (0)")
+        # 只读模式打开：文件不存在时连接失败，用于模拟副本宕机
+        urls.append(f"sqlite:///file:{path}?mode=ro&uri=true")
+    return urls
+
+
+def run_load(manager: MySQLDataBaseManager, queries: int, concurrency: int, during=None):
+    errors = 0
+
+    def one(i):
+        nonlocal errors
+        if during is not None and i == queries // 3:
+            during()
+        try:
+            manager.execute_query(QUERY)
+        except ValueError:
+            errors += 1
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as executor:
+        list(executor.map(one, range(queries)))
+    return time.perf_counter() - start, errors
+
+
+def run(replica_count: int, queries: int, concurrency: int, service_time: float) -> None:
+    primary = create_sqlite_fixture(5, rows_per_table=2000)
+    primary_path = primary[len("sqlite:///"):]
+    replicas = create_replicas(primary_path, replica_count)
+    try:
+        print(f"{queries} queries, concurrency {concurrency}, {service_time * 1000:.0f} ms per statement per node")
+        # 结果缓存关闭（默认），每次查询都会访问数据库
+        primary_only = MySQLDataBaseManager(primary)
+        simulate_capacity(primary_only.engine, service_time)
+        seconds, errors = run_load(primary_only, queries, concurrency)
+        print(f"  primary only        {seconds:6.2f} s  {queries / seconds:7.1f} q/s  errors {errors}")
+
+        routed = MySQLDataBaseManager(primary, routing=RoutingOptions(replicas, max_lag=5, check_interval=0.1,
+                                                                      lag_probe=lag_probe))
+        for node in [routed.router.primary, *routed.router.replicas]:
+            if node.role == "replica":
+                simulate_capacity(node.engine, service_time)
+        seconds, errors = run_load(routed, queries, concurrency)
+        print(f"  {replica_count} replicas          {seconds:6.2f} s  {queries / seconds:7.1f} q/s  errors {errors}")
+
+        def degrade():
+            # 第一个副本复制延迟超限，第二个副本宕机（文件消失、连接池中的连接被丢弃）
+            with sqlite3.connect(f"{primary_path}.replica0") as connection:
+                connection.execute("UPDATE replica_lag SET seconds = 60")
+            os.rename(f"{primary_path}.replica1", f"{primary_path}.replica1.down")
+            routed.router.replicas[1].engine.dispose()
+
+        before = [node["requests"] for node in routed.get_replica_stats()]
+        seconds, errors = run_load(routed, queries, concurrency, during=degrade if replica_count >= 3 else None)
+        print(f"  degraded mid-run    {seconds:6.2f} s  {queries / seconds:7.1f} q/s  errors {errors}")
+        for node, previous in zip(routed.get_replica_stats(), before):
+            state = "healthy" if node["healthy"] else "down"
+            print(f"    {node['role']:<8} {node['requests'] - previous:>5} requests  {state:<8} lag {node['lag']}")
+        routed.router.close()
+    finally:
+        for path in [primary_path] + [f"{primary_path}.replica{i}" for i in range(replica_count)] + \
+                [f"{primary_path}.replica1.down"]:
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="只读副本路由压测")
+    parser.add_argument("--replicas", type=int, default=3)
+    parser.add_argument("--queries", type=int, default=600)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--service-ms", type=float, default=2.0)
+    args = parser.parse_args()
+    run(args.replicas, args.queries, args.concurrency, args.service_ms / 1000)
+
+
+if __name__ == "__main__":
+    main()
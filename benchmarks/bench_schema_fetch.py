@@ -0,0 +1,91 @@
+"""并发读取表结构压测：模拟每条语句的网络往返延迟，对比顺序读取和并发读取的冷启动耗时，
+并对比回答问题前获取表信息需要的工具调用次数（列表 + 表结构 vs 一次 discover）
+
+用法: python -m benchmarks.bench_schema_fetch [--tables 200] [--latency-ms 5]
+"""
+import argparse
+import asyncio
+import os
+import time
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+from agent.tools.test_to_sql_tools import DiscoverTablesTool, ListTablesTool, TableSchemaTool
+from agent.utils.db_utils import MySQLDataBaseManager
+from benchmarks.fixtures import create_sqlite_fixture
+
+QUESTION = "t_0042 每种状态的金额合计"
+
+
+@contextmanager
+def inject_latency(engines, seconds: float):
+    # 本地 SQLite 没有网络往返：在驱动执行每条语句时（驱动所在的线程中）等待固定时间来模拟远程数据库，
+    # 异步驱动在自己的后台线程中等待，不会阻塞事件循环；以 "--" 开头的是 pragma 表值函数内部的语句，不计入
+    def on_connect(dbapi_connection, connection_record):
+        sqlite_connection = getattr(dbapi_connection, "driver_connection", dbapi_connection)
+        sqlite_connection = getattr(sqlite_connection, "_conn", sqlite_connection)
+        sqlite_connection.set_trace_callback(
+            lambda statement: None if statement.startswith("--") else time.sleep(seconds))
+
+    for engine in engines:
+        event.listen(engine, "connect", on_connect)
+    try:
+        yield
+    finally:
+        # 引擎由注册表按连接串共享，测量结束后移除监听（已注入延迟的连接由调用方释放）
+        for engine in engines:
+            event.remove(engine, "connect", on_connect)
+
+
+def _measure_sync(manager: MySQLDataBaseManager) -> float:
+    manager.schema_cache.invalidate()
+    start = time.perf_counter()
+    manager.get_table_schema(None)
+    return time.perf_counter() - start
+
+
+async def _measure_async(manager: MySQLDataBaseManager) -> float:
+    manager.schema_cache.invalidate()
+    start = time.perf_counter()
+    await manager.aget_table_schema(None)
+    elapsed = time.perf_counter() - start
+    await manager.aclose()
+    return elapsed
+
+
+def run(table_count: int, latency: float) -> None:
+    connection = create_sqlite_fixture(table_count)
+    try:
+        print(f"cold schema fetch of {table_count} tables, {latency * 1000:.0f} ms per statement")
+        print(f"{'mode':>10} | {'batch':>5} | {'workers':>7} | {'sync s':>7} | {'async s':>7}")
+        for mode, bulk, batch_size in (("inspector", False, 1), ("bulk", True, 500), ("bulk", True, 50)):
+            for workers in (1, 4, 8):
+                manager = MySQLDataBaseManager(connection, bulk_introspection=bulk, schema_fetch_workers=workers,
+                                               schema_fetch_batch_size=batch_size)
+                with inject_latency([manager.engine, manager.async_engine.sync_engine], latency):
+                    sync_seconds = _measure_sync(manager)
+                    async_seconds = asyncio.run(_measure_async(manager))
+                print(f"{mode:>10} | {batch_size:>5} | {workers:>7} | {sync_seconds:>7.3f} | {async_seconds:>7.3f}")
+
+        manager = MySQLDataBaseManager(connection)
+        tables = ListTablesTool(db_manager=manager, output_format="compact").invoke({})
+        schema = TableSchemaTool(db_manager=manager, output_format="ddl").invoke({"table_names": ["t_0042", "t_0041"]})
+        discovery = DiscoverTablesTool(db_manager=manager, top_k=2).invoke({"question": QUESTION})
+        print("tool calls (model round trips) before the first query:")
+        print(f"  list + schema   2 calls, {len(tables) + len(schema)} chars")
+        print(f"  discover        1 call,  {len(discovery)} chars")
+    finally:
+        os.remove(connection[len("sqlite:///"):])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="并发读取表结构压测")
+    parser.add_argument("--tables", type=int, default=200)
+    parser.add_argument("--latency-ms", type=float, default=5.0)
+    args = parser.parse_args()
+    run(args.tables, args.latency_ms / 1000)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,32 @@
+"""对比逐表 Inspector 和批量 information_schema 两种表结构读取方式的往返次数与耗时
+
+用法: python -m benchmarks.bench_schema_introspection
+"""
+import time
+
+from agent.utils.db_utils import MySQLDataBaseManager
+from benchmarks.fixtures import count_round_trips, create_sqlite_fixture
+
+TABLE_COUNTS = [10, 100, 500, 1500]
+
+
+def run():
+    print(f"{'tables':>8} | {'mode':>10} | {'round trips':>11} | {'seconds':>8}")
+    for table_count in TABLE_COUNTS:
+        connection = create_sqlite_fixture(table_count)
+        outputs = {}
+        for mode, bulk in (("inspector", False), ("bulk", True)):
+            manager = MySQLDataBaseManager(connection, bulk_introspection=bulk)
+            # 两种模式共享同一个进程级缓存，测量前先清空
+            manager.schema_cache.invalidate()
+            start = time.perf_counter()
+            with count_round_trips(manager.engine) as counter:
+                outputs[mode] = manager.get_table_schema(None)
+            elapsed = time.perf_counter() - start
+            print(f"{table_count:>8} | {mode:>10} | {counter.count:>11} | {elapsed:>8.3f}")
+            manager.engine.dispose()
+        assert outputs["inspector"] == outputs["bulk"], "批量读取的输出与逐表读取不一致"
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,88 @@
+"""语义缓存压测：同一批问题的不同问法经过 text_to_sql_agent 的图，统计命中率、模型调用次数和节省的时间
+
+模型使用脚本化的假模型，每次调用模拟 --latency 秒的往返延迟（glm-4-flash 一次调用通常在 1 秒左右）。
+每组问题的第一个问法走完整的工具循环并写入缓存，之后的改写问法应当命中缓存；
+数字或对立词（最大/最小等）不同的问题必须走完整的工具循环。
+
+用法: python -m benchmarks.bench_semantic_cache [--latency 0.2]
+"""
+import argparse
+import os
+import statistics
+import time
+
+from langchain.agents import create_agent
+
+from agent.text_to_sql_agent import get_tools, system_prompt
+from agent.utils.semantic_cache import SemanticQueryCache, build_cached_graph
+from benchmarks.fake_models import ScriptedChatModel
+from benchmarks.fixtures import create_sqlite_fixture
+
+# (问法列表, SQL)：同一组中的问法语义相同
+QUESTION_GROUPS = [
+    (["统计 t_0001 表中每个 status 的 amount 总和",
+      "统计一下 t_0001 表中每个 status 的 amount 总和",
+      "请统计t_0001表中每个status的amount总和"],
+     "SELECT status, sum(amount) FROM t_0001 GROUP BY status"),
+    (["t_0002 表一共有多少条记录",
+      "t_0002 表一共有多少条记录？",
+      "请问 t_0002 表一共有多少条记录"],
+     "SELECT count(*) FROM t_0002"),
+    (["查询 t_0003 表中 amount 最大的 5 条记录的 name",
+      "查询t_0003表中amount最大的5条记录的name"],
+     "SELECT name FROM t_0003 ORDER BY amount DESC LIMIT 5"),
+]
+# 与上面的问题只有数字或对立词不同，不能命中
+DIFFERENT_QUESTIONS = [
+    ("查询 t_0003 表中 amount 最大的 10 条记录的 name", "SELECT name FROM t_0003 ORDER BY amount DESC LIMIT 10"),
+    ("查询 t_0003 表中 amount 最小的 5 条记录的 name", "SELECT name FROM t_0003 ORDER BY amount LIMIT 5"),
+]
+
+
+def _script(question: str, sql: str) -> list:
+    return [("sql_db_discover_tables", {"question": question}), ("sql_db_query_checked", {"query": sql})]
+
+
+def run(latency: float, threshold: float) -> None:
+    connection = create_sqlite_fixture(10, rows_per_table=50)
+    try:
+        questions = [(q, sql, i == 0) for group, sql in QUESTION_GROUPS for i, q in enumerate(group)]
+        questions.extend((q, sql, True) for q, sql in DIFFERENT_QUESTIONS)
+        model = ScriptedChatModel(script={q: _script(q, sql) for q, sql, _ in questions}, latency=latency)
+        tools = get_tools(connection)
+        cache = SemanticQueryCache(threshold=threshold)
+        graph = build_cached_graph(create_agent(model, tools=tools, system_prompt=system_prompt),
+                                   tools[0].db_manager, cache)
+
+        timings = {True: [], False: []}
+        print(f"semantic cache (threshold {threshold}, model latency {latency * 1000:.0f} ms)")
+        # 先按组回答第一个问法写入缓存，再回答其余问法
+        for q, sql, expect_miss in sorted(questions, key=lambda item: not item[2]):
+            calls = model.calls
+            start = time.perf_counter()
+            messages = graph.invoke({"messages": [{"role": "user", "content": q}]})["messages"]
+            seconds = time.perf_counter() - start
+            hit = "semantic_cache" in messages[-1].response_metadata
+            assert hit != expect_miss, (q, hit)
+            timings[hit].append(seconds)
+            print(f"  {'hit ' if hit else 'miss'}  {seconds * 1000:>8.1f} ms  llm calls {model.calls - calls}  {q}")
+
+        stats = cache.stats()
+        print(f"  hit rate {stats['hit_rate']:.0%} ({stats['hits']}/{stats['hits'] + stats['misses']})  "
+              f"p50 miss {statistics.median(timings[False]) * 1000:.1f} ms  "
+              f"p50 hit {statistics.median(timings[True]) * 1000:.1f} ms  "
+              f"saved {stats['saved_seconds']:.2f} s (avg {stats['avg_saved_seconds'] * 1000:.1f} ms per hit)")
+    finally:
+        os.remove(connection[len("sqlite:///"):])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="语义缓存压测")
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--threshold", type=float, default=0.9)
+    args = parser.parse_args()
+    run(args.latency, args.threshold)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""冷启动压测：导入 agent.text_to_sql_agent 的耗时，以及新进程从启动到第一次回答的耗时
+
+每个测量都在新的 Python 进程中进行：
+- import: 导入入口模块（延迟构建 / 导入时立即构建）
+- first answer: 导入、构建 agent 并回答一个问题（无快照 / 从预热生成的表结构快照恢复），
+  同时统计第一次请求发往数据库的语句数量
+
+用法: python -m benchmarks.bench_startup [--tables 500] [--repeat 3]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.fixtures import create_sqlite_fixture
+
+QUESTION = "统计 t 0001 表中每个 status 的 amount 总和"
+QUERY = "SELECT status, count(*), sum(amount) FROM t_0001 GROUP BY status ORDER BY status"
+
+
+def _child_import() -> dict:
+    start = time.perf_counter()
+    import agent.text_to_sql_agent  # noqa: F401
+    return {"seconds": time.perf_counter() - start}
+
+
+def _child_first_answer(connection: str) -> dict:
+    start = time.perf_counter()
+    from langchain.agents import create_agent
+
+    from agent.text_to_sql_agent import get_tools, system_prompt
+    from benchmarks.fake_models import ScriptedChatModel
+    from benchmarks.fixtures import count_round_trips
+
+    tools = get_tools(connection)
+    model = ScriptedChatModel(script={QUESTION: [
+        ("sql_db_discover_tables", {"question": QUESTION}),
+        ("sql_db_query_checked", {"query": QUERY}),
+    ]})
+    graph = create_agent(model, tools=tools, system_prompt=system_prompt)
+    request_start = time.perf_counter()
+    with count_round_trips(tools[0].db_manager.engine) as counter:
+        answer = graph.invoke({"messages": [{"role": "user", "content": QUESTION}]})["messages"][-1].content
+    end = time.perf_counter()
+    return {"seconds": end - start, "request_seconds": end - request_start, "round_trips": counter.count,
+            "answer_chars": len(answer)}
+
+
+def _run_child(args: list, env: dict) -> dict:
+    output = subprocess.run([sys.executable, "-m", "benchmarks.bench_startup", "--child", *args],
+                            env={**os.environ, **env}, capture_output=True, text=True, check=True).stdout
+    # 日志也会输出到标准输出，结果在最后一行
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def _summarize(name: str, results: list) -> None:
+    seconds = statistics.median(r["seconds"] for r in results)
+    extra = ""
+    if "round_trips" in results[0]:
+        request_seconds = statistics.median(r["request_seconds"] for r in results)
+        extra = f"  first request {request_seconds * 1000:>8.1f} ms  round trips {results[0]['round_trips']:>5}"
+    print(f"  {name:<30} p50 {seconds * 1000:>9.1f} ms{extra}")
+
+
+def run(table_count: int, repeat: int) -> None:
+    connection = create_sqlite_fixture(table_count, rows_per_table=20)
+    snapshot_path = tempfile.mktemp(prefix="schema_snapshot_", suffix=".pkl")
+    try:
+        print(f"startup ({table_count} tables)")
+        for name, lazy in (("import.lazy", "true"), ("import.eager", "false")):
+            _summarize(name, [_run_child(["import"], {"AGENT_LAZY_INIT": lazy}) for _ in range(repeat)])
+
+        _summarize("first_answer.cold", [_run_child(["first_answer", connection], {"SCHEMA_SNAPSHOT_PATH": ""})
+                                         for _ in range(repeat)])
+
+        # 预热一次生成快照，之后的新进程从快照恢复
+        from agent.utils.db_utils import MySQLDataBaseManager
+        MySQLDataBaseManager(connection).warm_up(snapshot_path)
+        _summarize("first_answer.snapshot", [_run_child(["first_answer", connection],
+                                                        {"SCHEMA_SNAPSHOT_PATH": snapshot_path})
+                                             for _ in range(repeat)])
+    finally:
+        os.remove(connection[len("sqlite:///"):])
+        if os.path.exists(snapshot_path):
+            os.remove(snapshot_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="冷启动压测")
+    parser.add_argument("--tables", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--child", nargs="+")
+    args = parser.parse_args()
+    if args.child:
+        mode, *rest = args.child
+        result = _child_import() if mode == "import" else _child_first_answer(*rest)
+        print(json.dumps(result))
+        return
+    run(args.tables, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
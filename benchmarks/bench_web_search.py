@@ -0,0 +1,60 @@
+"""互联网搜索压测：研究型问题每个需要搜索多个查询，热门查询在不同问题间重复
+
+对比逐个串行搜索且不缓存（原来的做法）与 WebSearcher 批量并行搜索 + 缓存的总耗时、后端调用数和缓存命中率。
+使用离线的 FakeSearchBackend，查询按 Zipf 分布从查询池中抽取。
+
+用法: python -m benchmarks.bench_web_search [--questions 40] [--fanout 4] [--pool 60] [--latency 0.2] [--workers 4]
+"""
+import argparse
+import random
+import time
+
+from agent.utils.web_search import FakeSearchBackend, WebSearcher, format_search_batch
+
+
+def _workload(questions: int, fanout: int, pool: int, seed: int = 42) -> list:
+    rnd = random.Random(seed)
+    queries = [f"主题{i} 进展 数据" for i in range(pool)]
+    weights = [1 / (i + 1) for i in range(pool)]
+    return [rnd.choices(queries, weights, k=fanout) for _ in range(questions)]
+
+
+def run(questions: int, fanout: int, pool: int, latency: float, workers: int) -> None:
+    workload = _workload(questions, fanout, pool)
+    print(f"web search ({questions} questions x {fanout} queries, pool {pool}, latency {latency}s, workers {workers})")
+
+    backend = FakeSearchBackend(latency=latency)
+    start = time.perf_counter()
+    for batch in workload:
+        for query in batch:
+            backend(query)
+    print(f"  sequential  {time.perf_counter() - start:>6.2f} s  backend calls {backend.calls:>4}")
+
+    backend = FakeSearchBackend(latency=latency)
+    searcher = WebSearcher(backend, max_workers=workers, timeout=5.0)
+    start = time.perf_counter()
+    snippets = 0
+    for batch in workload:
+        result = searcher.search_many(batch)
+        snippets += len(result.results)
+        format_search_batch(result)
+    stats = searcher.stats()
+    print(f"  batched     {time.perf_counter() - start:>6.2f} s  backend calls {backend.calls:>4}  "
+          f"hit rate {stats['hit_rate']:.0%}  max concurrent calls {backend.max_active}  "
+          f"snippets per question {snippets / questions:.1f}")
+    searcher.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="互联网搜索压测")
+    parser.add_argument("--questions", type=int, default=40)
+    parser.add_argument("--fanout", type=int, default=4)
+    parser.add_argument("--pool", type=int, default=60)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+    run(args.questions, args.fanout, args.pool, args.latency, args.workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+from agent.utils.format_utils import estimate_tokens
+
+
+class ScriptedChatModel(BaseChatModel):
+    """按脚本调用工具的离线聊天模型，用于在没有网络的情况下驱动 agent
+
+    script 将问题映射为依次执行的工具调用 [(工具名, 参数), ...]，模型根据本轮对话中
+    已经收到的 ToolMessage 数量决定下一步：还有未执行的工具调用时返回 tool_calls，
+    否则返回基于最后一个工具结果的最终答案。模型本身无状态，可以被多个会话并发使用。
+    """
+
+    script: Dict[str, List[tuple]]
+    default_steps: List[tuple] = []
+    # 每次调用的模拟延迟（秒），用于估算真实模型往返的耗时
+    latency: float = 0.0
+    # 调用次数
+    calls: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted"
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None,
+                  **kwargs: Any) -> ChatResult:
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        # 找到最后一个用户问题，统计其后的工具结果数量
+        last_human = max(i for i, m in enumerate(messages) if isinstance(m, HumanMessage))
+        question = messages[last_human].content
+        tool_results = [m for m in messages[last_human:] if isinstance(m, ToolMessage)]
+        steps = self.script.get(question, self.default_steps)
+
+        if len(tool_results) < len(steps):
+            name, args = steps[len(tool_results)]
+            message = AIMessage(content="", tool_calls=[{"name": name, "args": args, "id": f"call_{uuid.uuid4().hex[:12]}"}])
+        else:
+            last = tool_results[-1].content if tool_results else ""
+            message = AIMessage(content=f"根据查询结果：{str(last)[:200]}")
+
+        prompt_tokens = sum(estimate_tokens(str(m.content)) for m in messages)
+        completion_tokens = estimate_tokens(str(message.content)) + 20 * len(message.tool_calls)
+        message.usage_metadata = {"input_tokens": prompt_tokens, "output_tokens": completion_tokens,
+                                  "total_tokens": prompt_tokens + completion_tokens}
+        return ChatResult(generations=[ChatGeneration(message=message)])
@@ -0,0 +1,64 @@
+import os
+import random
+import tempfile
+from contextlib import contextmanager
+
+from sqlalchemy import create_engine, event, text
+
+
+def create_sqlite_fixture(table_count: int, rows_per_table: int = 0, path: str = None, seed: int = 42) -> str:
+    """生成一个包含 table_count 张表的 SQLite 测试库，返回连接字符串
+
+    每张表都有自增主键、若干业务字段、一个普通索引，除第一张表外还有一个指向上一张表的外键，
+    用于在没有 MySQL 的环境下离线压测表结构读取和查询。
+    """
+    if path is None:
+        fd, path = tempfile.mkstemp(prefix=f"fixture_{table_count}_", suffix=".db")
+        os.close(fd)
+    if os.path.exists(path):
+        os.remove(path)
+    connection = f"sqlite:///{path}"
+    rnd = random.Random(seed)
+    engine = create_engine(connection)
+    with engine.begin() as conn:
+        for i in range(table_count):
+            fk = f", parent_id INTEGER REFERENCES t_{i - 1:04d}(id)" if i else ""
+            conn.execute(text(f"""
+                CREATE TABLE t_{i:04d} (
+                    id INTEGER PRIMARY KEY,
+                    name VARCHAR(64) NOT NULL,
+                    status CHAR(1) DEFAULT '0',
+                    amount DECIMAL(10, 2),
+                    create_time DATETIME{fk}
+                )
+            """))
+            conn.execute(text(f"CREATE INDEX ix_t_{i:04d}_name ON t_{i:04d}(name)"))
+            if rows_per_table:
+                conn.execute(
+                    text(f"INSERT INTO t_{i:04d} (name, status, amount, create_time) "
+                         f"VALUES (:name, :status, :amount, '2024-01-01 00:00:00')"),
+                    [{"name": f"name_{j}", "status": str(rnd.randint(0, 1)), "amount": rnd.random() * 1000}
+                     for j in range(rows_per_table)],
+                )
+    engine.dispose()
+    return connection
+
+
+class RoundTripCounter:
+    """通过 SQLAlchemy 引擎事件统计发往数据库的语句数量"""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, *args, **kwargs):
+        self.count += 1
+
+
+@contextmanager
+def count_round_trips(engine):
+    counter = RoundTripCounter()
+    event.listen(engine, "before_cursor_execute", counter)
+    try:
+        yield counter
+    finally:
+        event.remove(engine, "before_cursor_execute", counter)
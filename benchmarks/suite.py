@@ -0,0 +1,185 @@
+"""离线基准测试套件
+
+在生成的 SQLite 测试库（10 ~ 5000 张表）上逐个测量 MySQLDataBaseManager 的方法和各个 SQL 工具，
+并用脚本化的假模型驱动 text_to_sql_agent 的图。每项记录延迟分位数、数据库往返次数、
+输出大小和内存峰值，结果保存为 JSON，并与上一次的结果对比以发现性能回退。
+
+用法:
+    python -m benchmarks.suite
+    python -m benchmarks.suite --sizes 10 100 --repeat 20
+"""
+import argparse
+import json
+import os
+import statistics
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Any, Callable, Dict, List
+
+from agent.tools.test_to_sql_tools import (ListTablesTool, SQLQueryCheckedTool, SQLQueryTool, SQLQueryValidationTool,
+                                           TableSchemaTool, TableSearchTool)
+from agent.utils.db_utils import MySQLDataBaseManager
+from benchmarks.fixtures import count_round_trips, create_sqlite_fixture
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+DEFAULT_SIZES = [10, 100, 1000, 5000]
+QUERY = "SELECT status, count(*), sum(amount) FROM t_0001 GROUP BY status ORDER BY status"
+QUESTION = "统计 t 0001 表中每个 status 的 amount 总和"
+# 与 QUERY 结果变化无关的回退阈值：p50 变慢超过该比例时提示
+REGRESSION_THRESHOLD = 0.2
+
+
+def _percentile(values: List[float], q: float) -> float:
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, round(q * (len(values) - 1))))
+    return values[index]
+
+
+def measure(fn: Callable[[], Any], engine, repeat: int, setup: Callable[[], None] = None) -> Dict[str, Any]:
+    """重复执行 fn，统计延迟分位数、平均往返次数、输出大小和内存峰值"""
+    latencies, round_trips = [], []
+    output = None
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        with count_round_trips(engine) as counter:
+            start = time.perf_counter()
+            output = fn()
+            latencies.append(time.perf_counter() - start)
+        round_trips.append(counter.count)
+
+    # 内存单独测一次，避免 tracemalloc 的开销影响延迟
+    if setup is not None:
+        setup()
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "p50_ms": _percentile(latencies, 0.5) * 1000,
+        "p90_ms": _percentile(latencies, 0.9) * 1000,
+        "p99_ms": _percentile(latencies, 0.99) * 1000,
+        "mean_ms": statistics.fmean(latencies) * 1000,
+        "round_trips": statistics.fmean(round_trips),
+        "output_chars": len(str(output)),
+        "peak_memory_kb": peak / 1024,
+    }
+
+
+def _operations(manager: MySQLDataBaseManager, size: int) -> List[tuple]:
+    """(名称, 函数, 是否冷启动) 列表，冷启动的操作每次执行前清空表结构缓存"""
+    tables = [f"t_{i:04d}" for i in range(min(size, 5))]
+    tools = {
+        "list_tables": (ListTablesTool(db_manager=manager), {}),
+        "table_schema": (TableSchemaTool(db_manager=manager), {"table_names": tables}),
+        "search_tables": (TableSearchTool(db_manager=manager), {"question": QUESTION}),
+        "query": (SQLQueryTool(db_manager=manager), {"query": QUERY}),
+        "query_validation": (SQLQueryValidationTool(db_manager=manager), {"query": QUERY}),
+        "query_checked": (SQLQueryCheckedTool(db_manager=manager), {"query": QUERY}),
+    }
+    operations = [
+        ("manager.get_table_names", manager.get_table_names, False),
+        ("manager.get_table_comments", manager.get_table_comments, False),
+        ("manager.get_table_schema[5]", lambda: manager.get_table_schema(tables), False),
+        ("manager.get_table_schema[5].cold", lambda: manager.get_table_schema(tables), True),
+        ("manager.get_table_schema[all].cold", lambda: manager.get_table_schema(None), True),
+        ("manager.execute_query", lambda: manager.execute_query(QUERY), False),
+        ("manager.validate_query", lambda: manager.validate_query(QUERY), False),
+        ("manager.search_tables", lambda: manager.search_tables(QUESTION), False),
+        ("manager.search_tables.cold", lambda: manager.search_tables(QUESTION), True),
+    ]
+    for name, (tool, args) in tools.items():
+        operations.append((f"tool.{name}", lambda tool=tool, args=args: tool.invoke(args), False))
+    return operations
+
+
+def _agent_operation(manager: MySQLDataBaseManager):
+    """用脚本化的假模型构建 text_to_sql_agent 的图，返回一次问答的调用函数"""
+    from langchain.agents import create_agent
+
+    from agent.text_to_sql_agent import system_prompt
+    from benchmarks.fake_models import ScriptedChatModel
+
+    tools = [TableSearchTool(db_manager=manager), ListTablesTool(db_manager=manager),
+             TableSchemaTool(db_manager=manager), SQLQueryTool(db_manager=manager),
+             SQLQueryValidationTool(db_manager=manager), SQLQueryCheckedTool(db_manager=manager)]
+    model = ScriptedChatModel(script={QUESTION: [
+        ("sql_db_search_tables", {"question": QUESTION}),
+        ("sql_db_query_checked", {"query": QUERY}),
+    ]})
+    graph = create_agent(model, tools=tools, system_prompt=system_prompt)
+    return lambda: graph.invoke({"messages": [{"role": "user", "content": QUESTION}]})["messages"][-1].content
+
+
+def run_size(size: int, repeat: int) -> Dict[str, Any]:
+    connection = create_sqlite_fixture(size, rows_per_table=20)
+    manager = MySQLDataBaseManager(connection)
+    results = {}
+    for name, fn, cold in _operations(manager, size):
+        setup = manager.invalidate_schema_cache if cold else None
+        # 冷启动的全表读取在大库上很慢，减少重复次数
+        results[name] = measure(fn, manager.engine, max(3, repeat // 5) if cold else repeat, setup)
+        print(f"  {name:<38} p50 {results[name]['p50_ms']:>9.2f} ms  "
+              f"round trips {results[name]['round_trips']:>6.1f}  chars {results[name]['output_chars']:>9}")
+    results["agent.text_to_sql"] = measure(_agent_operation(manager), manager.engine, max(3, repeat // 5))
+    print(f"  {'agent.text_to_sql':<38} p50 {results['agent.text_to_sql']['p50_ms']:>9.2f} ms  "
+          f"round trips {results['agent.text_to_sql']['round_trips']:>6.1f}")
+    manager.engine.dispose()
+    os.remove(manager.engine.url.database)
+    return results
+
+
+def _latest_result() -> str:
+    if not os.path.isdir(RESULTS_DIR):
+        return None
+    files = sorted(f for f in os.listdir(RESULTS_DIR) if f.endswith(".json"))
+    return os.path.join(RESULTS_DIR, files[-1]) if files else None
+
+
+def compare(previous: Dict[str, Any], current: Dict[str, Any]) -> List[str]:
+    """对比两次结果，返回 p50 延迟或往返次数变差的条目"""
+    regressions = []
+    for size, operations in current["sizes"].items():
+        for name, metrics in operations.items():
+            old = previous.get("sizes", {}).get(size, {}).get(name)
+            if old is None:
+                continue
+            if old["p50_ms"] > 0 and metrics["p50_ms"] > old["p50_ms"] * (1 + REGRESSION_THRESHOLD):
+                regressions.append(f"[{size} 张表] {name}: p50 {old['p50_ms']:.2f} -> {metrics['p50_ms']:.2f} ms")
+            if metrics["round_trips"] > old["round_trips"]:
+                regressions.append(f"[{size} 张表] {name}: 往返次数 {old['round_trips']:.1f} -> {metrics['round_trips']:.1f}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="text-to-SQL agent 离线基准测试")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="测试库的表数量")
+    parser.add_argument("--repeat", type=int, default=20, help="每项操作的重复次数")
+    parser.add_argument("--output", default=None, help="结果 JSON 文件路径，默认写入 benchmarks/results/")
+    parser.add_argument("--baseline", default=None, help="用于对比的历史结果，默认使用最近一次的结果")
+    args = parser.parse_args()
+
+    baseline = args.baseline or _latest_result()
+    report = {"created_at": datetime.now().isoformat(timespec="seconds"), "repeat": args.repeat, "sizes": {}}
+    for size in args.sizes:
+        print(f"{size} 张表:")
+        report["sizes"][str(size)] = run_size(size, args.repeat)
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"结果已保存到 {output}")
+
+    if baseline and os.path.exists(baseline):
+        with open(baseline, encoding="utf-8") as f:
+            regressions = compare(json.load(f), report)
+        print(f"与 {baseline} 对比：" + ("未发现性能回退" if not regressions else "发现性能回退"))
+        for line in regressions:
+            print("  " + line)
+
+
+if __name__ == "__main__":
+    main()
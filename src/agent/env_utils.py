@@ -4,4 +4,37 @@ from dotenv import load_dotenv
 load_dotenv(override=True)
 
 ZHIPU_API_KEY = os.getenv("ZHIPU_API_KEY")
-ZHIPU_BASE_URL = os.getenv("ZHIPU_BASE_URL")
\ No newline at end of file
+ZHIPU_BASE_URL = os.getenv("ZHIPU_BASE_URL")
+
+# 性能埋点的 JSONL 输出文件，为空时不写文件（仍可导出 Prometheus 文本）
+PERF_JSONL_PATH = os.getenv("PERF_JSONL_PATH")
+
+# 是否延迟构建 agent：为 true 时导入模块不创建引擎、工具和模型，第一次请求时才构建
+AGENT_LAZY_INIT = os.getenv("AGENT_LAZY_INIT", "true").lower() in ("1", "true", "yes")
+
+# 表结构快照文件：预热时写入，worker 启动后从快照恢复表结构缓存，无需查询数据库
+SCHEMA_SNAPSHOT_PATH = os.getenv("SCHEMA_SNAPSHOT_PATH")
+
+# 会话 checkpoint 存储（SQLite，WAL 模式）的文件路径、每个会话保留的 checkpoint 数量和会话的保留时间（秒）
+CHECKPOINT_DB_PATH = os.getenv("CHECKPOINT_DB_PATH", ".checkpoints/checkpoints.db")
+CHECKPOINT_KEEP_LAST = int(os.getenv("CHECKPOINT_KEEP_LAST", "20")) or None
+CHECKPOINT_THREAD_TTL = float(os.getenv("CHECKPOINT_THREAD_TTL", str(7 * 86400))) or None
+
+# 大结果集导出（sql_db_query_export）写入文件的目录
+EXPORT_DIR = os.getenv("EXPORT_DIR", ".exports")
+
+# 模型调用：为 true 时使用离线桩模型（不访问网络），LLM_STUB_LATENCY 为桩模型每次调用的模拟延迟（秒）
+LLM_STUB = os.getenv("LLM_STUB", "false").lower() in ("1", "true", "yes")
+LLM_STUB_LATENCY = float(os.getenv("LLM_STUB_LATENCY", "0"))
+# 模型响应缓存的 SQLite 文件（为空时只缓存在内存）和缓存的有效期（秒）
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", ".llm_cache/llm_cache.db")
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", "86400")) or None
+# 客户端限流：最大并发调用数和每秒调用数（0 表示不限制）
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8")) or None
+LLM_REQUESTS_PER_SECOND = float(os.getenv("LLM_REQUESTS_PER_SECOND", "0")) or None
+
+# 互联网搜索：后端（zhipuai 或离线模拟的 fake）、并行调用数、单次调用超时（秒）和结果缓存时间（秒）
+WEB_SEARCH_BACKEND = os.getenv("WEB_SEARCH_BACKEND", "zhipuai")
+WEB_SEARCH_WORKERS = int(os.getenv("WEB_SEARCH_WORKERS", "4"))
+WEB_SEARCH_TIMEOUT = float(os.getenv("WEB_SEARCH_TIMEOUT", "10"))
+WEB_SEARCH_CACHE_TTL = float(os.getenv("WEB_SEARCH_CACHE_TTL", "600")) or None
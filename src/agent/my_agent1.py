@@ -11,8 +11,22 @@ def send_email(to: str, subject: str, body: str) -> str:
     # ... 这里可以集成实际的邮件发送逻辑
     return f"邮件已发送到 {to}，主题：{subject}"
 
-agent = create_agent(
-    llm,
-    tools=[send_email],
-    system_prompt="你是一个邮件发送助手，请始终使用 send_email 工具来发送邮件。"
-)
\ No newline at end of file
+
+def get_agent():
+    """构建（只构建一次）并返回 agent，会话状态保存在本地 SQLite checkpoint 存储中，第一次调用时才打开"""
+    if "agent" not in globals():
+        from agent.utils.checkpoint_store import get_checkpointer
+
+        globals()["agent"] = create_agent(
+            llm,
+            tools=[send_email],
+            system_prompt="你是一个邮件发送助手，请始终使用 send_email 工具来发送邮件。",
+            checkpointer=get_checkpointer()
+        )
+    return globals()["agent"]
+
+
+def __getattr__(name):
+    if name == "agent":
+        return get_agent()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -5,9 +5,23 @@ from agent.tools.tool_demo2 import MyWebSearchTool
 
 web_search_tool = MyWebSearchTool() # 实例化自定义工具类
 
-agent = create_agent(
-    llm,
-    #tools=[web_search2],
-    tools=[web_search_tool],
-    system_prompt="你是一个智能的助理，尽可能使用互联网搜索工具来获取最新的信息。"
-)
\ No newline at end of file
+
+def get_agent():
+    """构建（只构建一次）并返回 agent，会话状态保存在本地 SQLite checkpoint 存储中，第一次调用时才打开"""
+    if "agent" not in globals():
+        from agent.utils.checkpoint_store import get_checkpointer
+
+        globals()["agent"] = create_agent(
+            llm,
+            #tools=[web_search2],
+            tools=[web_search_tool],
+            system_prompt="你是一个智能的助理，尽可能使用互联网搜索工具来获取最新的信息。",
+            checkpointer=get_checkpointer()
+        )
+    return globals()["agent"]
+
+
+def __getattr__(name):
+    if name == "agent":
+        return get_agent()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,16 +1,72 @@
-from langchain_openai import ChatOpenAI
-from zhipuai import ZhipuAI
+import threading
 
-from agent.env_utils import ZHIPU_API_KEY, ZHIPU_BASE_URL
-
-llm = ChatOpenAI(
-    model="glm-4-flash",
-    api_key=ZHIPU_API_KEY,
-    base_url=ZHIPU_BASE_URL, # 智谱的 Base URL
-    temperature=0.1
+from agent.env_utils import (
+    LLM_CACHE_PATH,
+    LLM_CACHE_TTL,
+    LLM_MAX_CONCURRENCY,
+    LLM_REQUESTS_PER_SECOND,
+    LLM_STUB,
+    LLM_STUB_LATENCY,
+    ZHIPU_API_KEY,
+    ZHIPU_BASE_URL,
 )
 
-zhipuai_client = ZhipuAI(
-    api_key=ZHIPU_API_KEY,
-    base_url=ZHIPU_BASE_URL  # 智谱的 Base URL
-)
\ No newline at end of file
+# llm 和 zhipuai_client 在第一次被访问时才导入相关依赖并创建（见模块末尾的 __getattr__），
+# 只用到其中一个时不必为另一个付出导入和初始化的开销
+_lock = threading.Lock()
+
+
+def _create_chat_model():
+    if LLM_STUB:
+        from agent.utils.llm_cache import StubChatModel
+
+        return StubChatModel(latency=LLM_STUB_LATENCY)
+
+    from langchain_openai import ChatOpenAI
+
+    return ChatOpenAI(
+        model="glm-4-flash",
+        api_key=ZHIPU_API_KEY,
+        base_url=ZHIPU_BASE_URL, # 智谱的 Base URL
+        temperature=0.1,
+    )
+
+
+def _create_llm():
+    from agent.utils.llm_cache import wrap_chat_model
+    from agent.utils.perf_utils import perf_callback
+
+    # 相同的请求命中缓存或合并为一次调用，实际发往模型的调用经过本地限流排队
+    return wrap_chat_model(
+        _create_chat_model(),
+        cache_path=LLM_CACHE_PATH,
+        cache_ttl=LLM_CACHE_TTL,
+        max_concurrency=LLM_MAX_CONCURRENCY,
+        rate=LLM_REQUESTS_PER_SECOND,
+        callbacks=[perf_callback]  # 记录每次调用的耗时和 token 数
+    )
+
+
+def _create_zhipuai_client():
+    from zhipuai import ZhipuAI
+
+    return ZhipuAI(
+        api_key=ZHIPU_API_KEY,
+        base_url=ZHIPU_BASE_URL  # 智谱的 Base URL
+    )
+
+
+_factories = {
+    "llm": _create_llm,
+    "zhipuai_client": _create_zhipuai_client,
+}
+
+
+def __getattr__(name):
+    factory = _factories.get(name)
+    if factory is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    with _lock:
+        if name not in globals():
+            globals()[name] = factory()
+    return globals()[name]
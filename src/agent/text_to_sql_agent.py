@@ -1,11 +1,12 @@
-from typing import List
+import threading
+from typing import TYPE_CHECKING, List, Optional
 
-from langchain.agents import create_agent
-from langchain_core.tools import BaseTool
+from agent.env_utils import AGENT_LAZY_INIT, EXPORT_DIR, SCHEMA_SNAPSHOT_PATH
+from agent.utils.engine_registry import configure_engine
+from agent.utils.query_cache import QueryResultCache
 
-from agent.my_llm import llm
-from agent.tools.test_to_sql_tools import SQLQueryTool, SQLQueryValidationTool, ListTablesTool, TableSchemaTool
-from agent.utils.db_utils import MySQLDataBaseManager
+if TYPE_CHECKING:
+    from langchain_core.tools import BaseTool
 
 DB_CONFIG = {
         "host": "139.159.228.234",
@@ -16,17 +17,76 @@ DB_CONFIG = {
     }
 connection = f"mysql+pymysql://{DB_CONFIG['user']}:{DB_CONFIG['password']}@{DB_CONFIG['host']}:{DB_CONFIG['port']}/{DB_CONFIG['database']}?charset=utf8mb4"
 
-def get_tools(connection: str) -> List[BaseTool]:
-    manager = MySQLDataBaseManager(connection)
+# 连接池参数按数据库配置，同一个数据库的所有工具集共享一个连接池
+configure_engine(connection, pool_size=5, max_overflow=10, pool_recycle=3600, pool_pre_ping=True)
+
+# 查询结果的最大行数：提示词中要求模型遵守，执行前也会在查询顶层注入或收紧 LIMIT
+TOP_K = 100
+
+# 执行计划估算超过 QUERY_MAX_ESTIMATED_ROWS 行的查询直接拒绝并提示模型改写，单条查询最多执行 QUERY_TIMEOUT 秒
+QUERY_MAX_ESTIMATED_ROWS = 1_000_000
+QUERY_TIMEOUT = 30
+
+# 导出到文件的查询不受 TOP_K 限制，最多导出 EXPORT_MAX_ROWS 行、执行 EXPORT_TIMEOUT 秒，
+# 执行计划估算超过 EXPORT_MAX_ESTIMATED_ROWS 行时拒绝；自动生成的导出文件保留 EXPORT_RETENTION 秒、最多 EXPORT_MAX_FILES 个
+EXPORT_MAX_ROWS = 5_000_000
+EXPORT_TIMEOUT = 600
+EXPORT_MAX_ESTIMATED_ROWS = 50_000_000
+EXPORT_RETENTION = 24 * 3600
+EXPORT_MAX_FILES = 200
+
+# 查询结果和表结构使用紧凑格式：结果为 TSV（列名只输出一次），超长单元格截断，单次结果不超过 token 预算；
+# 表结构为 DDL 风格
+QUERY_OUTPUT_FORMAT = "tsv"
+QUERY_MAX_COLUMN_WIDTH = 200
+QUERY_MAX_TOKENS = 4000
+SCHEMA_OUTPUT_FORMAT = "ddl"
+
+# 每次模型调用的消息 token 预算（估算值），较早的工具结果会先被压缩为摘要
+CONTEXT_TOKEN_BUDGET = 8000
+
+# 语义缓存默认关闭：相似问题复用 SQL 可能给出错误答案，开启前请在实际问题上评估命中的准确性
+SEMANTIC_CACHE_ENABLED = False
+# 语义缓存命中所需的最低问题相似度（余弦相似度）
+SEMANTIC_CACHE_THRESHOLD = 0.9
+# 语义缓存命中时查询结果直接作为回答，使用 Markdown 表格展示
+SEMANTIC_CACHE_ANSWER_FORMAT = "markdown"
+
+# 查询结果缓存：相同（规范化后）的 SQL 在 TTL 内且相关表未变化时直接返回缓存结果
+query_cache = QueryResultCache(ttl=300)
+
+def get_tools(connection: str) -> List["BaseTool"]:
+    # 工具和数据库管理器依赖较重，在构建时才导入；引擎在第一次查询数据库时才创建
+    from agent.tools.test_to_sql_tools import SQLQueryTool, ListTablesTool, TableSchemaTool, SQLQueryCheckedTool, \
+        DiscoverTablesTool, SQLQueryExportTool
+    from agent.utils.db_options import CacheOptions, ExportOptions, GuardOptions
+    from agent.utils.db_utils import MySQLDataBaseManager
+
+    manager = MySQLDataBaseManager(
+        connection,
+        cache=CacheOptions(query_cache=query_cache),
+        guard=GuardOptions(query_limit=TOP_K, cost_guard="warn", max_estimated_rows=QUERY_MAX_ESTIMATED_ROWS,
+                           statement_timeout=QUERY_TIMEOUT),
+        export=ExportOptions(EXPORT_DIR, max_rows=EXPORT_MAX_ROWS, timeout=EXPORT_TIMEOUT,
+                             max_estimated_rows=EXPORT_MAX_ESTIMATED_ROWS, retention=EXPORT_RETENTION,
+                             max_files=EXPORT_MAX_FILES),
+    )
+    if SCHEMA_SNAPSHOT_PATH:
+        # 从预热生成的快照恢复表结构缓存，第一次请求无需查询表结构
+        manager.load_schema_snapshot(SCHEMA_SNAPSHOT_PATH)
+    query_format = {"output_format": QUERY_OUTPUT_FORMAT, "max_column_width": QUERY_MAX_COLUMN_WIDTH,
+                    "max_tokens": QUERY_MAX_TOKENS}
+    # sql_db_discover_tables 已包含表检索，sql_db_query_checked 已包含校验，不再单独提供
+    # sql_db_search_tables 和 sql_db_query_validation，减少模型在功能重叠的工具之间选择
     return [
+        DiscoverTablesTool(db_manager=manager),
         ListTablesTool(db_manager=manager),
-        TableSchemaTool(db_manager=manager),
-        SQLQueryTool(db_manager=manager),
-        SQLQueryValidationTool(db_manager=manager),
+        TableSchemaTool(db_manager=manager, output_format=SCHEMA_OUTPUT_FORMAT),
+        SQLQueryTool(db_manager=manager, **query_format),
+        SQLQueryCheckedTool(db_manager=manager, **query_format),
+        SQLQueryExportTool(db_manager=manager),
     ]
 
-tools = get_tools(connection)
-
 system_prompt = """
 你是一个专门设计用于与SQL数据库交互的AI智能体。你的任务是将自然语言问题转换为有效的SQL查询语句，以从数据库中检索所需的信息。
 
@@ -39,18 +99,94 @@ system_prompt = """
 除非用户明确指定要获取的具体示例数量，否则始终将查询结果限制为最多{top_k}条。
 你可以通过相关列对结果进行排序，以返回数据库中最有意义的示例。
 永远不要查询特定表的所有列，只获取与问题相关的列。
-在执行查询之前，你必须仔细检查查询语句。如果在执行查询时遇到错误，请重写查询并再次尝试。绝对不要对数据库执行任何数据操作语言(DML)语句(如INSERT、UPDATE、DELETE、DROP等)
-开始处理问题时，你应该始终先查看数据库中有哪些表可以查询。不要跳过这一步。
+在执行查询之前，你必须仔细检查查询语句，可以直接使用 sql_db_query_checked 工具一次完成校验和执行。如果在执行查询时遇到错误，请重写查询并再次尝试。绝对不要对数据库执行任何数据操作语言(DML)语句(如INSERT、UPDATE、DELETE、DROP等)
+开始处理问题时，你应该先使用 sql_db_discover_tables，一次获取数据库中全部表的列表以及与问题相关的表的结构；只有结果不足以回答问题时，才使用 sql_db_table_schema 查看其他表的结构。不要跳过这一步。
 返回的结果应该是名称而不是ID，除非用户明确要求返回ID。你应该尽可能提供有用的上下文信息来支持你的答案，例如相关的表名、列名和查询结果中的关键数据点。
 查询用户信息的时候使用用户昵称(nick_name)来作为查询条件，而不是使用用户账号(user_name)。
-然后，你应该查看相关表的架构，以了解可用的列和它们的数据类型。
+如果检索结果中没有所需表的结构，再查看相关表的架构，以了解可用的列和它们的数据类型。
+如果用户需要大量明细数据（例如导出或下载全部记录），使用 sql_db_query_export 把结果导出到文件，不要用 sql_db_query 返回大量行；回答时告诉用户文件路径，并根据返回的统计信息进行说明。
 """.format(
     dialect='MySQL',
-    top_k=100
+    top_k=TOP_K
 )
 
-agent = create_agent(
-    llm,
-    tools=tools,
-    system_prompt=system_prompt
-)
+_build_lock = threading.Lock()
+
+
+def get_graph():
+    """构建（只构建一次）并返回不带 checkpointer 的图，同时设置模块属性 graph、tools、semantic_cache 和 compaction
+
+    langgraph.json 发布的图由服务端注入 checkpointer（见 checkpoint_store.generate_checkpointer），
+    进程内使用请调用 get_agent()。semantic_cache 在 SEMANTIC_CACHE_ENABLED 为 False 时为 None。
+    """
+    with _build_lock:
+        if "graph" not in globals():
+            from langchain.agents import create_agent
+
+            from agent.my_llm import llm
+            from agent.utils.perf_utils import perf_callback
+
+            from agent.utils.context_compaction import ToolResultCompactionMiddleware
+            from agent.utils.semantic_cache import SemanticQueryCache, build_cached_graph
+
+            tools = get_tools(connection)
+            # 上下文压缩：较早的表结构和查询结果在发给模型前替换为摘要，每次模型调用不超过 token 预算
+            compaction = ToolResultCompactionMiddleware(max_tokens=CONTEXT_TOKEN_BUDGET)
+            graph = create_agent(
+                llm,
+                tools=tools,
+                system_prompt=system_prompt,
+                middleware=[compaction],
+                # 启用语义缓存时会话状态保存在外层图中，agent 子图不再单独保存 checkpoint
+                checkpointer=False if SEMANTIC_CACHE_ENABLED else None
+            )
+            semantic_cache = None
+            if SEMANTIC_CACHE_ENABLED:
+                # 语义缓存：与已回答过的问题足够相似时直接执行当时验证过的 SQL，跳过模型和工具循环
+                semantic_cache = SemanticQueryCache(threshold=SEMANTIC_CACHE_THRESHOLD)
+                graph = build_cached_graph(graph, tools[0].db_manager, semantic_cache, SEMANTIC_CACHE_ANSWER_FORMAT,
+                                           max_column_width=QUERY_MAX_COLUMN_WIDTH, max_tokens=QUERY_MAX_TOKENS)
+            # 性能埋点：整次运行、每次 LLM 调用和工具调用的耗时都关联到同一个运行 ID
+            graph = graph.with_config({"callbacks": [perf_callback]})
+            globals().update(graph=graph, tools=tools, semantic_cache=semantic_cache, compaction=compaction)
+    return globals()["graph"]
+
+
+def get_agent():
+    """进程内使用的 agent：与 get_graph() 相同的图，会话状态保存在本地 SQLite checkpoint 存储中
+
+    checkpoint 存储在第一次调用时才打开（增量编码、压缩、按保留策略清理）。
+    """
+    graph = get_graph()
+    with _build_lock:
+        if "agent" not in globals():
+            from agent.utils.checkpoint_store import get_checkpointer
+
+            globals()["agent"] = graph.copy(update={"checkpointer": get_checkpointer()})
+    return globals()["agent"]
+
+
+def make_graph(config: Optional[dict] = None):
+    """langgraph.json 使用的图工厂：第一次请求时才构建图，之后复用；checkpointer 由 langgraph.json 配置"""
+    return get_graph()
+
+
+def warm_up(snapshot_path: Optional[str] = SCHEMA_SNAPSHOT_PATH) -> int:
+    """预热表结构缓存和表检索索引，指定 snapshot_path 时写入磁盘快照供重启后的 worker 使用"""
+    get_graph()
+    return globals()["tools"][0].db_manager.warm_up(snapshot_path)
+
+
+def __getattr__(name):
+    # 延迟构建：第一次访问 graph / tools / semantic_cache / compaction 时才创建引擎、工具和模型，
+    # 第一次访问 agent 时才打开本地 checkpoint 存储
+    if name == "agent":
+        return get_agent()
+    if name in ("graph", "tools", "semantic_cache", "compaction"):
+        get_graph()
+        return globals()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+if not AGENT_LAZY_INIT:
+    get_graph()
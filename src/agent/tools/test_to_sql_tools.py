@@ -4,7 +4,9 @@ from langchain_core.tools import BaseTool
 from pydantic import Field, create_model
 
 from agent.utils.db_utils import MySQLDataBaseManager
+from agent.utils.format_utils import format_table_list
 from agent.utils.log_utils import log
+from agent.utils.result_export import default_export_format, format_export_summary
 
 
 class ListTablesTool(BaseTool):
@@ -15,23 +17,30 @@ class ListTablesTool(BaseTool):
 
     # 数据库管理器实例
     db_manager: MySQLDataBaseManager
+    # 输出格式："default" 为逐表说明，"compact" 为每行 "表名: 描述"
+    output_format: str = "default"
+    # 输出的 token 预算（估算值），None 表示不限制
+    max_tokens: Optional[int] = None
+
+    def _format_table_comments(self, table_comments: List[dict]) -> str:
+        return format_table_list(table_comments, self.output_format, self.max_tokens)
 
     def _run(self) -> str:
         try:
             table_comments = self.db_manager.get_table_comments()
-
-            result = f"数据库中共有 {len(table_comments)} 张表：\n"
-            for i,table in enumerate(table_comments):
-                result += f"{i+1}. 表名: {table['table_name']}\n    描述: {table['comment']}\n\n"
-
-            return result
+            return self._format_table_comments(table_comments)
         except Exception as e:
             log.exception(e)
             return f"获取表信息时出错: {str(e)}"
 
     async def _arun(self) -> str:
         """"异步执行"""
-        return self._run()
+        try:
+            table_comments = await self.db_manager.aget_table_comments()
+            return self._format_table_comments(table_comments)
+        except Exception as e:
+            log.exception(e)
+            return f"获取表信息时出错: {str(e)}"
 
 
 class TableSchemaTool(BaseTool):
@@ -42,6 +51,10 @@ class TableSchemaTool(BaseTool):
 
     # 数据库管理器实例
     db_manager: MySQLDataBaseManager
+    # 输出格式："default" 为逐列说明，"ddl" 为紧凑的类 DDL 格式
+    output_format: str = "default"
+    # 输出的 token 预算（估算值），None 表示不限制
+    max_tokens: Optional[int] = None
 
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
@@ -49,7 +62,7 @@ class TableSchemaTool(BaseTool):
 
     def _run(self, table_names: Optional[List[str]] = None) -> str:
         try:
-            schema_info = self.db_manager.get_table_schema(table_names)
+            schema_info = self.db_manager.get_table_schema(table_names, self.output_format, self.max_tokens)
             return schema_info
         except Exception as e:
             log.exception(e)
@@ -57,7 +70,104 @@ class TableSchemaTool(BaseTool):
 
     async def _arun(self, table_names: Optional[List[str]] = None) -> str:
         """"异步执行"""
-        return self._run(table_names)
+        try:
+            return await self.db_manager.aget_table_schema(table_names, self.output_format, self.max_tokens)
+        except Exception as e:
+            log.exception(e)
+            return f"获取表模式信息时出错: {str(e)}"
+
+
+# 检索工具一次最多返回模式信息的表数量
+MAX_SEARCH_TOP_K = 20
+
+
+class TableSearchTool(BaseTool):
+    """根据问题检索相关的表及其模式信息"""
+
+    name: str = "sql_db_search_tables"
+    description: str = "根据自然语言问题检索数据库中最相关的表，返回这些表的描述和模式信息（字段、主键、外键、索引）。输入应为用户的问题或关键词，例如：查询每个部门的用户数量。当数据库中的表很多、只需要了解与问题相关的表时，优先使用这个工具。"
+
+    # 数据库管理器实例
+    db_manager: MySQLDataBaseManager
+    # 默认返回的表数量
+    top_k: int = 5
+    # 模式信息格式："default" 或 "ddl"
+    output_format: str = "ddl"
+    # 模式信息的 token 预算（估算值），None 表示不限制
+    max_tokens: Optional[int] = None
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.args_schema = create_model("TableSearchArgs",
+                                        question=(str, Field(..., description="用户的问题或检索关键词。")),
+                                        top_k=(Optional[int], Field(None, ge=1, le=MAX_SEARCH_TOP_K, description="返回的表数量，默认为 5，最多为 20。")))
+
+    def _run(self, question: str, top_k: Optional[int] = None) -> str:
+        try:
+            return self.db_manager.search_tables(question, top_k or self.top_k, self.output_format, self.max_tokens)
+        except Exception as e:
+            log.exception(e)
+            return f"检索相关表时出错: {str(e)}"
+
+    async def _arun(self, question: str, top_k: Optional[int] = None) -> str:
+        """"异步执行"""
+        try:
+            return await self.db_manager.asearch_tables(question, top_k or self.top_k, self.output_format,
+                                                        self.max_tokens)
+        except Exception as e:
+            log.exception(e)
+            return f"检索相关表时出错: {str(e)}"
+
+
+class DiscoverTablesTool(BaseTool):
+    """一次返回全部表的列表以及与问题最相关的表的模式信息"""
+
+    name: str = "sql_db_discover_tables"
+    description: str = "一次调用返回数据库中全部表的名称和描述，以及与问题最相关的表的模式信息（字段、主键、外键、索引）。输入应为用户的问题或关键词，例如：查询每个部门的用户数量。开始处理问题时优先使用这个工具，可以代替先调用 sql_db_list_tables 再调用 sql_db_table_schema。"
+
+    # 数据库管理器实例
+    db_manager: MySQLDataBaseManager
+    # 默认返回模式信息的表数量
+    top_k: int = 5
+    # 表列表格式："default" 或 "compact"
+    list_format: str = "compact"
+    # 表列表的 token 预算（估算值），None 表示不限制
+    list_max_tokens: Optional[int] = 2000
+    # 模式信息格式："default" 或 "ddl"
+    output_format: str = "ddl"
+    # 模式信息的 token 预算（估算值），None 表示不限制
+    max_tokens: Optional[int] = None
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.args_schema = create_model("DiscoverTablesArgs",
+                                        question=(str, Field(..., description="用户的问题或检索关键词。")),
+                                        top_k=(Optional[int], Field(None, ge=1, le=MAX_SEARCH_TOP_K, description="返回模式信息的表数量，默认为 5，最多为 20。")))
+
+    def _format_discovery(self, discovery: dict) -> str:
+        result = format_table_list(discovery["tables"], self.list_format, self.list_max_tokens)
+        if discovery["schema"] is None:
+            return result + "\n未找到与问题相关的表，请根据上面的表列表使用 sql_db_table_schema 查看需要的表结构。"
+        return f"{result}\n{discovery['schema']}"
+
+    def _run(self, question: str, top_k: Optional[int] = None) -> str:
+        try:
+            discovery = self.db_manager.discover_tables(question, top_k or self.top_k, self.output_format,
+                                                        self.max_tokens)
+            return self._format_discovery(discovery)
+        except Exception as e:
+            log.exception(e)
+            return f"检索相关表时出错: {str(e)}"
+
+    async def _arun(self, question: str, top_k: Optional[int] = None) -> str:
+        """"异步执行"""
+        try:
+            discovery = await self.db_manager.adiscover_tables(question, top_k or self.top_k, self.output_format,
+                                                               self.max_tokens)
+            return self._format_discovery(discovery)
+        except Exception as e:
+            log.exception(e)
+            return f"检索相关表时出错: {str(e)}"
 
 
 class SQLQueryTool(BaseTool):
@@ -68,6 +178,12 @@ class SQLQueryTool(BaseTool):
 
     # 数据库管理器实例
     db_manager: MySQLDataBaseManager
+    # 结果格式：可选 "repr"（每行一个元组）、"csv"、"tsv"、"markdown"
+    output_format: str = "repr"
+    # 单元格最大字符数，None 表示不截断
+    max_column_width: Optional[int] = None
+    # 结果的 token 预算（估算值），None 表示不限制
+    max_tokens: Optional[int] = None
 
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
@@ -75,7 +191,7 @@ class SQLQueryTool(BaseTool):
 
     def _run(self, query: str) -> str:
         try:
-            result = self.db_manager.execute_query(query)
+            result = self.db_manager.execute_query(query, self.output_format, self.max_column_width, self.max_tokens)
             return result
         except Exception as e:
             log.exception(e)
@@ -83,7 +199,45 @@ class SQLQueryTool(BaseTool):
 
     async def _arun(self, query: str) -> str:
         """"异步执行"""
-        return self._run(query)
+        try:
+            return await self.db_manager.aexecute_query(query, self.output_format, self.max_column_width,
+                                                        self.max_tokens)
+        except Exception as e:
+            log.exception(e)
+            return f"执行SQL查询时出错: {str(e)}"
+
+
+class SQLQueryExportTool(BaseTool):
+    """把大结果集导出到本地文件并返回统计摘要的工具"""
+
+    name: str = "sql_db_query_export"
+    description: str = "把SQL查询的全部结果流式导出到本地文件（Parquet 或 CSV），只返回文件路径、行数和每列的统计信息（空值数、最小值、最大值、均值、最常见的值），结果行不会返回。当用户需要大量明细数据（例如导出、下载全部记录）时使用这个工具，不要用 sql_db_query 返回大量行；也可以根据返回的统计信息回答汇总类问题。输入应为有效的SQL SELECT查询语句。"
+
+    # 数据库管理器实例
+    db_manager: MySQLDataBaseManager
+    # 默认导出格式：安装了 pyarrow 时为 "parquet"，否则为 "csv"
+    export_format: str = Field(default_factory=default_export_format)
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.args_schema = create_model("SQLQueryExportArgs",
+                                        query=(str, Field(..., description="要导出结果的有效的SQL SELECT查询语句。")),
+                                        format=(Optional[str], Field(None, description="文件格式：parquet 或 csv，默认为 parquet（不可用时为 csv）。")))
+
+    def _run(self, query: str, format: Optional[str] = None) -> str:
+        try:
+            return format_export_summary(self.db_manager.export_query(query, format or self.export_format))
+        except Exception as e:
+            log.exception(e)
+            return f"导出查询结果时出错: {str(e)}"
+
+    async def _arun(self, query: str, format: Optional[str] = None) -> str:
+        """"异步执行"""
+        try:
+            return format_export_summary(await self.db_manager.aexport_query(query, format or self.export_format))
+        except Exception as e:
+            log.exception(e)
+            return f"导出查询结果时出错: {str(e)}"
 
 
 class SQLQueryValidationTool(BaseTool):
@@ -109,7 +263,48 @@ class SQLQueryValidationTool(BaseTool):
 
     async def _arun(self, query: str) -> bool:
         """"异步执行"""
-        return self._run(query)
+        try:
+            return await self.db_manager.avalidate_query(query)
+        except Exception as e:
+            log.exception(e)
+            return False
+
+
+class SQLQueryCheckedTool(BaseTool):
+    """校验并执行SQL查询语句的工具（一次调用完成校验和执行）"""
+
+    name: str = "sql_db_query_checked"
+    description: str = "校验并执行SQL查询语句的工具。输入应为有效的SQL SELECT查询语句，例如：SELECT count(*) FROM sys_user; 工具会先检查语句的语法和安全性，通过后直接执行并返回结果，校验失败时返回错误原因。校验和执行在一次调用中完成，无需另外校验。"
+
+    # 数据库管理器实例
+    db_manager: MySQLDataBaseManager
+    # 结果格式：可选 "repr"（每行一个元组）、"csv"、"tsv"、"markdown"
+    output_format: str = "repr"
+    # 单元格最大字符数，None 表示不截断
+    max_column_width: Optional[int] = None
+    # 结果的 token 预算（估算值），None 表示不限制
+    max_tokens: Optional[int] = None
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.args_schema = create_model("SQLQueryCheckedArgs", query=(str, Field(..., description="要校验并执行的有效的SQL SELECT查询语句。")))
+
+    def _run(self, query: str) -> str:
+        try:
+            return self.db_manager.validate_and_execute_query(query, self.output_format, self.max_column_width,
+                                                              self.max_tokens)
+        except Exception as e:
+            log.exception(e)
+            return f"执行SQL查询时出错: {str(e)}"
+
+    async def _arun(self, query: str) -> str:
+        """"异步执行"""
+        try:
+            return await self.db_manager.avalidate_and_execute_query(query, self.output_format,
+                                                                     self.max_column_width, self.max_tokens)
+        except Exception as e:
+            log.exception(e)
+            return f"执行SQL查询时出错: {str(e)}"
 
 
 if __name__ == "__main__":
@@ -1,8 +1,10 @@
+from typing import List, Optional
+
 from langchain.tools import tool
 from openai import BaseModel
 from pydantic import Field
 
-from agent.my_llm import zhipuai_client
+from agent.utils.web_search import format_search_batch, get_web_searcher
 
 
 @tool('web_search', description="互联网搜索的工具，可以搜索所有公开的信息，并返回搜索结果。")
@@ -11,23 +13,19 @@ def web_search1(query: str) -> str:
 
 
 @tool('web_search', parse_docstring=True)
-def web_search2(query: str) -> str:
+def web_search2(query: str, queries: Optional[List[str]] = None) -> str:
     """互联网搜索的工具，可以搜索所有公开的信息，并返回搜索结果。
 
     Args:
         query: 搜索的查询字符串。
+        queries: 需要同时搜索的其他查询字符串，与 query 一起并行搜索，结果合并去重。
 
     Returns:
         返回搜索的结果信息，该信息是一个文本字符串。
     """
     try:
-        resp = zhipuai_client.web_search.web_search(
-            search_engine="search_pro",
-            search_query=query
-        )
-        if resp.search_result:
-            return "\n".join([d.content for d in resp.search_result])
-        return "未找到相关搜索结果。"
+        # 带缓存的并行搜索：重复的查询只搜索一次，最近搜索过的查询直接使用缓存
+        return format_search_batch(get_web_searcher().search_many([query, *(queries or [])]))
     except Exception as e:
         print(e)
         return f"搜索时出错: {e}"
@@ -1,33 +1,38 @@
-from typing import Type
+from typing import List, Optional
 
 from langchain_core.tools import BaseTool
-from agent.my_llm import zhipuai_client
 from pydantic import BaseModel, Field, create_model
 
+from agent.utils.web_search import WebSearcher, format_search_batch, get_web_searcher
+
 
 class SearchArgs(BaseModel): #类：数据结构体
     query: str = Field(..., description="搜索的查询字符串。")
 
 class MyWebSearchTool(BaseTool):
     name: str = "web_search_byClass"
-    description: str = "互联网搜索的工具，可以搜索所有公开的信息，并返回搜索结果。"
+    description: str = ("互联网搜索的工具，可以搜索所有公开的信息，并返回搜索结果。"
+                        "需要从多个角度搜索时，把多个查询一次性放在 queries 中并行搜索，结果会合并去重。")
+    # 带缓存的并行搜索，默认使用进程级实例（见 agent.utils.web_search.get_web_searcher）
+    searcher: WebSearcher = Field(default_factory=get_web_searcher, exclude=True)
     #工具的参数结构体，第一种写法
     #args_schema: Type[BaseModel] = SearchArgs
 
     #工具的参数结构体，第二种写法
-    def __init__(self):
-        super().__init__()
-        self.args_schema = create_model("searchInput",query=(str, Field(..., description="搜索的查询字符串。")))
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.args_schema = create_model(
+            "searchInput",
+            query=(Optional[str], Field(None, description="搜索的查询字符串。")),
+            queries=(Optional[List[str]], Field(None, description="同时搜索的多个查询字符串，与 query 二选一。")),
+        )
 
-    def _run(self, query: str) -> str:
+    def _run(self, query: Optional[str] = None, queries: Optional[List[str]] = None) -> str:
         try:
-            resp = zhipuai_client.web_search.web_search(
-                search_engine="search_pro",
-                search_query=query
-            )
-            if resp.search_result:
-                return "\n".join([d.content for d in resp.search_result])
-            return "未找到相关搜索结果。"
+            queries = [*(queries or []), *([query] if query else [])]
+            if not queries:
+                return "请提供要搜索的查询字符串。"
+            return format_search_batch(self.searcher.search_many(queries))
         except Exception as e:
             print(e)
             return f"搜索时出错: {e}"
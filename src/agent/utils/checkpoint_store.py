@@ -0,0 +1,564 @@
+import asyncio
+import os
+import random
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from functools import partial
+from typing import Any, AsyncIterator, Dict, Iterator, Optional, Sequence, Set, Tuple
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+    writes_sort_key,
+)
+
+from agent.utils.log_utils import log
+
+_MISSING = object()
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS checkpoints (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL,
+    checkpoint_id TEXT NOT NULL,
+    parent_id TEXT,
+    type TEXT NOT NULL,
+    checkpoint BLOB NOT NULL,
+    metadata_type TEXT NOT NULL,
+    metadata BLOB NOT NULL,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS blobs (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL,
+    channel TEXT NOT NULL,
+    version TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    type TEXT,
+    base_version TEXT,
+    depth INTEGER NOT NULL,
+    value BLOB,
+    PRIMARY KEY (thread_id, checkpoint_ns, channel, version)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS writes (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL,
+    checkpoint_id TEXT NOT NULL,
+    task_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    channel TEXT NOT NULL,
+    type TEXT NOT NULL,
+    value BLOB NOT NULL,
+    task_path TEXT NOT NULL DEFAULT '',
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS threads (
+    thread_id TEXT PRIMARY KEY,
+    updated_at REAL NOT NULL,
+    checkpoints INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS ix_threads_updated_at ON threads(updated_at);
+"""
+
+
+class _RecentValue:
+    """最近写入（或读取）的列表型通道值，用于增量编码下一个版本"""
+
+    __slots__ = ("version", "value", "depth")
+
+    def __init__(self, version: str, value: list, depth: int):
+        self.version = version
+        self.value = value
+        self.depth = depth
+
+
+class SQLiteCheckpointSaver(BaseCheckpointSaver[str]):
+    """基于本地 SQLite（WAL 模式）的 LangGraph checkpointer
+
+    - 只追加：每一步只写入新的 checkpoint 行和版本发生变化的通道值，已有的行不会被重写
+    - 增量编码：消息列表等只在末尾追加的列表型通道，只保存相对上一个版本新增的元素，
+      每隔 snapshot_interval 个版本写一次完整值，读取时沿增量链回溯（最多 snapshot_interval 步）
+    - 压缩：超过 compress_min_bytes 的值用 zlib 压缩
+    - 保留策略：每个会话只保留最近 keep_last 个 checkpoint（超出 prune_batch 个后批量清理，均摊到每一步的成本固定），
+      超过 thread_ttl 秒未更新的会话、超出 max_threads 的最旧会话由 compact 删除，compact 同时回收磁盘空间
+
+    清理会删除被淘汰 checkpoint 的 pending writes，使用 DeltaChannel 的图不应开启 keep_last。
+    """
+
+    def __init__(self, path: str, *, keep_last: Optional[int] = 20, prune_batch: int = 10,
+                 snapshot_interval: int = 32, compress_min_bytes: int = 512, compression_level: int = 1,
+                 thread_ttl: Optional[float] = 7 * 86400.0, max_threads: Optional[int] = None,
+                 compact_interval: Optional[float] = 600.0, recent_size: int = 4096, serde=None):
+        """初始化 checkpointer
+
+        Args:
+            path: SQLite 数据库文件路径，所在目录不存在时自动创建
+            keep_last: 每个会话（每个命名空间）保留的 checkpoint 数量，None 表示不清理
+            prune_batch: 超出 keep_last 多少个 checkpoint 后清理一次
+            snapshot_interval: 列表型通道每隔多少个版本写一次完整值，1 表示不使用增量编码
+            compress_min_bytes: 超过该大小的值使用 zlib 压缩
+            compression_level: zlib 压缩级别
+            thread_ttl: 会话超过多少秒未更新后由 compact 删除，None 表示不按时间删除
+            max_threads: 最多保留的会话数量，超出时 compact 删除最久未更新的会话，None 表示不限制
+            compact_interval: 后台执行 compact 的间隔（秒），None 表示不自动执行
+            recent_size: 内存中保留的最近通道值数量，用于增量编码和加速读取
+            serde: 序列化器，默认为 LangGraph 的 JsonPlusSerializer
+        """
+        super().__init__(serde=serde)
+        self.path = path
+        self.keep_last = keep_last
+        self.prune_batch = prune_batch
+        self.snapshot_interval = max(1, snapshot_interval)
+        self.compress_min_bytes = compress_min_bytes
+        self.compression_level = compression_level
+        self.thread_ttl = thread_ttl
+        self.max_threads = max_threads
+        self.compact_interval = compact_interval
+        self.recent_size = recent_size
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        self._recent: "OrderedDict[Tuple[str, str, str], _RecentValue]" = OrderedDict()
+        self._recent_lock = threading.Lock()
+        self._compactor: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        conn = self._connection()
+        # auto_vacuum 只能在建表之前设置，之后由 compact 执行 incremental_vacuum 归还空闲页
+        conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        conn.executescript(_SCHEMA)
+        conn.commit()
+
+    def _connection(self) -> sqlite3.Connection:
+        # sqlite3 连接不能跨线程使用，每个线程维护自己的连接；WAL 模式下读不阻塞写
+        conn = getattr(self._local, "connection", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = conn
+        return conn
+
+    # ---------------------------------------------------------------- 编码
+
+    def _dumps(self, value: Any) -> Tuple[str, bytes]:
+        type_, data = self.serde.dumps_typed(value)
+        if len(data) >= self.compress_min_bytes:
+            return f"z:{type_}", zlib.compress(data, self.compression_level)
+        return type_, data
+
+    def _loads(self, type_: str, data: bytes) -> Any:
+        if type_.startswith("z:"):
+            type_, data = type_[2:], zlib.decompress(data)
+        return self.serde.loads_typed((type_, data))
+
+    def _remember(self, key: Tuple[str, str, str], version: str, value: list, depth: int) -> None:
+        with self._recent_lock:
+            self._recent[key] = _RecentValue(version, list(value), depth)
+            self._recent.move_to_end(key)
+            while len(self._recent) > self.recent_size:
+                self._recent.popitem(last=False)
+
+    def _encode_blob(self, thread_id: str, checkpoint_ns: str, channel: str, version: str,
+                     value: Any) -> tuple:
+        """编码一个通道值，返回 blobs 表的一行"""
+        key = (thread_id, checkpoint_ns, channel)
+        if value is _MISSING:
+            return (*key, version, "empty", None, None, 0, None)
+        if not isinstance(value, list) or self.snapshot_interval <= 1:
+            return (*key, version, "full", *self._split(self._dumps(value)))
+        with self._recent_lock:
+            recent = self._recent.get(key)
+        base = recent.value if recent is not None else None
+        if base is not None and recent.depth + 1 < self.snapshot_interval and len(value) >= len(base) \
+                and all(a is b or a == b for a, b in zip(base, value)):
+            # 只保存相对上一个版本追加的元素
+            depth = recent.depth + 1
+            type_, data = self._dumps(value[len(base):])
+            row = (*key, version, "delta", type_, recent.version, depth, data)
+        else:
+            depth = 0
+            row = (*key, version, "full", *self._split(self._dumps(value)))
+        self._remember(key, version, value, depth)
+        return row
+
+    @staticmethod
+    def _split(dumped: Tuple[str, bytes]) -> tuple:
+        # (type, base_version, depth, value)
+        return dumped[0], None, 0, dumped[1]
+
+    def _load_blob(self, conn: sqlite3.Connection, thread_id: str, checkpoint_ns: str, channel: str,
+                   version: str) -> Any:
+        key = (thread_id, checkpoint_ns, channel)
+        with self._recent_lock:
+            recent = self._recent.get(key)
+            if recent is not None and recent.version == version:
+                return list(recent.value)
+        # 沿增量链回溯到最近的完整值，再依次追加
+        tails = []
+        current = version
+        depth = None
+        while True:
+            row = conn.execute(
+                "SELECT kind, type, base_version, depth, value FROM blobs "
+                "WHERE thread_id = ? AND checkpoint_ns = ? AND channel = ? AND version = ?",
+                (thread_id, checkpoint_ns, channel, current)).fetchone()
+            if row is None or row[0] == "empty":
+                return _MISSING
+            kind, type_, base_version, row_depth, data = row
+            if depth is None:
+                depth = row_depth
+            if kind == "full":
+                value = self._loads(type_, data)
+                break
+            tails.append(self._loads(type_, data))
+            current = base_version
+        if tails:
+            for tail in reversed(tails):
+                value = value + tail
+        if isinstance(value, list):
+            self._remember(key, version, value, depth)
+        return value
+
+    # ---------------------------------------------------------------- 读取
+
+    def _make_tuple(self, conn: sqlite3.Connection, thread_id: str, checkpoint_ns: str, row: tuple) -> CheckpointTuple:
+        checkpoint_id, parent_id, type_, data, metadata_type, metadata = row
+        checkpoint = self._loads(type_, data)
+        channel_values = {}
+        for channel, version in checkpoint["channel_versions"].items():
+            value = self._load_blob(conn, thread_id, checkpoint_ns, channel, str(version))
+            if value is not _MISSING:
+                channel_values[channel] = value
+        writes = conn.execute(
+            "SELECT task_id, idx, channel, type, value, task_path FROM writes "
+            "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+            (thread_id, checkpoint_ns, checkpoint_id)).fetchall()
+        writes.sort(key=lambda w: writes_sort_key(w[5], w[0], w[1]))
+        return CheckpointTuple(
+            config={"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns,
+                                     "checkpoint_id": checkpoint_id}},
+            checkpoint={**checkpoint, "channel_values": channel_values},
+            metadata=self._loads(metadata_type, metadata),
+            parent_config={"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns,
+                                            "checkpoint_id": parent_id}} if parent_id else None,
+            pending_writes=[(w[0], w[2], self._loads(w[3], w[4])) for w in writes],
+        )
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        """读取指定的 checkpoint，未指定 checkpoint_id 时读取会话最新的 checkpoint"""
+        conn = self._connection()
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        columns = "checkpoint_id, parent_id, type, checkpoint, metadata_type, metadata"
+        if checkpoint_id := get_checkpoint_id(config):
+            row = conn.execute(f"SELECT {columns} FROM checkpoints "
+                               f"WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                               (thread_id, checkpoint_ns, checkpoint_id)).fetchone()
+        else:
+            row = conn.execute(f"SELECT {columns} FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+                               f"ORDER BY checkpoint_id DESC LIMIT 1", (thread_id, checkpoint_ns)).fetchone()
+        return self._make_tuple(conn, thread_id, checkpoint_ns, row) if row is not None else None
+
+    def list(self, config: Optional[RunnableConfig], *, filter: Optional[Dict[str, Any]] = None,
+             before: Optional[RunnableConfig] = None, limit: Optional[int] = None) -> Iterator[CheckpointTuple]:
+        """按 checkpoint_id 从新到旧列出 checkpoint"""
+        conn = self._connection()
+        where, params = [], []
+        if config is not None:
+            where.append("thread_id = ?")
+            params.append(config["configurable"]["thread_id"])
+            if (checkpoint_ns := config["configurable"].get("checkpoint_ns")) is not None:
+                where.append("checkpoint_ns = ?")
+                params.append(checkpoint_ns)
+            if checkpoint_id := get_checkpoint_id(config):
+                where.append("checkpoint_id = ?")
+                params.append(checkpoint_id)
+        if before is not None and (before_id := get_checkpoint_id(before)):
+            where.append("checkpoint_id < ?")
+            params.append(before_id)
+        sql = ("SELECT thread_id, checkpoint_ns, checkpoint_id, parent_id, type, checkpoint, metadata_type, metadata "
+               "FROM checkpoints")
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY thread_id, checkpoint_ns, checkpoint_id DESC"
+        if limit is not None and not filter:
+            sql += f" LIMIT {int(limit)}"
+        for row in conn.execute(sql, params).fetchall():
+            if limit is not None and limit <= 0:
+                break
+            if filter:
+                metadata = self._loads(row[6], row[7])
+                if not all(metadata.get(k) == v for k, v in filter.items()):
+                    continue
+            if limit is not None:
+                limit -= 1
+            yield self._make_tuple(conn, row[0], row[1], row[2:])
+
+    # ---------------------------------------------------------------- 写入
+
+    def put(self, config: RunnableConfig, checkpoint: Checkpoint, metadata: CheckpointMetadata,
+            new_versions: ChannelVersions) -> RunnableConfig:
+        """追加一个 checkpoint，只写入版本发生变化的通道值"""
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        parent_id = config["configurable"].get("checkpoint_id")
+        skeleton = checkpoint.copy()
+        values = skeleton.pop("channel_values")
+        blobs = [self._encode_blob(thread_id, checkpoint_ns, channel, str(version), values.get(channel, _MISSING))
+                 for channel, version in new_versions.items()]
+        type_, data = self._dumps(skeleton)
+        metadata_type, metadata_data = self._dumps(get_checkpoint_metadata(config, metadata))
+
+        with self._write_lock:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.executemany("INSERT OR REPLACE INTO blobs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", blobs)
+                conn.execute("INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                             (thread_id, checkpoint_ns, checkpoint["id"], parent_id, type_, data,
+                              metadata_type, metadata_data))
+                count = conn.execute(
+                    "INSERT INTO threads VALUES (?, ?, 1) ON CONFLICT(thread_id) DO UPDATE "
+                    "SET updated_at = excluded.updated_at, checkpoints = checkpoints + 1 RETURNING checkpoints",
+                    (thread_id, time.time())).fetchone()[0]
+                if self.keep_last is not None and count > self.keep_last + self.prune_batch:
+                    self._prune_thread(conn, thread_id, self.keep_last)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        self._start_compactor()
+        return {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns,
+                                 "checkpoint_id": checkpoint["id"]}}
+
+    def put_writes(self, config: RunnableConfig, writes: Sequence[Tuple[str, Any]], task_id: str,
+                   task_path: str = "") -> None:
+        """保存节点产生的中间写入（pending writes）"""
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+        rows = [(thread_id, checkpoint_ns, checkpoint_id, task_id, WRITES_IDX_MAP.get(channel, idx), channel,
+                 *self._dumps(value), task_path) for idx, (channel, value) in enumerate(writes)]
+        # 特殊通道（错误、中断等）的写入覆盖旧值，普通写入保持第一次写入的值
+        verb = "INSERT OR REPLACE" if all(channel in WRITES_IDX_MAP for channel, _ in writes) else "INSERT OR IGNORE"
+        with self._write_lock:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.executemany(f"{verb} INTO writes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+    # ---------------------------------------------------------------- 清理
+
+    def _prune_thread(self, conn: sqlite3.Connection, thread_id: str, keep_last: int) -> None:
+        """每个命名空间只保留最近 keep_last 个 checkpoint，删除不再被引用的通道值（保留增量链）"""
+        namespaces = [row[0] for row in conn.execute(
+            "SELECT DISTINCT checkpoint_ns FROM checkpoints WHERE thread_id = ?", (thread_id,))]
+        for checkpoint_ns in namespaces:
+            kept = conn.execute(
+                "SELECT checkpoint_id, type, checkpoint FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+                "ORDER BY checkpoint_id DESC LIMIT ?", (thread_id, checkpoint_ns, keep_last)).fetchall()
+            if not kept:
+                continue
+            oldest = kept[-1][0]
+            conn.execute("DELETE FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id < ?",
+                         (thread_id, checkpoint_ns, oldest))
+            conn.execute("DELETE FROM writes WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id < ?",
+                         (thread_id, checkpoint_ns, oldest))
+
+            needed: Set[Tuple[str, str]] = set()
+            for _, type_, data in kept:
+                for channel, version in self._loads(type_, data)["channel_versions"].items():
+                    needed.add((channel, str(version)))
+            blobs = {(row[0], row[1]): row[2] for row in conn.execute(
+                "SELECT channel, version, base_version FROM blobs WHERE thread_id = ? AND checkpoint_ns = ?",
+                (thread_id, checkpoint_ns))}
+            # 被引用的增量值依赖它的基础版本，沿增量链全部保留
+            pending = list(needed)
+            while pending:
+                channel, version = pending.pop()
+                base_version = blobs.get((channel, version))
+                if base_version is not None and (channel, base_version) not in needed:
+                    needed.add((channel, base_version))
+                    pending.append((channel, base_version))
+            conn.executemany(
+                "DELETE FROM blobs WHERE thread_id = ? AND checkpoint_ns = ? AND channel = ? AND version = ?",
+                [(thread_id, checkpoint_ns, channel, version) for channel, version in blobs
+                 if (channel, version) not in needed])
+        conn.execute("UPDATE threads SET checkpoints = (SELECT COUNT(*) FROM checkpoints WHERE thread_id = ?) "
+                     "WHERE thread_id = ?", (thread_id, thread_id))
+
+    def _delete_thread(self, conn: sqlite3.Connection, thread_id: str) -> None:
+        for table in ("checkpoints", "blobs", "writes", "threads"):
+            conn.execute(f"DELETE FROM {table} WHERE thread_id = ?", (thread_id,))
+        with self._recent_lock:
+            for key in [key for key in self._recent if key[0] == thread_id]:
+                del self._recent[key]
+
+    def delete_thread(self, thread_id: str) -> None:
+        """删除会话的全部 checkpoint、通道值和中间写入"""
+        with self._write_lock:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._delete_thread(conn, thread_id)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+    def prune(self, thread_ids: Sequence[str], *, strategy: str = "keep_latest") -> None:
+        """清理指定会话："keep_latest" 每个命名空间只保留最新的 checkpoint，"delete" 删除整个会话"""
+        if strategy not in ("keep_latest", "delete"):
+            raise ValueError(f"不支持的清理策略: {strategy}")
+        with self._write_lock:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                for thread_id in thread_ids:
+                    if strategy == "delete":
+                        self._delete_thread(conn, thread_id)
+                    else:
+                        self._prune_thread(conn, thread_id, 1)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+    def compact(self) -> Dict[str, Any]:
+        """执行保留策略并回收磁盘空间
+
+        删除超过 thread_ttl 未更新的会话和超出 max_threads 的最旧会话，
+        然后把 WAL 合并回主文件并截断，归还空闲页。返回删除的会话数量和压缩后的文件大小。
+        """
+        conn = self._connection()
+        stale = []
+        if self.thread_ttl is not None:
+            stale += [row[0] for row in conn.execute(
+                "SELECT thread_id FROM threads WHERE updated_at < ?", (time.time() - self.thread_ttl,))]
+        if self.max_threads is not None:
+            stale += [row[0] for row in conn.execute(
+                "SELECT thread_id FROM threads ORDER BY updated_at DESC LIMIT -1 OFFSET ?", (self.max_threads,))]
+        stale = list(dict.fromkeys(stale))
+        if stale:
+            # 分批删除，避免长时间持有写锁
+            for start in range(0, len(stale), 100):
+                self.prune(stale[start:start + 100], strategy="delete")
+        with self._write_lock:
+            conn.execute("PRAGMA incremental_vacuum")
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        stats = self.stats()
+        stats["deleted_threads"] = len(stale)
+        if stale:
+            log.debug(f"checkpoint 存储已删除 {len(stale)} 个过期会话，当前文件大小 {stats['file_bytes']} 字节")
+        return stats
+
+    def stats(self) -> Dict[str, Any]:
+        """返回会话、checkpoint、通道值和中间写入的数量以及数据库文件（含 WAL）大小"""
+        conn = self._connection()
+        counts = {table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                  for table in ("threads", "checkpoints", "blobs", "writes")}
+        files = [self.path, f"{self.path}-wal"]
+        counts["file_bytes"] = sum(os.path.getsize(f) for f in files if os.path.exists(f))
+        return counts
+
+    def _start_compactor(self) -> None:
+        if self.compact_interval is None or self._compactor is not None:
+            return
+
+        def run():
+            while not self._stop.wait(self.compact_interval):
+                try:
+                    self.compact()
+                except Exception as e:
+                    log.exception(e)
+
+        self._compactor = threading.Thread(target=run, name="checkpoint-compactor", daemon=True)
+        self._compactor.start()
+
+    def close(self) -> None:
+        """停止后台压缩线程并关闭当前线程的连接"""
+        self._stop.set()
+        conn = getattr(self._local, "connection", None)
+        if conn is not None:
+            conn.close()
+            self._local.connection = None
+
+    def get_next_version(self, current: Optional[str], channel: None = None) -> str:
+        # 版本号为定长字符串，按字典序即可比较新旧
+        if current is None:
+            current_v = 0
+        elif isinstance(current, int):
+            current_v = current
+        else:
+            current_v = int(current.split(".")[0])
+        return f"{current_v + 1:032}.{random.random():016}"
+
+    # ---------------------------------------------------------------- 异步
+
+    async def _run(self, fn, *args, **kwargs):
+        return await asyncio.get_running_loop().run_in_executor(None, partial(fn, *args, **kwargs))
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await self._run(self.get_tuple, config)
+
+    async def alist(self, config: Optional[RunnableConfig], *, filter: Optional[Dict[str, Any]] = None,
+                    before: Optional[RunnableConfig] = None,
+                    limit: Optional[int] = None) -> AsyncIterator[CheckpointTuple]:
+        items = await self._run(lambda: list(self.list(config, filter=filter, before=before, limit=limit)))
+        for item in items:
+            yield item
+
+    async def aput(self, config: RunnableConfig, checkpoint: Checkpoint, metadata: CheckpointMetadata,
+                   new_versions: ChannelVersions) -> RunnableConfig:
+        return await self._run(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(self, config: RunnableConfig, writes: Sequence[Tuple[str, Any]], task_id: str,
+                          task_path: str = "") -> None:
+        await self._run(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await self._run(self.delete_thread, thread_id)
+
+    async def aprune(self, thread_ids: Sequence[str], *, strategy: str = "keep_latest") -> None:
+        await self._run(self.prune, thread_ids, strategy=strategy)
+
+
+# 进程级注册表：相同路径的 agent 共享同一个 checkpointer
+_savers: Dict[str, SQLiteCheckpointSaver] = {}
+_registry_lock = threading.Lock()
+
+
+def get_checkpointer(path: Optional[str] = None, **options) -> SQLiteCheckpointSaver:
+    """获取（或创建）指定路径的进程级 checkpointer，未指定路径时使用环境变量 CHECKPOINT_DB_PATH"""
+    from agent.env_utils import CHECKPOINT_DB_PATH, CHECKPOINT_KEEP_LAST, CHECKPOINT_THREAD_TTL
+
+    path = os.path.abspath(path or CHECKPOINT_DB_PATH)
+    with _registry_lock:
+        saver = _savers.get(path)
+        if saver is None:
+            options = {"keep_last": CHECKPOINT_KEEP_LAST, "thread_ttl": CHECKPOINT_THREAD_TTL, **options}
+            saver = _savers[path] = SQLiteCheckpointSaver(path, **options)
+        return saver
+
+
+@asynccontextmanager
+async def generate_checkpointer() -> AsyncIterator[SQLiteCheckpointSaver]:
+    """langgraph.json 中 checkpointer.path 使用的工厂"""
+    yield get_checkpointer()
@@ -0,0 +1,274 @@
+import json
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from langchain.agents.middleware import AgentMiddleware, ModelRequest, ModelResponse
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, ToolMessage
+
+from agent.utils.format_utils import estimate_tokens
+from agent.utils.log_utils import log
+from agent.utils.perf_utils import metrics
+from agent.utils.sql_utils import extract_table_names
+
+_re_schema_table = re.compile(r"^表名: (\S+)$", re.M)
+_re_schema_column = re.compile(r"^  - (\S+) \(")
+_re_ddl_table = re.compile(r"^([^\s(]+)\((.*)\)$", re.M)
+_re_ddl_column = re.compile(r"(?:^|, )([^\s,']+) ")
+_re_search_table = re.compile(r"^- ([^:\s]+): ", re.M)
+_re_list_table = re.compile(r"^(?:\d+\. 表名: |)(\S+?)(?::.*)?$", re.M)
+
+# 摘要中每张表最多列出的列数、表列表最多列出的表数
+MAX_DIGEST_COLUMNS = 30
+MAX_DIGEST_TABLES = 50
+
+
+def _schema_tables(content: str) -> List[Tuple[str, List[str]]]:
+    """从表模式输出（default 或 ddl 格式）中提取 (表名, 列名列表)"""
+    tables = []
+    if _re_schema_table.search(content):
+        for block in content.split("表名: ")[1:]:
+            lines = block.splitlines()
+            columns = [m.group(1) for m in map(_re_schema_column.match, lines) if m]
+            tables.append((lines[0].strip(), columns))
+        return tables
+    for m in _re_ddl_table.finditer(content):
+        tables.append((m.group(1), _re_ddl_column.findall(m.group(2))))
+    return tables
+
+
+def _format_tables(tables: List[Tuple[str, List[str]]]) -> str:
+    parts = []
+    for name, columns in tables:
+        shown = ", ".join(columns[:MAX_DIGEST_COLUMNS])
+        if len(columns) > MAX_DIGEST_COLUMNS:
+            shown += f", ...共 {len(columns)} 列"
+        parts.append(f"{name}({shown})" if columns else name)
+    return "; ".join(parts)
+
+
+def digest_schema(content: str, args: Dict[str, Any]) -> str:
+    tables = _schema_tables(content)
+    return f"表结构: {_format_tables(tables)}" if tables else "未解析到表结构"
+
+
+def digest_search(content: str, args: Dict[str, Any]) -> str:
+    names = _re_search_table.findall(content.split("\n\n", 1)[0])
+    tables = dict(_schema_tables(content))
+    return f"检索到的表: {_format_tables([(name, tables.get(name, [])) for name in names])}"
+
+
+def digest_table_list(content: str, args: Dict[str, Any]) -> str:
+    lines = [line for line in content.splitlines()[1:] if line and not line.startswith(("    描述", "..."))]
+    names = [m.group(1) for m in map(_re_list_table.match, lines) if m]
+    shown = ", ".join(names[:MAX_DIGEST_TABLES])
+    if len(names) > MAX_DIGEST_TABLES:
+        shown += f", ...共 {len(names)} 张表"
+    return f"{content.splitlines()[0] if content else ''}{shown}"
+
+
+def _result_rows(lines: List[str]) -> Tuple[Optional[List[str]], int]:
+    """根据查询结果的格式（repr / csv / tsv / markdown）返回 (列名, 行数)"""
+    if not lines:
+        return None, 0
+    if lines[0].startswith("("):
+        return None, len(lines)
+    if lines[0].startswith("|"):
+        columns = [c.strip() for c in lines[0].strip("|").split("|")]
+        return columns, max(len(lines) - 2, 0)
+    separator = "\t" if "\t" in lines[0] else ","
+    return [c.strip() for c in lines[0].split(separator)], len(lines) - 1
+
+
+def digest_query(content: str, args: Dict[str, Any]) -> str:
+    query = str(args.get("query", ""))
+    lines = [line for line in content.splitlines() if line and not line.startswith(("...（", "（注意"))]
+    columns, rows = _result_rows(lines)
+    truncated = "（结果曾被截断）" if "...（结果已截断" in content else ""
+    digest = f"SQL: {query}；引用的表: {', '.join(extract_table_names(query)) or '无'}；返回 {rows} 行{truncated}"
+    if columns:
+        digest += f"；列: {', '.join(columns[:MAX_DIGEST_COLUMNS])}"
+    if lines:
+        first = lines[1] if columns and len(lines) > 1 and not lines[0].startswith("(") else lines[0]
+        digest += f"；首行: {first[:200]}"
+    return digest
+
+
+def digest_discovery(content: str, args: Dict[str, Any]) -> str:
+    _, _, schema = content.partition("与问题最相关的表")
+    digest = content.splitlines()[0].rstrip("：") if content else ""
+    return f"{digest}；{digest_search(schema, args)}" if schema else digest
+
+
+# 工具名 -> 摘要函数(工具输出, 工具参数)
+DEFAULT_DIGESTERS: Dict[str, Callable[[str, Dict[str, Any]], str]] = {
+    "sql_db_table_schema": digest_schema,
+    "sql_db_search_tables": digest_search,
+    "sql_db_discover_tables": digest_discovery,
+    "sql_db_list_tables": digest_table_list,
+    "sql_db_query": digest_query,
+    "sql_db_query_checked": digest_query,
+}
+
+
+def message_tokens(message: BaseMessage) -> int:
+    """估算一条消息的 token 数（内容 + 工具调用参数）"""
+    content = message.content if isinstance(message.content, str) else json.dumps(message.content, ensure_ascii=False)
+    tokens = estimate_tokens(content) + 4
+    for call in getattr(message, "tool_calls", None) or []:
+        tokens += estimate_tokens(call["name"]) + estimate_tokens(json.dumps(call["args"], ensure_ascii=False))
+    return tokens
+
+
+class ToolResultCompactionMiddleware(AgentMiddleware):
+    """压缩发送给模型的历史工具结果
+
+    只修改发给模型的消息，会话状态（checkpoint）中保留完整的工具输出：
+    - 当前问题最近 keep_recent 个工具结果保持原样，更早的结果（包括之前轮次的）替换为摘要：
+      表结构输出保留表名和列名，查询结果保留 SQL、引用的表、行数、列名和首行，
+      并注明调用方式，需要时用相同参数再次调用即可（表结构和查询结果都有缓存）
+    - 仍超过 max_tokens 时继续压缩较新的工具结果（最后一个除外），再不够时丢弃最早的完整轮次
+    每次模型调用节省的 token 数记录在返回消息的 response_metadata["context_compaction"] 中，
+    并导出到指标 agent_context_tokens_saved。
+    """
+
+    def __init__(self, max_tokens: Optional[int] = 8000, keep_recent: int = 2, min_tokens: int = 200,
+                 digesters: Optional[Dict[str, Callable[[str, Dict[str, Any]], str]]] = None,
+                 digest_cache_size: int = 4096):
+        """初始化压缩中间件
+
+        Args:
+            max_tokens: 每次模型调用的消息 token 预算（估算值，不含系统提示词），None 表示只压缩历史结果
+            keep_recent: 当前问题中保持原样的最近工具结果数量
+            min_tokens: 小于该 token 数的工具结果不压缩
+            digesters: 工具名到摘要函数的映射，默认为 DEFAULT_DIGESTERS，未配置的工具使用输出开头的片段
+            digest_cache_size: 缓存的摘要数量（按工具调用 ID 和结果内容），同一个结果只生成一次摘要
+        """
+        super().__init__()
+        self.max_tokens = max_tokens
+        self.keep_recent = keep_recent
+        self.min_tokens = min_tokens
+        self.digesters = DEFAULT_DIGESTERS if digesters is None else digesters
+        self.digest_cache_size = digest_cache_size
+        self._digests: "OrderedDict[Tuple[str, str, int], Tuple[ToolMessage, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.tokens_before = 0
+        self.tokens_after = 0
+
+    def _digest(self, message: ToolMessage, call: Optional[Dict[str, Any]]) -> Tuple[ToolMessage, int]:
+        content = message.content if isinstance(message.content, str) else str(message.content)
+        name = message.name or (call["name"] if call else "tool")
+        # 工具调用 ID 由模型生成，不同会话中可能重复，缓存键同时包含工具名和结果内容
+        key = (message.tool_call_id, name, hash(content))
+        with self._lock:
+            cached = self._digests.get(key)
+            if cached is not None:
+                self._digests.move_to_end(key)
+                return cached
+        args = call["args"] if call else {}
+        digester = self.digesters.get(name)
+        try:
+            summary = digester(content, args) if digester is not None else content[:200]
+        except Exception as e:
+            log.warning(f"生成工具结果摘要失败: {e}")
+            summary = content[:200]
+        arguments = json.dumps(args, ensure_ascii=False)
+        compacted = message.model_copy(update={
+            "content": f"[已压缩的工具结果，原输出约 {estimate_tokens(content)} tokens] {summary}。"
+                       f"如需完整内容，请使用相同参数再次调用 {name}({arguments})，结果已缓存。",
+            "artifact": None,
+            "response_metadata": {**message.response_metadata, "context_compaction": {"compacted": True}},
+        })
+        result = (compacted, message_tokens(compacted))
+        with self._lock:
+            self._digests[key] = result
+            while len(self._digests) > self.digest_cache_size:
+                self._digests.popitem(last=False)
+        return result
+
+    def compact(self, messages: List[BaseMessage]) -> Tuple[List[BaseMessage], int, int]:
+        """返回 (压缩后的消息, 压缩前 token 数, 压缩后 token 数)"""
+        messages = list(messages)
+        tokens = [message_tokens(m) for m in messages]
+        before = sum(tokens)
+        calls = {call["id"]: call for m in messages if isinstance(m, AIMessage) for call in m.tool_calls}
+        last_human = max((i for i, m in enumerate(messages) if isinstance(m, HumanMessage)), default=-1)
+        tool_indexes = [i for i, m in enumerate(messages) if isinstance(m, ToolMessage)]
+        recent = set([i for i in tool_indexes if i > last_human][-self.keep_recent:] if self.keep_recent else [])
+
+        def compact_at(i):
+            nonlocal total
+            if tokens[i] < self.min_tokens:
+                return
+            compacted, new_tokens = self._digest(messages[i], calls.get(messages[i].tool_call_id))
+            if new_tokens >= tokens[i]:
+                return
+            messages[i] = compacted
+            total -= tokens[i] - new_tokens
+            tokens[i] = new_tokens
+
+        total = before
+        for i in tool_indexes:
+            if i not in recent:
+                compact_at(i)
+        if self.max_tokens is not None and total > self.max_tokens:
+            # 超出预算：继续压缩较新的工具结果，最后一个工具结果是模型这一步要用的，保持原样
+            for i in sorted(recent)[:-1]:
+                if total <= self.max_tokens:
+                    break
+                compact_at(i)
+        if self.max_tokens is not None and total > self.max_tokens:
+            # 仍超出预算：从最早的轮次开始整轮丢弃（用户问题及其后的工具调用和回答），保留当前问题所在的轮次
+            humans = [i for i, m in enumerate(messages) if isinstance(m, HumanMessage)]
+            dropped = 0
+            for start, end in zip(humans, humans[1:]):
+                if total <= self.max_tokens:
+                    break
+                total -= sum(tokens[start:end])
+                dropped = end
+            if dropped:
+                log.warning(f"消息超过 token 预算 {self.max_tokens}，已丢弃最早的 {humans.index(dropped)} 轮对话")
+                messages, tokens = messages[dropped:], tokens[dropped:]
+        return messages, before, total
+
+    def _prepare(self, request: ModelRequest) -> Tuple[ModelRequest, Dict[str, int]]:
+        messages, before, after = self.compact(request.messages)
+        report = {"tokens_before": before, "tokens_after": after, "tokens_saved": before - after}
+        with self._lock:
+            self.calls += 1
+            self.tokens_before += before
+            self.tokens_after += after
+        metrics.observe("agent_context_tokens_saved", before - after)
+        if before != after:
+            log.debug(f"上下文压缩: {before} -> {after} tokens")
+            request = request.override(messages=messages)
+        return request, report
+
+    @staticmethod
+    def _annotate(response: Any, report: Dict[str, int]) -> Any:
+        messages = response.result if isinstance(response, ModelResponse) else [response]
+        for message in messages:
+            if isinstance(message, AIMessage):
+                message.response_metadata["context_compaction"] = report
+        return response
+
+    def wrap_model_call(self, request: ModelRequest, handler: Callable[[ModelRequest], ModelResponse]):
+        request, report = self._prepare(request)
+        return self._annotate(handler(request), report)
+
+    async def awrap_model_call(self, request: ModelRequest, handler):
+        request, report = self._prepare(request)
+        return self._annotate(await handler(request), report)
+
+    def stats(self) -> Dict[str, Any]:
+        """返回模型调用次数、压缩前后的 token 总数和节省的 token 数"""
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "tokens_before": self.tokens_before,
+                "tokens_after": self.tokens_after,
+                "tokens_saved": self.tokens_before - self.tokens_after,
+                "avg_saved_per_call": (self.tokens_before - self.tokens_after) / self.calls if self.calls else 0.0,
+            }
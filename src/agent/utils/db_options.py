@@ -0,0 +1,109 @@
+from typing import List, Optional
+
+from agent.utils.query_cache import QueryResultCache
+from agent.utils.query_guard import COST_GUARD_MODES
+from agent.utils.replica_router import LagProbe
+
+
+class CacheOptions:
+    """MySQLDataBaseManager 的缓存配置：表结构缓存、查询结果缓存和执行计划缓存"""
+
+    __slots__ = ("schema_ttl", "schema_size", "version_check_interval", "query_cache", "plan_ttl", "plan_size")
+
+    def __init__(self, schema_ttl: float = 300.0, schema_size: int = 1024, version_check_interval: float = 5.0,
+                 query_cache: Optional[QueryResultCache] = None, plan_ttl: float = 600.0, plan_size: int = 512):
+        """
+        Args:
+            schema_ttl: 表结构缓存的存活时间（秒）
+            schema_size: 表结构缓存最多保存的表数量（LRU 淘汰）
+            version_check_interval: 两次查询表版本信息之间的最小间隔（秒），0 表示每次都检查
+            query_cache: 查询结果缓存，为 None 时不缓存；缓存条目随引用表的版本变化自动失效
+            plan_ttl: EXPLAIN 执行计划缓存的存活时间（秒）
+            plan_size: EXPLAIN 执行计划缓存最多保存的查询数量
+        """
+        self.schema_ttl = schema_ttl
+        self.schema_size = schema_size
+        self.version_check_interval = version_check_interval
+        self.query_cache = query_cache
+        self.plan_ttl = plan_ttl
+        self.plan_size = plan_size
+
+
+class GuardOptions:
+    """MySQLDataBaseManager 的查询防护配置：LIMIT 注入、成本检查、执行时间和返回结果的上限"""
+
+    __slots__ = ("query_limit", "cost_guard", "max_estimated_rows", "statement_timeout", "max_result_rows",
+                 "max_result_bytes")
+
+    def __init__(self, query_limit: Optional[int] = None, cost_guard: str = "off",
+                 max_estimated_rows: int = 1_000_000, statement_timeout: Optional[float] = None,
+                 max_result_rows: Optional[int] = 1000, max_result_bytes: Optional[int] = 64 * 1024):
+        """
+        Args:
+            query_limit: 执行查询前在顶层注入（或收紧）的 LIMIT 行数，None 表示不修改查询
+            cost_guard: 执行前的成本检查模式："off" 不检查，"warn" 在结果前附加提示，"reject" 拒绝执行，
+                成本为 EXPLAIN 估算的处理行数
+            max_estimated_rows: 成本检查的估算行数上限
+            statement_timeout: 单条查询的执行时间上限（秒），None 表示不限制；
+                MySQL 使用 max_execution_time，SQLite 到期后中断查询
+            max_result_rows: execute_query 最多返回的行数，None 表示不限制
+            max_result_bytes: execute_query 返回结果的最大字节数（UTF-8），None 表示不限制
+        """
+        if cost_guard not in COST_GUARD_MODES:
+            raise ValueError(f"不支持的成本检查模式: {cost_guard}，可选值: {', '.join(COST_GUARD_MODES)}")
+        self.query_limit = query_limit
+        self.cost_guard = cost_guard
+        self.max_estimated_rows = max_estimated_rows
+        self.statement_timeout = statement_timeout
+        self.max_result_rows = max_result_rows
+        self.max_result_bytes = max_result_bytes
+
+
+class ExportOptions:
+    """MySQLDataBaseManager.export_query 的配置：导出目录、分批大小、导出上限和文件清理策略"""
+
+    __slots__ = ("directory", "chunk_size", "max_rows", "timeout", "max_estimated_rows", "retention", "max_files")
+
+    def __init__(self, directory: str = ".exports", chunk_size: int = 10000, max_rows: Optional[int] = None,
+                 timeout: Optional[float] = None, max_estimated_rows: Optional[int] = None,
+                 retention: Optional[float] = 7 * 86400.0, max_files: Optional[int] = 100):
+        """
+        Args:
+            directory: 导出文件的目录
+            chunk_size: 导出时每批读取和写入的行数
+            max_rows: 单次导出的最大行数，None 表示不限制；导出不受 query_limit 约束，
+                而是在查询顶层注入 LIMIT max_rows + 1
+            timeout: 导出查询的执行时间上限（秒），None 表示沿用 GuardOptions.statement_timeout
+            max_estimated_rows: 导出查询允许的最大估算行数（按 cost_guard 处理），
+                None 表示沿用 GuardOptions.max_estimated_rows
+            retention: 自动生成的导出文件的保留时间（秒），每次导出前清理过期文件，None 表示不按时间清理
+            max_files: 导出目录中最多保留的自动生成的导出文件数，超出时删除最旧的文件，None 表示不限制
+        """
+        self.directory = directory
+        self.chunk_size = chunk_size
+        self.max_rows = max_rows
+        self.timeout = timeout
+        self.max_estimated_rows = max_estimated_rows
+        self.retention = retention
+        self.max_files = max_files
+
+
+class RoutingOptions:
+    """MySQLDataBaseManager 的只读副本路由配置，参见 replica_router.ReplicaRouter"""
+
+    __slots__ = ("replicas", "max_lag", "check_interval", "lag_probe")
+
+    def __init__(self, replicas: Optional[List[str]] = None, max_lag: float = 30.0,
+                 check_interval: Optional[float] = 5.0, lag_probe: Optional[LagProbe] = None):
+        """
+        Args:
+            replicas: 只读副本的连接字符串列表；指定后查询、校验和表结构读取都路由到副本
+                （进行中请求最少者优先），没有可用副本时回退到主库
+            max_lag: 允许的最大复制延迟（秒），超过后暂停使用该副本
+            check_interval: 副本后台健康检查的间隔（秒），None 表示不检查
+            lag_probe: 复制延迟探测函数，默认读取 MySQL 的复制状态，参见 replica_router.default_lag_probe
+        """
+        self.replicas = replicas
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.lag_probe = lag_probe
@@ -0,0 +1,274 @@
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
+
+from agent.utils.log_utils import log
+
+# 未单独配置的数据库使用的连接池参数（与原先硬编码的值一致）
+DEFAULT_POOL_OPTIONS = {
+    "pool_size": 5,
+    "max_overflow": 10,
+    "pool_recycle": 3600,
+    "pool_pre_ping": False,
+    "pool_timeout": 30,
+}
+
+# 同步驱动到异步驱动的映射，用于自动推导异步连接字符串
+ASYNC_DRIVERS = {
+    "mysql": "mysql+aiomysql",
+    "mysql+pymysql": "mysql+aiomysql",
+    "mysql+mysqldb": "mysql+aiomysql",
+    "sqlite": "sqlite+aiosqlite",
+    "sqlite+pysqlite": "sqlite+aiosqlite",
+}
+
+
+def derive_async_url(connection: str) -> str:
+    """根据同步连接字符串推导对应的异步连接字符串"""
+    sync_url = make_url(connection)
+    if sync_url.drivername not in ASYNC_DRIVERS:
+        raise ValueError(f"无法根据连接字符串推导异步驱动: {sync_url.drivername}，请指定 async_connection")
+    return sync_url.set(drivername=ASYNC_DRIVERS[sync_url.drivername]).render_as_string(hide_password=False)
+
+
+class PoolStats:
+    """单个引擎的连接池统计：借出次数、等待时间和最近一次使用时间"""
+
+    __slots__ = ("checkouts", "wait_count", "wait_total", "wait_max", "last_used", "disposals")
+
+    def __init__(self):
+        self.checkouts = 0
+        self.wait_count = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.last_used = time.monotonic()
+        self.disposals = 0
+
+
+class _EngineState:
+    __slots__ = ("engine", "options", "stats", "is_async")
+
+    def __init__(self, engine, options: Dict[str, Any], is_async: bool):
+        self.engine = engine
+        self.options = options
+        self.stats = PoolStats()
+        self.is_async = is_async
+
+    @property
+    def sync_engine(self) -> Engine:
+        return self.engine.sync_engine if self.is_async else self.engine
+
+
+class EngineRegistry:
+    """进程级引擎注册表
+
+    以连接串为键复用 SQLAlchemy 引擎，同一个数据库在进程内只有一个连接池（一份连接预算），
+    不论创建了多少个数据库管理器或工具集。每个数据库可以单独配置连接池参数，
+    长时间没有连接借出的引擎会被自动释放连接（dispose），引擎本身仍可继续使用，
+    下次使用时按需重新建立连接。
+    """
+
+    def __init__(self, idle_timeout: Optional[float] = 600.0, reap_interval: float = 60.0):
+        """初始化注册表
+
+        Args:
+            idle_timeout: 引擎空闲多久（秒）后释放其连接池中的连接，None 表示不自动释放
+            reap_interval: 后台检查空闲引擎的间隔（秒）
+        """
+        self.idle_timeout = idle_timeout
+        self.reap_interval = reap_interval
+        self._lock = threading.Lock()
+        self._engines: Dict[str, _EngineState] = {}
+        self._by_engine: Dict[int, _EngineState] = {}
+        self._options: Dict[str, Dict[str, Any]] = {}
+        self._reaper: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def configure(self, connection: str, **options) -> None:
+        """为指定数据库设置连接池参数（pool_size、max_overflow、pool_recycle、pool_pre_ping、pool_timeout 等）
+
+        需要在该数据库的引擎第一次创建之前调用，之后的调用只对重新创建的引擎生效。
+        """
+        with self._lock:
+            self._options[connection] = {**self._options.get(connection, {}), **options}
+            if connection in self._engines:
+                log.warning(f"数据库引擎已创建，新的连接池参数将在引擎重建后生效: {self._engines[connection].engine.url!r}")
+
+    def options_for(self, connection: str) -> Dict[str, Any]:
+        """返回通过 configure 为指定数据库设置的连接池参数"""
+        with self._lock:
+            return dict(self._options.get(connection, {}))
+
+    def _resolve_options(self, connection: str, options: Dict[str, Any]) -> Dict[str, Any]:
+        return {**DEFAULT_POOL_OPTIONS, **self._options.get(connection, {}), **options}
+
+    def _register(self, connection: str, engine, options: Dict[str, Any], is_async: bool) -> _EngineState:
+        state = _EngineState(engine, options, is_async)
+        stats = state.stats
+
+        @event.listens_for(state.sync_engine, "checkout")
+        def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+            stats.checkouts += 1
+            stats.last_used = time.monotonic()
+
+        @event.listens_for(state.sync_engine, "checkin")
+        def _on_checkin(dbapi_connection, connection_record):
+            stats.last_used = time.monotonic()
+
+        self._engines[connection] = state
+        self._by_engine[id(state.sync_engine)] = state
+        self._start_reaper()
+        return state
+
+    def get_engine(self, connection: str, **options) -> Engine:
+        """获取（或创建）连接串对应的同步引擎
+
+        Args:
+            connection: 数据库连接字符串
+            options: 连接池参数，覆盖 configure 中的配置；引擎已存在且参数不同时沿用已有引擎
+        """
+        with self._lock:
+            state = self._engines.get(connection)
+            if state is None:
+                resolved = self._resolve_options(connection, options)
+                state = self._register(connection, create_engine(connection, **resolved), resolved, False)
+            elif options and any(state.options.get(k) != v for k, v in options.items()):
+                log.warning(f"数据库引擎已存在，忽略不同的连接池参数: {options}")
+            return state.engine
+
+    def get_async_engine(self, connection: str, **options):
+        """获取（或创建）异步连接串对应的异步引擎（AsyncEngine）"""
+        with self._lock:
+            state = self._engines.get(connection)
+            if state is None:
+                from sqlalchemy.ext.asyncio import create_async_engine
+
+                resolved = self._resolve_options(connection, options)
+                state = self._register(connection, create_async_engine(connection, **resolved), resolved, True)
+            return state.engine
+
+    def record_wait(self, engine: Engine, seconds: float) -> None:
+        """记录一次从连接池获取连接的等待时间"""
+        state = self._by_engine.get(id(engine))
+        if state is None:
+            return
+        stats = state.stats
+        stats.wait_count += 1
+        stats.wait_total += seconds
+        stats.wait_max = max(stats.wait_max, seconds)
+
+    @staticmethod
+    def _pool_stats(state: _EngineState) -> Dict[str, Any]:
+        pool = state.sync_engine.pool
+        stats = state.stats
+
+        def call(name):
+            fn = getattr(pool, name, None)
+            return fn() if fn is not None else None
+
+        return {
+            "url": state.sync_engine.url.render_as_string(hide_password=True),
+            "async": state.is_async,
+            "pool_class": type(pool).__name__,
+            "pool_size": call("size"),
+            "checked_out": call("checkedout"),
+            "checked_in": call("checkedin"),
+            "overflow": call("overflow"),
+            "checkouts": stats.checkouts,
+            "wait_count": stats.wait_count,
+            "wait_avg_ms": stats.wait_total / stats.wait_count * 1000 if stats.wait_count else 0.0,
+            "wait_max_ms": stats.wait_max * 1000,
+            "idle_seconds": time.monotonic() - stats.last_used,
+            "disposals": stats.disposals,
+        }
+
+    def stats(self, connection: Optional[str] = None) -> Any:
+        """返回连接池统计信息；指定连接串时只返回该数据库的统计，否则返回全部"""
+        with self._lock:
+            if connection is not None:
+                state = self._engines.get(connection)
+                return self._pool_stats(state) if state is not None else None
+            return [self._pool_stats(state) for state in self._engines.values()]
+
+    def close_idle(self, idle_timeout: Optional[float] = None) -> List[str]:
+        """释放空闲引擎的连接池，返回被释放的引擎 URL（隐藏密码）
+
+        没有借出连接且超过 idle_timeout 秒没有使用的同步引擎会被 dispose。
+        异步引擎需要在事件循环中释放，不在这里处理，可使用 adispose。
+        """
+        idle_timeout = self.idle_timeout if idle_timeout is None else idle_timeout
+        if idle_timeout is None:
+            return []
+        closed = []
+        now = time.monotonic()
+        with self._lock:
+            states = [s for s in self._engines.values() if not s.is_async]
+        for state in states:
+            checkedout = getattr(state.engine.pool, "checkedout", None)
+            if checkedout is not None and checkedout() > 0:
+                continue
+            if now - state.stats.last_used < idle_timeout or state.stats.last_used < 0:
+                continue
+            state.engine.dispose()
+            state.stats.disposals += 1
+            # 标记为已释放，直到再次被使用前不会重复释放
+            state.stats.last_used = float("-inf")
+            closed.append(state.engine.url.render_as_string(hide_password=True))
+        if closed:
+            log.debug(f"已释放空闲数据库引擎的连接: {closed}")
+        return closed
+
+    def dispose(self, connection: Optional[str] = None) -> None:
+        """释放指定（或全部）同步引擎的连接池"""
+        with self._lock:
+            states = [self._engines[connection]] if connection in self._engines else \
+                [] if connection is not None else list(self._engines.values())
+        for state in states:
+            if not state.is_async:
+                state.engine.dispose()
+                state.stats.disposals += 1
+
+    async def adispose(self, connection: Optional[str] = None) -> None:
+        """释放指定（或全部）异步引擎的连接池"""
+        with self._lock:
+            states = [self._engines[connection]] if connection in self._engines else \
+                [] if connection is not None else list(self._engines.values())
+        for state in states:
+            if state.is_async:
+                await state.engine.dispose()
+                state.stats.disposals += 1
+
+    def _start_reaper(self) -> None:
+        if self.idle_timeout is None or self._reaper is not None:
+            return
+
+        def reap():
+            while not self._stop.wait(self.reap_interval):
+                try:
+                    self.close_idle()
+                except Exception as e:
+                    log.exception(e)
+
+        self._reaper = threading.Thread(target=reap, name="engine-reaper", daemon=True)
+        self._reaper.start()
+
+
+engine_registry = EngineRegistry()
+
+
+def configure_engine(connection: str, **options) -> None:
+    """为指定数据库设置连接池参数，见 EngineRegistry.configure"""
+    engine_registry.configure(connection, **options)
+
+
+def get_engine(connection: str, **options) -> Engine:
+    """获取进程级共享的同步引擎，见 EngineRegistry.get_engine"""
+    return engine_registry.get_engine(connection, **options)
+
+
+def get_async_engine(connection: str, **options):
+    """获取进程级共享的异步引擎，见 EngineRegistry.get_async_engine"""
+    return engine_registry.get_async_engine(connection, **options)
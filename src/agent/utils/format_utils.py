@@ -0,0 +1,132 @@
+import csv
+import io
+import re
+from typing import Any, Dict, List, Optional, Sequence
+
+RESULT_FORMATS = ("repr", "csv", "tsv", "markdown")
+SCHEMA_FORMATS = ("default", "ddl")
+TABLE_LIST_FORMATS = ("default", "compact")
+
+_re_cjk = re.compile(r"[\u3000-\u9fff\uac00-\ud7af\uff00-\uffef]")
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算文本的 token 数：中日韩字符按 1 个 token，其余字符按约 4 个字符 1 个 token 计算"""
+    cjk = len(_re_cjk.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def truncate_value(value: str, max_width: Optional[int]) -> str:
+    """按列宽截断单元格内容，被截断时以 … 结尾"""
+    if max_width is None or len(value) <= max_width:
+        return value
+    return value[:max(max_width - 1, 0)] + "…"
+
+
+class ResultFormatter:
+    """查询结果的渲染格式
+
+    - repr: 每行输出一个 Python 元组（原有格式）
+    - csv / tsv: 首行为列名，之后每行一条记录
+    - markdown: Markdown 表格，列名只输出一次
+    """
+
+    def __init__(self, output_format: str = "repr", max_column_width: Optional[int] = None,
+                 max_tokens: Optional[int] = None):
+        """初始化渲染格式
+
+        Args:
+            output_format: 输出格式，取值见 RESULT_FORMATS
+            max_column_width: 单元格最大字符数，超出部分截断，None 表示不截断
+            max_tokens: 结果的 token 预算（估算值），None 表示不限制
+        """
+        if output_format not in RESULT_FORMATS:
+            raise ValueError(f"不支持的结果格式: {output_format}，可选值: {', '.join(RESULT_FORMATS)}")
+        self.output_format = output_format
+        self.max_column_width = max_column_width
+        self.max_tokens = max_tokens
+
+    @property
+    def cache_key(self) -> str:
+        return f"{self.output_format}|{self.max_column_width}|{self.max_tokens}"
+
+    def _cell(self, value: Any) -> str:
+        text = "NULL" if value is None else str(value)
+        return truncate_value(text, self.max_column_width)
+
+    def header(self, columns: Sequence[str]) -> List[str]:
+        """返回列名所在的行（repr 格式不输出列名）"""
+        if self.output_format == "repr":
+            return []
+        if self.output_format == "markdown":
+            names = [self._cell(c).replace("|", "\\|") for c in columns]
+            return ["| " + " | ".join(names) + " |", "|" + "---|" * len(names)]
+        return [self.row(columns)]
+
+    def row(self, row: Sequence[Any]) -> str:
+        """渲染一行记录"""
+        if self.output_format == "repr":
+            if self.max_column_width is None:
+                return str(row)
+            return str(tuple(truncate_value(v, self.max_column_width) if isinstance(v, str) else v for v in row))
+        cells = [self._cell(v) for v in row]
+        if self.output_format == "csv":
+            buffer = io.StringIO()
+            csv.writer(buffer, lineterminator="").writerow(cells)
+            return buffer.getvalue()
+        if self.output_format == "tsv":
+            return "\t".join(re.sub(r"[\t\r\n]+", " ", c) for c in cells)
+        return "| " + " | ".join(re.sub(r"[\r\n]+", " ", c).replace("|", "\\|") for c in cells) + " |"
+
+
+def format_table_list(table_comments: List[Dict[str, Any]], output_format: str = "default",
+                      max_tokens: Optional[int] = None) -> str:
+    """将表名和描述渲染为表列表文本，"default" 为逐表说明，"compact" 为每行 "表名: 描述"；超出 token 预算时省略剩余的表"""
+    if output_format not in TABLE_LIST_FORMATS:
+        raise ValueError(f"不支持的表列表格式: {output_format}，可选值: {', '.join(TABLE_LIST_FORMATS)}")
+    result = f"数据库中共有 {len(table_comments)} 张表：\n"
+    used_tokens = estimate_tokens(result)
+    for i, table in enumerate(table_comments):
+        if output_format == "compact":
+            line = f"{table['table_name']}: {table['comment']}\n" if table['comment'] else f"{table['table_name']}\n"
+        else:
+            line = f"{i+1}. 表名: {table['table_name']}\n    描述: {table['comment']}\n\n"
+        if max_tokens is not None:
+            used_tokens += estimate_tokens(line)
+            if used_tokens > max_tokens:
+                result += f"...（已达到 token 预算 {max_tokens}，省略了 {len(table_comments) - i} 张表）\n"
+                break
+        result += line
+    return result
+
+
+def render_table_schema_ddl(metadata: Dict[str, Any]) -> str:
+    """将表结构渲染为紧凑的类 DDL 形式，例如：
+
+    sys_user(user_id BIGINT PK, dept_id BIGINT FK>sys_dept.dept_id, nick_name VARCHAR(30) '用户昵称')
+      IDX idx_dept(dept_id); UQ uk_name(user_name)
+    """
+    primary_keys = metadata["primary_keys"]
+    references = {}
+    for fk in metadata["foreign_keys"]:
+        for column, referred in zip(fk["constrained_columns"], fk["referred_columns"]):
+            references[column] = f"{fk['referred_table']}.{referred}"
+
+    columns = []
+    for column in metadata["columns"]:
+        parts = [column["name"], str(column["type"]).replace(", ", ",")]
+        if column["name"] in primary_keys:
+            parts.append("PK")
+        if column["name"] in references:
+            parts.append(f"FK>{references[column['name']]}")
+        comment = column.get("comment")
+        if comment:
+            parts.append("'" + re.sub(r"\s+", " ", str(comment)) + "'")
+        columns.append(" ".join(parts))
+
+    ddl = f"{metadata['table_name']}({', '.join(columns)})"
+    indexes = [f"{'UQ' if index.get('unique') else 'IDX'} {index['name']}({','.join(index['column_names'])})"
+               for index in metadata["indexes"]]
+    if indexes:
+        ddl += "\n  " + "; ".join(indexes)
+    return ddl
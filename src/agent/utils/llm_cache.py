@@ -0,0 +1,463 @@
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import CancelledError as FutureCancelledError, Future
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, Dict, List, Optional, Tuple
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, message_to_dict, messages_from_dict
+from langchain_core.outputs import ChatGeneration, ChatResult
+from pydantic import PrivateAttr
+
+from agent.utils.format_utils import estimate_tokens
+from agent.utils.log_utils import log
+from agent.utils.perf_utils import metrics
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    model TEXT NOT NULL,
+    message TEXT NOT NULL,
+    created_at REAL NOT NULL
+) WITHOUT ROWID;
+"""
+
+# 命中缓存或合并到同一次调用的响应没有消耗 token
+_NO_USAGE = {"input_tokens": 0, "output_tokens": 0, "total_tokens": 0}
+
+
+class LLMResponseCache:
+    """模型响应的精确匹配缓存：进程内 LRU + 本地 SQLite 文件
+
+    键为模型、温度、消息和工具等调用参数的哈希（见 CachedChatModel），值为模型返回的 AIMessage。
+    内存未命中时查 SQLite 文件，多个进程可以共享同一个文件；条目超过 ttl 后失效。
+    """
+
+    def __init__(self, path: Optional[str] = None, max_entries: int = 2000, ttl: Optional[float] = 86400.0):
+        """初始化缓存
+
+        Args:
+            path: SQLite 文件路径，None 表示只使用内存
+            max_entries: 内存中的最大条目数，超出时淘汰最久未使用的条目
+            ttl: 条目的存活时间（秒），None 表示不过期
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._memory: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._local = threading.local()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._connection().executescript(_SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        # sqlite3 连接不能跨线程使用，每个线程维护自己的连接；WAL 模式下读不阻塞写
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _expired(self, created_at: float) -> bool:
+        return self.ttl is not None and time.time() - created_at > self.ttl
+
+    def _remember(self, key: str, message: str, created_at: float) -> None:
+        self._memory[key] = (message, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, key: str) -> Optional[AIMessage]:
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and self._expired(entry[1]):
+                del self._memory[key]
+                entry = None
+            if entry is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+        if entry is None and self.path:
+            row = self._connection().execute("SELECT message, created_at FROM responses WHERE key = ?",
+                                             (key,)).fetchone()
+            if row is not None and not self._expired(row[1]):
+                entry = row
+                with self._lock:
+                    self._remember(key, *row)
+                    self.hits += 1
+                    self.disk_hits += 1
+        if entry is None:
+            with self._lock:
+                self.misses += 1
+            return None
+        return messages_from_dict([json.loads(entry[0])])[0]
+
+    def put(self, key: str, model: str, message: AIMessage) -> None:
+        data = json.dumps(message_to_dict(message), ensure_ascii=False)
+        created_at = time.time()
+        with self._lock:
+            self._remember(key, data, created_at)
+        if self.path:
+            self._connection().execute("INSERT OR REPLACE INTO responses (key, model, message, created_at) "
+                                       "VALUES (?, ?, ?, ?)", (key, model, data, created_at))
+
+    def purge_expired(self) -> int:
+        """删除 SQLite 文件中过期的条目，返回删除的数量"""
+        if not self.path or self.ttl is None:
+            return 0
+        return self._connection().execute("DELETE FROM responses WHERE created_at < ?",
+                                          (time.time() - self.ttl,)).rowcount
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+        if self.path:
+            self._connection().execute("DELETE FROM responses")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._memory),
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
+
+
+class TokenBucketLimiter:
+    """模型调用的客户端限流：同时进行的调用数不超过 max_concurrency，
+    调用速率由令牌桶控制（每秒补充 rate 个令牌，最多积累 burst 个），突发请求在本地排队而不是触发服务端限流
+    """
+
+    def __init__(self, max_concurrency: Optional[int] = 8, rate: Optional[float] = None, burst: int = 1,
+                 check_interval: float = 0.01):
+        """初始化限流
+
+        Args:
+            max_concurrency: 最大并发调用数，None 表示不限制
+            rate: 每秒允许发起的调用数，None 表示不限制
+            burst: 令牌桶容量，即空闲后允许的突发调用数
+            check_interval: 异步等待时检查令牌的间隔（秒）
+        """
+        self.max_concurrency = max_concurrency
+        self.rate = rate
+        self.burst = burst
+        self.check_interval = check_interval
+        self._condition = threading.Condition()
+        self._active = 0
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self.waits = 0
+        self.wait_seconds = 0.0
+
+    def _try_acquire(self) -> Optional[float]:
+        """尝试占用一个并发名额和令牌，成功返回 0，否则返回建议的等待时间"""
+        if self.max_concurrency is not None and self._active >= self.max_concurrency:
+            return self.check_interval
+        if self.rate is not None:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens < 1:
+                return (1 - self._tokens) / self.rate
+            self._tokens -= 1
+        self._active += 1
+        return 0.0
+
+    def _record_wait(self, seconds: float, waited: bool) -> None:
+        if waited:
+            with self._condition:
+                self.waits += 1
+                self.wait_seconds += seconds
+        metrics.observe("agent_llm_limiter_wait_seconds", seconds)
+
+    def release(self) -> None:
+        with self._condition:
+            self._active -= 1
+            self._condition.notify()
+
+    @contextmanager
+    def slot(self):
+        """占用一个调用名额，名额不足时阻塞等待"""
+        start = time.perf_counter()
+        waited = False
+        with self._condition:
+            while True:
+                wait = self._try_acquire()
+                if not wait:
+                    break
+                waited = True
+                self._condition.wait(wait)
+        self._record_wait(time.perf_counter() - start, waited)
+        try:
+            yield
+        finally:
+            self.release()
+
+    @asynccontextmanager
+    async def aslot(self):
+        """slot 的异步版本，等待时不阻塞事件循环"""
+        start = time.perf_counter()
+        waited = False
+        while True:
+            with self._condition:
+                wait = self._try_acquire()
+            if not wait:
+                break
+            waited = True
+            await asyncio.sleep(wait)
+        self._record_wait(time.perf_counter() - start, waited)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._condition:
+            return {"active": self._active, "waits": self.waits, "wait_seconds": self.wait_seconds}
+
+
+class StubChatModel(BaseChatModel):
+    """离线桩模型：不访问网络，按固定延迟返回复述最后一个用户问题的答案，不调用工具
+
+    用于在没有 API Key 或网络的环境中运行 agent 和测试缓存、限流。
+    """
+
+    model_name: str = "stub"
+    temperature: float = 0.0
+    # 每次调用的模拟延迟（秒）
+    latency: float = 0.0
+    # 调用次数
+    calls: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "stub"
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def _respond(self, messages: List[BaseMessage]) -> ChatResult:
+        self.calls += 1
+        question = next((m.content for m in reversed(messages) if isinstance(m, HumanMessage)), "")
+        message = AIMessage(content=f"（离线桩模型）收到问题：{question}")
+        prompt_tokens = sum(estimate_tokens(str(m.content)) for m in messages)
+        completion_tokens = estimate_tokens(message.content)
+        message.usage_metadata = {"input_tokens": prompt_tokens, "output_tokens": completion_tokens,
+                                  "total_tokens": prompt_tokens + completion_tokens}
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None,
+                  **kwargs: Any) -> ChatResult:
+        if self.latency:
+            time.sleep(self.latency)
+        return self._respond(messages)
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None,
+                         **kwargs: Any) -> ChatResult:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self._respond(messages)
+
+
+def _message_key(message: BaseMessage) -> Dict[str, Any]:
+    # 不包含消息 ID 和工具调用 ID：它们每次运行都不同，但不影响模型的输出
+    key = {"type": message.type, "content": message.content}
+    if isinstance(message, AIMessage) and message.tool_calls:
+        key["tool_calls"] = [{"name": call["name"], "args": call["args"]} for call in message.tool_calls]
+    if getattr(message, "name", None):
+        key["name"] = message.name
+    return key
+
+
+class CachedChatModel(BaseChatModel):
+    """给聊天模型加上响应缓存、并发请求合并和客户端限流
+
+    - 缓存：模型名、温度、消息和调用参数（工具、stop 等）完全相同的请求直接返回缓存的响应
+    - 请求合并：相同的请求正在进行时，后到的请求等待并共享同一次调用的结果，而不是再发一次
+    - 限流：实际发往模型的调用经过 TokenBucketLimiter 排队
+
+    命中缓存或合并的响应在 response_metadata["llm_cache"] 中标记为 "hit" 或 "coalesced"，
+    usage_metadata 为 0。调用失败不会缓存，等待中的请求收到同样的错误。
+    """
+
+    model: BaseChatModel
+    # 不能命名为 cache：BaseChatModel 的 cache 字段表示 LangChain 自带的全局缓存
+    response_cache: Optional[LLMResponseCache] = None
+    limiter: Optional[TokenBucketLimiter] = None
+    coalesce: bool = True
+
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+    _inflight: Dict[str, Future] = PrivateAttr(default_factory=dict)
+    _calls: int = PrivateAttr(default=0)
+    _coalesced: int = PrivateAttr(default=0)
+
+    @property
+    def _llm_type(self) -> str:
+        return f"cached-{self.model._llm_type}"
+
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        return self.model._identifying_params
+
+    @property
+    def model_id(self) -> str:
+        return str(getattr(self.model, "model_name", None) or self.model._llm_type)
+
+    def bind_tools(self, tools, **kwargs):
+        # 由被包装的模型把工具转换为它需要的格式，再把这些参数绑定到包装后的模型上
+        bound = self.model.bind_tools(tools, **kwargs)
+        return self.bind(**getattr(bound, "kwargs", {}))
+
+    def cache_key(self, messages: List[BaseMessage], stop: Optional[List[str]], kwargs: Dict[str, Any]) -> str:
+        payload = {
+            "model": self.model_id,
+            "temperature": getattr(self.model, "temperature", None),
+            "messages": [_message_key(m) for m in messages],
+            "stop": stop,
+            "kwargs": kwargs,
+        }
+        data = json.dumps(payload, ensure_ascii=False, sort_keys=True, default=str)
+        return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _reused(message: AIMessage, source: str) -> ChatResult:
+        # 复用的回复换用新的消息 ID 和工具调用 ID：同一会话中重复出现的 ID 会让 ToolMessage 对应到错误的调用
+        ids = {call["id"]: f"call_{uuid.uuid4().hex[:24]}" for call in message.tool_calls if call.get("id")}
+        additional_kwargs = message.additional_kwargs
+        if ids and additional_kwargs.get("tool_calls"):
+            additional_kwargs = {**additional_kwargs, "tool_calls": [
+                {**call, "id": ids.get(call.get("id"), call.get("id"))} for call in additional_kwargs["tool_calls"]]}
+        message = message.model_copy(update={
+            "id": None,
+            "tool_calls": [{**call, "id": ids.get(call.get("id"), call.get("id"))} for call in message.tool_calls],
+            "additional_kwargs": additional_kwargs,
+            "response_metadata": {**message.response_metadata, "llm_cache": source},
+            "usage_metadata": dict(_NO_USAGE),
+        })
+        metrics.inc("agent_llm_cache_requests_total", result=source)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _lookup(self, key: str) -> Tuple[Optional[ChatResult], Optional[Future], bool]:
+        """查缓存和进行中的请求，返回 (缓存的结果, 共享的 Future, 是否由当前请求发起调用)"""
+        if self.response_cache is not None:
+            message = self.response_cache.get(key)
+            if message is not None:
+                return self._reused(message, "hit"), None, False
+        with self._lock:
+            future = self._inflight.get(key) if self.coalesce else None
+            if future is not None:
+                self._coalesced += 1
+                return None, future, False
+            future = Future()
+            if self.coalesce:
+                self._inflight[key] = future
+            self._calls += 1
+            return None, future, True
+
+    def _finish(self, key: str, future: Future, result: Optional[ChatResult], error: Optional[BaseException]) -> None:
+        if self.coalesce:
+            with self._lock:
+                self._inflight.pop(key, None)
+        if error is None:
+            message = result.generations[0].message
+            if self.response_cache is not None and isinstance(message, AIMessage):
+                self.response_cache.put(key, self.model_id, message)
+            future.set_result(message)
+            metrics.inc("agent_llm_cache_requests_total", result="miss")
+        elif isinstance(error, Exception):
+            future.set_exception(error)
+        else:
+            # 发起调用的请求被取消或中断，等待中的请求各自重试
+            future.cancel()
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None,
+                  **kwargs: Any) -> ChatResult:
+        key = self.cache_key(messages, stop, kwargs)
+        while True:
+            cached, future, leader = self._lookup(key)
+            if cached is not None:
+                return cached
+            if leader:
+                break
+            try:
+                return self._reused(future.result(), "coalesced")
+            except FutureCancelledError:
+                continue
+        result = error = None
+        try:
+            if self.limiter is not None:
+                with self.limiter.slot():
+                    result = self.model._generate(messages, stop=stop, run_manager=run_manager, **kwargs)
+            else:
+                result = self.model._generate(messages, stop=stop, run_manager=run_manager, **kwargs)
+            return result
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            self._finish(key, future, result, error)
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None,
+                         **kwargs: Any) -> ChatResult:
+        key = self.cache_key(messages, stop, kwargs)
+        while True:
+            cached, future, leader = self._lookup(key)
+            if cached is not None:
+                return cached
+            if leader:
+                break
+            # shield：当前请求被取消时不能连带取消共享的 Future
+            try:
+                return self._reused(await asyncio.shield(asyncio.wrap_future(future)), "coalesced")
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    raise
+        result = error = None
+        try:
+            if self.limiter is not None:
+                async with self.limiter.aslot():
+                    result = await self.model._agenerate(messages, stop=stop, run_manager=run_manager, **kwargs)
+            else:
+                result = await self.model._agenerate(messages, stop=stop, run_manager=run_manager, **kwargs)
+            return result
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            self._finish(key, future, result, error)
+
+    def stats(self) -> Dict[str, Any]:
+        """返回实际发往模型的调用数、合并的请求数以及缓存和限流的统计"""
+        with self._lock:
+            stats = {"calls": self._calls, "coalesced": self._coalesced, "inflight": len(self._inflight)}
+        if self.response_cache is not None:
+            stats["cache"] = self.response_cache.stats()
+        if self.limiter is not None:
+            stats["limiter"] = self.limiter.stats()
+        return stats
+
+
+def wrap_chat_model(model: BaseChatModel, cache_path: Optional[str] = None, cache_ttl: Optional[float] = 86400.0,
+                    max_concurrency: Optional[int] = 8, rate: Optional[float] = None, burst: int = 1,
+                    callbacks: Optional[list] = None) -> CachedChatModel:
+    """用缓存（cache_path 为空时只用内存）、请求合并和限流包装聊天模型"""
+    cache = LLMResponseCache(cache_path, ttl=cache_ttl)
+    limiter = TokenBucketLimiter(max_concurrency, rate, burst) \
+        if max_concurrency is not None or rate is not None else None
+    log.debug(f"模型调用缓存: {cache_path or '内存'}，并发上限 {max_concurrency}，速率 {rate}/s")
+    return CachedChatModel(model=model, response_cache=cache, limiter=limiter, callbacks=callbacks)
@@ -0,0 +1,326 @@
+import json
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional, Tuple
+from uuid import UUID, uuid4
+
+from langchain_core.callbacks import BaseCallbackHandler
+from sqlalchemy import event
+
+from agent.env_utils import PERF_JSONL_PATH
+from agent.utils.log_utils import log
+
+# 当前请求的关联 ID：同一次 agent 运行中的 LLM、工具和 SQL 耗时都会带上它
+_run_id: ContextVar[Optional[str]] = ContextVar("perf_run_id", default=None)
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def get_run_id() -> Optional[str]:
+    """获取当前上下文的关联 ID"""
+    return _run_id.get()
+
+
+@contextmanager
+def run_context(run_id: Optional[str] = None):
+    """在一段代码中设置关联 ID，未指定时自动生成"""
+    token = _run_id.set(run_id or uuid4().hex)
+    try:
+        yield _run_id.get()
+    finally:
+        _run_id.reset(token)
+
+
+class Histogram:
+    """固定分桶的直方图，与 Prometheus histogram 的语义一致（桶为累计计数）"""
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> List[Tuple[str, int]]:
+        result, total = [], 0
+        for bound, count in zip(list(self.buckets) + [float("inf")], self.counts):
+            total += count
+            result.append(("+Inf" if bound == float("inf") else repr(bound), total))
+        return result
+
+
+class MetricsRegistry:
+    """进程内指标注册表：直方图和计数器，可导出为 Prometheus 文本格式"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms: Dict[Tuple[str, tuple], Histogram] = {}
+        self._counters: Dict[Tuple[str, tuple], float] = {}
+
+    def observe(self, metric: str, value: float, **labels) -> None:
+        key = (metric, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(value)
+
+    def inc(self, metric: str, value: float = 1, **labels) -> None:
+        key = (metric, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def reset(self) -> None:
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """以字典形式返回所有指标，便于写入 JSON"""
+        with self._lock:
+            return {
+                "histograms": [{"name": name, "labels": dict(labels), "count": h.count, "sum": h.sum,
+                                "buckets": dict(h.cumulative())} for (name, labels), h in self._histograms.items()],
+                "counters": [{"name": name, "labels": dict(labels), "value": value}
+                             for (name, labels), value in self._counters.items()],
+            }
+
+    def to_prometheus(self) -> str:
+        """导出为 Prometheus 文本格式"""
+
+        def fmt_labels(labels, extra=()):
+            items = list(labels) + list(extra)
+            if not items:
+                return ""
+            escaped = [(k, str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", " ")) for k, v in items]
+            return "{" + ",".join(f'{k}="{v}"' for k, v in escaped) + "}"
+
+        lines = []
+        with self._lock:
+            for name in sorted({name for name, _ in self._histograms}):
+                lines.append(f"# TYPE {name} histogram")
+                for (hname, labels), h in self._histograms.items():
+                    if hname != name:
+                        continue
+                    for bound, total in h.cumulative():
+                        lines.append(f"{name}_bucket{fmt_labels(labels, [('le', bound)])} {total}")
+                    lines.append(f"{name}_sum{fmt_labels(labels)} {h.sum}")
+                    lines.append(f"{name}_count{fmt_labels(labels)} {h.count}")
+            for name in sorted({name for name, _ in self._counters}):
+                lines.append(f"# TYPE {name} counter")
+                for (cname, labels), value in self._counters.items():
+                    if cname == name:
+                        lines.append(f"{name}{fmt_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+
+class JsonlExporter:
+    """将每个耗时记录追加写入本地 JSONL 文件"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, span: Dict[str, Any]) -> None:
+        line = json.dumps(span, ensure_ascii=False, default=str)
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+
+class Tracer:
+    """记录 span 形式的耗时，同时汇总到直方图并交给导出器"""
+
+    def __init__(self, metrics: Optional[MetricsRegistry] = None):
+        self.metrics = metrics or MetricsRegistry()
+        self.exporters: List[Any] = []
+        self.enabled = True
+
+    def add_exporter(self, exporter) -> None:
+        self.exporters.append(exporter)
+
+    def record(self, kind: str, name: str, duration: float, run_id: Optional[str] = None, **attrs) -> None:
+        """记录一个已经结束的 span
+
+        Args:
+            kind: 类别，例如 llm / tool / sql / pool / run
+            name: 名称，例如模型名、工具名或 SQL 语句类型
+            duration: 耗时（秒）
+            run_id: 关联 ID，默认取当前上下文中的关联 ID
+            attrs: 其他属性，例如 token 数、错误信息
+        """
+        if not self.enabled:
+            return
+        self.metrics.observe(f"agent_{kind}_duration_seconds", duration, name=name)
+        span = {"run_id": run_id or get_run_id(), "kind": kind, "name": name,
+                "end_time": time.time(), "duration_ms": round(duration * 1000, 3), **attrs}
+        for exporter in self.exporters:
+            try:
+                exporter.export(span)
+            except Exception as e:
+                log.warning(f"导出耗时记录失败: {e}")
+
+    @contextmanager
+    def span(self, kind: str, name: str, **attrs):
+        """用 with 语句记录一段代码的耗时"""
+        start = time.perf_counter()
+        error = None
+        try:
+            yield attrs
+        except Exception as e:
+            error = type(e).__name__
+            raise
+        finally:
+            if error is not None:
+                attrs["error"] = error
+            self.record(kind, name, time.perf_counter() - start, **attrs)
+
+
+tracer = Tracer()
+metrics = tracer.metrics
+if PERF_JSONL_PATH:
+    tracer.add_exporter(JsonlExporter(PERF_JSONL_PATH))
+
+
+def _statement_name(statement: str) -> str:
+    words = statement.split(None, 2)
+    if not words:
+        return "UNKNOWN"
+    if words[0].upper() == "EXPLAIN" and len(words) > 1 and words[1].upper() != "QUERY":
+        return "EXPLAIN"
+    return words[0].upper()
+
+
+def instrument_engine(engine) -> None:
+    """通过 SQLAlchemy 引擎事件记录每条 SQL 语句的耗时（同一个引擎只注册一次）"""
+    if getattr(engine, "_perf_instrumented", False):
+        return
+    engine._perf_instrumented = True
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("perf_query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get("perf_query_start")
+        if starts:
+            tracer.record("sql", _statement_name(statement), time.perf_counter() - starts.pop(),
+                          statement=statement[:200], database=engine.url.database)
+
+    @event.listens_for(engine, "handle_error")
+    def _handle_error(context):
+        starts = context.connection.info.get("perf_query_start") if context.connection is not None else None
+        if starts:
+            tracer.record("sql", _statement_name(context.statement or ""), time.perf_counter() - starts.pop(),
+                          statement=(context.statement or "")[:200], error=type(context.original_exception).__name__)
+
+
+class PerfCallbackHandler(BaseCallbackHandler):
+    """LangChain 回调：记录每次 LLM 调用（含 token 数）、工具调用和整次 agent 运行的耗时
+
+    根运行（没有父运行的链）的 run_id 作为关联 ID，写入上下文供 SQL 耗时记录使用，
+    子运行通过 parent_run_id 追溯到根运行。
+    """
+
+    run_inline = True
+
+    def __init__(self, tracer: Tracer = tracer):
+        self.tracer = tracer
+        self._lock = threading.Lock()
+        self._roots: Dict[UUID, str] = {}
+        self._starts: Dict[UUID, Tuple[float, str, str]] = {}
+        self._tokens: Dict[UUID, Any] = {}
+
+    def _begin(self, run_id: UUID, parent_run_id: Optional[UUID], kind: str, name: str) -> None:
+        with self._lock:
+            root = self._roots.get(parent_run_id) if parent_run_id is not None else None
+            self._roots[run_id] = root or get_run_id() or str(run_id)
+            self._starts[run_id] = (time.perf_counter(), kind, name)
+
+    def _end(self, run_id: UUID, **attrs) -> None:
+        with self._lock:
+            start = self._starts.pop(run_id, None)
+            root = self._roots.pop(run_id, None)
+        if start is not None:
+            started_at, kind, name = start
+            self.tracer.record(kind, name, time.perf_counter() - started_at, run_id=root, **attrs)
+
+    def on_chain_start(self, serialized, inputs, *, run_id, parent_run_id=None, **kwargs):
+        if parent_run_id is None:
+            # 外层已通过 run_context 指定关联 ID 时沿用，否则使用根运行的 run_id
+            self._begin(run_id, None, "run", kwargs.get("name") or "agent")
+            self._tokens[run_id] = _run_id.set(self._roots[run_id])
+        else:
+            # 中间的链只用于追溯根运行，不单独记录耗时
+            with self._lock:
+                self._roots[run_id] = self._roots.get(parent_run_id) or get_run_id() or str(parent_run_id)
+
+    def _end_chain(self, run_id: UUID, **attrs) -> None:
+        if run_id not in self._starts:
+            with self._lock:
+                self._roots.pop(run_id, None)
+            return
+        self._end(run_id, **attrs)
+        token = self._tokens.pop(run_id, None)
+        if token is not None:
+            try:
+                _run_id.reset(token)
+            except ValueError:
+                # 异步运行时回调可能在另一个上下文中结束，此时设置的值不会泄漏到调用方
+                pass
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        self._end_chain(run_id)
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        self._end_chain(run_id, error=type(error).__name__)
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, parent_run_id=None, **kwargs):
+        name = (kwargs.get("metadata") or {}).get("ls_model_name") or kwargs.get("name") or "chat_model"
+        self._begin(run_id, parent_run_id, "llm", name)
+
+    def on_llm_start(self, serialized, prompts, *, run_id, parent_run_id=None, **kwargs):
+        name = (kwargs.get("metadata") or {}).get("ls_model_name") or kwargs.get("name") or "llm"
+        self._begin(run_id, parent_run_id, "llm", name)
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        usage = {}
+        for generations in response.generations:
+            for generation in generations:
+                message = getattr(generation, "message", None)
+                if message is not None and getattr(message, "usage_metadata", None):
+                    usage = message.usage_metadata
+        if not usage and response.llm_output:
+            token_usage = response.llm_output.get("token_usage") or {}
+            usage = {"input_tokens": token_usage.get("prompt_tokens"),
+                     "output_tokens": token_usage.get("completion_tokens"),
+                     "total_tokens": token_usage.get("total_tokens")}
+        for key in ("input_tokens", "output_tokens"):
+            if usage.get(key):
+                self.tracer.metrics.inc(f"agent_llm_{key}_total", usage[key])
+        self._end(run_id, input_tokens=usage.get("input_tokens"), output_tokens=usage.get("output_tokens"),
+                  total_tokens=usage.get("total_tokens"))
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error=type(error).__name__)
+
+    def on_tool_start(self, serialized, input_str, *, run_id, parent_run_id=None, **kwargs):
+        self._begin(run_id, parent_run_id, "tool", (serialized or {}).get("name") or kwargs.get("name") or "tool")
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        content = getattr(output, "content", output)
+        self._end(run_id, output_chars=len(str(content)))
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error=type(error).__name__)
+
+
+perf_callback = PerfCallbackHandler()
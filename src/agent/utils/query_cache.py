@@ -0,0 +1,226 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from agent.utils.sql_utils import normalize_sql
+
+
+class QueryCacheEntry:
+    """查询结果缓存条目"""
+
+    __slots__ = ("value", "tables", "versions", "expires_at", "size")
+
+    def __init__(self, value: str, tables: List[str], versions: Dict[str, str], expires_at: float):
+        self.value = value
+        self.tables = tables
+        self.versions = versions
+        self.expires_at = expires_at
+        self.size = len(value.encode("utf-8"))
+
+
+class MemoryQueryCacheBackend:
+    """进程内缓存后端，按条目占用的字节数做 LRU 淘汰"""
+
+    def __init__(self, max_bytes: int = 32 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self._entries: "OrderedDict[str, QueryCacheEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[QueryCacheEntry]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key: str, entry: QueryCacheEntry) -> None:
+        if entry.size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.total_bytes -= old.size
+            self._entries[key] = entry
+            self.total_bytes += entry.size
+            while self.total_bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.total_bytes -= evicted.size
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self.total_bytes -= entry.size
+
+    def delete_tables(self, tables: List[str]) -> int:
+        with self._lock:
+            keys = [key for key, entry in self._entries.items() if set(entry.tables) & set(tables)]
+            for key in keys:
+                self.total_bytes -= self._entries.pop(key).size
+            return len(keys)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.total_bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SQLiteQueryCacheBackend:
+    """基于本地 SQLite 文件的缓存后端，同一台机器上的多个 worker 进程可以共享"""
+
+    def __init__(self, path: str, max_bytes: int = 256 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        conn = self._connection()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS query_cache (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                tables TEXT NOT NULL,
+                versions TEXT NOT NULL,
+                expires_at REAL NOT NULL,
+                size INTEGER NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_query_cache_accessed_at ON query_cache(accessed_at)")
+        conn.commit()
+
+    def _connection(self) -> sqlite3.Connection:
+        # sqlite3 连接不能跨线程使用，每个线程维护自己的连接
+        conn = getattr(self._local, "connection", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = conn
+        return conn
+
+    def get(self, key: str) -> Optional[QueryCacheEntry]:
+        conn = self._connection()
+        row = conn.execute("SELECT value, tables, versions, expires_at FROM query_cache WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        conn.execute("UPDATE query_cache SET accessed_at = ? WHERE key = ?", (time.time(), key))
+        conn.commit()
+        tables = [t for t in row[1].split(",") if t]
+        return QueryCacheEntry(row[0], tables, json.loads(row[2]), row[3])
+
+    def put(self, key: str, entry: QueryCacheEntry) -> None:
+        if entry.size > self.max_bytes:
+            return
+        conn = self._connection()
+        # tables 以 ",t1,t2," 的形式保存，便于按表名做 LIKE 匹配
+        conn.execute(
+            "INSERT OR REPLACE INTO query_cache VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (key, entry.value, "," + ",".join(entry.tables) + ",", json.dumps(entry.versions),
+             entry.expires_at, entry.size, time.time()),
+        )
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM query_cache").fetchone()[0]
+        if total > self.max_bytes:
+            # 删除最久未访问的条目，直到总大小回到上限以内
+            conn.execute("""
+                DELETE FROM query_cache WHERE key IN (
+                    SELECT key FROM (
+                        SELECT key, SUM(size) OVER (ORDER BY accessed_at DESC) AS running
+                        FROM query_cache
+                    ) WHERE running > ?
+                )
+            """, (self.max_bytes,))
+        conn.commit()
+
+    def delete(self, key: str) -> None:
+        conn = self._connection()
+        conn.execute("DELETE FROM query_cache WHERE key = ?", (key,))
+        conn.commit()
+
+    def delete_tables(self, tables: List[str]) -> int:
+        conn = self._connection()
+        deleted = 0
+        for table in tables:
+            deleted += conn.execute("DELETE FROM query_cache WHERE tables LIKE ?", (f"%,{table},%",)).rowcount
+        conn.commit()
+        return deleted
+
+    def clear(self) -> None:
+        conn = self._connection()
+        conn.execute("DELETE FROM query_cache")
+        conn.commit()
+
+    def __len__(self) -> int:
+        return self._connection().execute("SELECT COUNT(*) FROM query_cache").fetchone()[0]
+
+
+class QueryResultCache:
+    """以规范化 SQL 为键的查询结果缓存
+
+    条目记录写入时所引用表的版本号，读取时版本不一致即视为失效，
+    版本号由 MySQLDataBaseManager 的表版本信号提供。
+    """
+
+    def __init__(self, ttl: float = 300.0, backend=None):
+        """初始化缓存
+
+        Args:
+            ttl: 条目的存活时间（秒）
+            backend: 缓存后端，默认为进程内的 MemoryQueryCacheBackend，
+                多个 worker 共享时可使用 SQLiteQueryCacheBackend
+        """
+        self.ttl = ttl
+        self.backend = backend if backend is not None else MemoryQueryCacheBackend()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(query: str, namespace: str = "") -> str:
+        """根据规范化 SQL 和命名空间（例如连接串）生成缓存键"""
+        return hashlib.sha256(f"{namespace}\n{normalize_sql(query)}".encode("utf-8")).hexdigest()
+
+    def _count(self, hit: bool) -> None:
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get(self, key: str, versions: Optional[Dict[str, str]] = None) -> Optional[str]:
+        """读取缓存结果，过期或任一引用表的版本发生变化时返回 None"""
+        entry = self.backend.get(key)
+        if entry is not None and (entry.expires_at < time.time()
+                                  or (versions is not None and any(versions.get(t) != v for t, v in entry.versions.items()))):
+            self.backend.delete(key)
+            entry = None
+        self._count(entry is not None)
+        return entry.value if entry is not None else None
+
+    def put(self, key: str, value: str, tables: List[str], versions: Optional[Dict[str, str]] = None) -> None:
+        """写入缓存结果"""
+        self.backend.put(key, QueryCacheEntry(value, tables, versions or {}, time.time() + self.ttl))
+
+    def invalidate_tables(self, tables: List[str]) -> int:
+        """使引用了指定表的所有缓存结果失效，返回删除的条目数"""
+        return self.backend.delete_tables(tables)
+
+    def clear(self) -> None:
+        self.backend.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """返回缓存命中统计信息"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self.backend),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
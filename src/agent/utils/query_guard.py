@@ -0,0 +1,143 @@
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+
+from agent.utils.log_utils import log
+
+# MySQL 语句执行超时（MAX_EXECUTION_TIME）触发的错误码
+MYSQL_TIMEOUT_ERRORS = (3024, 1317)
+COST_GUARD_MODES = ("off", "warn", "reject")
+RUNNING_STATEMENT_KEY = "running_statement"
+
+
+class QueryTimeoutError(ValueError):
+    """查询执行超时或被取消"""
+
+
+class RunningStatement:
+    """正在执行的语句，可以从其他线程或协程中取消
+
+    SQLite 通过 sqlite3.Connection.interrupt() 中断（可跨线程调用），
+    MySQL 通过另一个连接执行 KILL QUERY <连接 ID>。
+    """
+
+    def __init__(self, dialect: str, driver_connection: Any, kill_engine: Optional[Engine]):
+        self.dialect = dialect
+        self.driver_connection = driver_connection
+        self.kill_engine = kill_engine
+        self.cancelled = False
+        self.timed_out = False
+        # aiosqlite 的连接对象把真正的 sqlite3 连接保存在 _conn 中；取消时 aiosqlite 可能已经关闭了连接，
+        # 因此在语句开始时就取出
+        self._sqlite = getattr(driver_connection, "_conn", driver_connection) if dialect == "sqlite" else None
+
+    def _mysql_thread_id(self) -> Optional[int]:
+        thread_id = getattr(self.driver_connection, "server_thread_id", None)
+        return thread_id[0] if thread_id else None
+
+    def cancel(self, timed_out: bool = False) -> None:
+        """取消语句；MySQL 的 KILL QUERY 在后台线程中执行，不阻塞调用方"""
+        if self.cancelled:
+            return
+        self.cancelled = True
+        self.timed_out = timed_out
+        try:
+            if self.dialect == "sqlite":
+                self._sqlite.interrupt()
+            elif self.dialect == "mysql" and self.kill_engine is not None:
+                thread_id = self._mysql_thread_id()
+                if thread_id is not None:
+                    threading.Thread(target=self._kill_mysql_query, args=(thread_id,), daemon=True).start()
+        except Exception as e:
+            log.warning(f"取消查询失败: {e}")
+
+    def _kill_mysql_query(self, thread_id: int) -> None:
+        try:
+            with self.kill_engine.connect() as connection:
+                connection.execute(text(f"KILL QUERY {int(thread_id)}"))
+        except Exception as e:
+            log.warning(f"取消查询失败: {e}")
+
+
+def _set_mysql_timeout(connection: Connection, timeout: Optional[float]) -> None:
+    # max_execution_time 是会话变量，记录在连接的 info 中，同一个物理连接只在取值变化时设置一次
+    milliseconds = int(timeout * 1000) if timeout else 0
+    if connection.info.get("max_execution_time", 0) != milliseconds:
+        connection.execute(text(f"SET SESSION max_execution_time = {milliseconds}"))
+        connection.info["max_execution_time"] = milliseconds
+
+
+@contextmanager
+def guard_statement(connection: Connection, timeout: Optional[float], kill_engine: Optional[Engine] = None):
+    """为一次查询设置执行时间上限，并登记可取消的语句
+
+    - MySQL: 设置会话变量 max_execution_time，由服务端终止超时的 SELECT
+    - SQLite: 到期后由定时器调用 interrupt() 中断
+    执行期间语句登记在连接的 info 中，其他协程或线程可以通过 cancel_running_statement 中断它。
+    超时的查询抛出 QueryTimeoutError。
+    """
+    dialect = connection.dialect.name
+    driver_connection = connection.connection.driver_connection
+    statement = RunningStatement(dialect, driver_connection, kill_engine)
+    # 连接断开后 connection.info 不可再访问（会抛出 PendingRollbackError 掩盖原来的错误），提前取出
+    info = connection.info
+    info[RUNNING_STATEMENT_KEY] = statement
+    timer = None
+    if dialect == "mysql":
+        _set_mysql_timeout(connection, timeout)
+    elif dialect == "sqlite" and timeout:
+        timer = threading.Timer(timeout, statement.cancel, kwargs={"timed_out": True})
+        timer.daemon = True
+        timer.start()
+    try:
+        yield statement
+    except BaseException as e:
+        if not isinstance(e, Exception):
+            # 调用方放弃了这次调用（KeyboardInterrupt、进程退出），不再需要查询结果
+            statement.cancel()
+            log.warning(f"调用被取消（{type(e).__name__}），已中断正在执行的查询")
+            raise
+        orig = getattr(e, "orig", None)
+        code = orig.args[0] if orig is not None and getattr(orig, "args", None) else None
+        if statement.timed_out or (dialect == "mysql" and code in MYSQL_TIMEOUT_ERRORS):
+            raise QueryTimeoutError(f"查询执行超过 {timeout} 秒，已被取消。请添加更精确的筛选条件、"
+                                    f"使用有索引的列或先用聚合缩小结果集后重试。") from e
+        raise
+    finally:
+        info.pop(RUNNING_STATEMENT_KEY, None)
+        if timer is not None:
+            timer.cancel()
+
+
+def cancel_running_statement(connection_info: Dict[str, Any]) -> bool:
+    """取消连接上正在执行的语句（由 guard_statement 登记在连接的 info 中），返回是否有语句被取消"""
+    statement = connection_info.get(RUNNING_STATEMENT_KEY)
+    if statement is None:
+        return False
+    statement.cancel()
+    return True
+
+
+def describe_costly_steps(plan: Dict[str, Any]) -> List[str]:
+    """列出执行计划中全表扫描的步骤，用于提示模型如何改写查询"""
+    steps = []
+    for step in plan["steps"]:
+        if step["access_type"] in ("ALL", "SCAN") and step["key"] is None and step["table"]:
+            rows = f"约 {step['rows']} 行" if step["rows"] is not None else "行数未知"
+            steps.append(f"{step['table']}（全表扫描，{rows}）")
+    return steps
+
+
+def cost_hint(plan: Dict[str, Any], max_estimated_rows: int) -> str:
+    """生成成本超限时返回给模型的提示"""
+    hint = f"执行计划估算需要处理约 {plan['estimated_rows']:,} 行，超过上限 {max_estimated_rows:,} 行。"
+    costly = describe_costly_steps(plan)
+    if costly:
+        hint += f"全表扫描的步骤：{'、'.join(costly)}。"
+    if len(plan["steps"]) > 1:
+        hint += "多表查询请确认每个 JOIN 都有连接条件，避免笛卡尔积；"
+    hint += "请在 WHERE 中使用有索引的列（可通过 sql_db_table_schema 查看索引）、添加更精确的筛选条件或先聚合再连接。"
+    return hint
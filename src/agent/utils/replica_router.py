@@ -0,0 +1,299 @@
+import itertools
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine, make_url
+from sqlalchemy.exc import DBAPIError, SQLAlchemyError
+
+from agent.utils.engine_registry import derive_async_url, engine_registry
+from agent.utils.log_utils import log
+from agent.utils.perf_utils import instrument_engine, metrics
+
+# 复制延迟探测：传入副本上的连接，返回延迟秒数，None 表示复制已停止（视为延迟无限大）
+LagProbe = Callable[[Connection], Optional[float]]
+
+
+def default_lag_probe(connection: Connection) -> Optional[float]:
+    """默认的复制延迟探测
+
+    MySQL 读取 SHOW REPLICA STATUS（8.0.22 之前为 SHOW SLAVE STATUS）中的 Seconds_Behind_Source，
+    没有复制状态（不是副本）时延迟为 0；SQLite 等没有复制的数据库只检查连接是否可用，延迟为 0。
+    """
+    if connection.dialect.name != "mysql":
+        connection.execute(text("SELECT 1"))
+        return 0.0
+    try:
+        row = connection.execute(text("SHOW REPLICA STATUS")).mappings().first()
+        column = "Seconds_Behind_Source"
+    except DBAPIError:
+        row = connection.execute(text("SHOW SLAVE STATUS")).mappings().first()
+        column = "Seconds_Behind_Master"
+    if row is None:
+        return 0.0
+    lag = row.get(column)
+    return float(lag) if lag is not None else None
+
+
+class ReplicaNode:
+    """一个数据库节点（主库或只读副本）的状态：进行中的请求数、健康状态和复制延迟"""
+
+    def __init__(self, connection: str, role: str, pool_options: Dict[str, Any],
+                 async_connection: Optional[str] = None):
+        self.connection = connection
+        self.role = role
+        self.name = make_url(connection).render_as_string(hide_password=True)
+        self.pool_options = pool_options
+        self.async_connection = async_connection
+        self._engine: Optional[Engine] = None
+        self._async_engine = None
+        self.outstanding = 0
+        self.healthy = True
+        # None 表示尚未探测
+        self.lag: Optional[float] = None
+        self.failures = 0
+        self.requests = 0
+        self.last_error: Optional[str] = None
+        self.last_checked = float("-inf")
+
+    @property
+    def engine(self) -> Engine:
+        if self._engine is None:
+            self._engine = engine_registry.get_engine(self.connection, **self.pool_options)
+            instrument_engine(self._engine)
+        return self._engine
+
+    @property
+    def async_engine(self):
+        if self._async_engine is None:
+            url = self.async_connection or derive_async_url(self.connection)
+            self._async_engine = engine_registry.get_async_engine(
+                url, **{**engine_registry.options_for(self.connection), **self.pool_options})
+            instrument_engine(self._async_engine.sync_engine)
+        return self._async_engine
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "role": self.role,
+            "healthy": self.healthy,
+            "lag": self.lag,
+            "outstanding": self.outstanding,
+            "requests": self.requests,
+            "failures": self.failures,
+            "last_error": self.last_error,
+        }
+
+
+class ReplicaRouter:
+    """只读请求的副本路由
+
+    在健康且复制延迟不超过 max_lag 的副本中选择进行中请求最少的一个（相同时轮流选择），
+    没有可用副本时回退到主库。后台线程每隔 check_interval 秒探测各副本的连通性和复制延迟，
+    连接失败的副本立即标记为不可用并在建立连接时自动换用下一个节点，恢复后由健康检查重新启用。
+    查询过程中连接断开的副本在归还时标记为不可用，由调用方决定是否重试（MySQLDataBaseManager 对只读查询重试一次）。
+    """
+
+    def __init__(self, primary: str, replicas: List[str], max_lag: float = 30.0, check_interval: float = 5.0,
+                 lag_probe: Optional[LagProbe] = None, pool_options: Optional[Dict[str, Any]] = None,
+                 async_replicas: Optional[List[str]] = None, fallback_to_primary: bool = True):
+        """初始化副本路由
+
+        Args:
+            primary: 主库连接字符串，没有可用副本时使用
+            replicas: 只读副本的连接字符串列表
+            max_lag: 允许的最大复制延迟（秒），超过后暂停使用该副本
+            check_interval: 后台健康检查的间隔（秒），None 表示不启动后台检查
+            lag_probe: 复制延迟探测函数，默认为 default_lag_probe
+            pool_options: 各副本引擎的连接池参数
+            async_replicas: 与 replicas 一一对应的异步连接字符串，为 None 时自动推导
+            fallback_to_primary: 没有可用副本时是否回退到主库，False 时抛出错误
+        """
+        pool_options = pool_options or {}
+        async_replicas = async_replicas or [None] * len(replicas)
+        self.primary = ReplicaNode(primary, "primary", pool_options)
+        self.replicas = [ReplicaNode(replica, "replica", pool_options, async_replica)
+                         for replica, async_replica in zip(replicas, async_replicas)]
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.lag_probe = lag_probe or default_lag_probe
+        self.fallback_to_primary = fallback_to_primary
+        self._lock = threading.Lock()
+        self._tie_breaker = itertools.count()
+        self._checker: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def _usable(self, node: ReplicaNode) -> bool:
+        return node.healthy and (node.lag is None or node.lag <= self.max_lag)
+
+    def _candidates(self) -> List[ReplicaNode]:
+        """按优先顺序返回候选节点：可用副本按进行中请求数排序（相同时从轮转位置开始），允许回退时主库排在最后"""
+        start = next(self._tie_breaker)
+        count = len(self.replicas)
+        rotated = [self.replicas[(start + i) % count] for i in range(count)]
+        candidates = sorted((node for node in rotated if self._usable(node)), key=lambda node: node.outstanding)
+        if self.fallback_to_primary or not self.replicas:
+            candidates.append(self.primary)
+        return candidates
+
+    def _no_replica_error(self, errors: List[str]) -> ValueError:
+        return ValueError(f"没有可用的只读副本: {'; '.join(errors) or '全部副本不健康或复制延迟过大'}")
+
+    def _acquire(self, node: ReplicaNode) -> None:
+        with self._lock:
+            node.outstanding += 1
+            node.requests += 1
+
+    def release(self, node: ReplicaNode, error: Optional[BaseException] = None) -> None:
+        """归还节点；请求因连接断开失败时将节点标记为不可用"""
+        with self._lock:
+            node.outstanding -= 1
+        if isinstance(error, DBAPIError) and error.connection_invalidated and node.role == "replica":
+            self.mark_failed(node, error)
+
+    def mark_failed(self, node: ReplicaNode, error: BaseException) -> None:
+        with self._lock:
+            was_healthy = node.healthy
+            node.healthy = False
+            node.failures += 1
+            node.last_error = str(error)
+        metrics.inc("agent_replica_failures_total", node=node.name)
+        if was_healthy:
+            log.warning(f"只读副本不可用，已暂停使用: {node.name}: {error}")
+
+    @contextmanager
+    def connect(self):
+        """从选中的节点获取同步连接，yield (节点, 连接)；建立连接失败时依次换用下一个候选节点"""
+        self._start_checker()
+        errors = []
+        for node in self._candidates():
+            self._acquire(node)
+            try:
+                connection = node.engine.connect()
+            except SQLAlchemyError as e:
+                self.release(node)
+                if node.role == "primary":
+                    raise
+                self.mark_failed(node, e)
+                errors.append(f"{node.name}: {e}")
+                continue
+            break
+        else:
+            raise self._no_replica_error(errors)
+        error = None
+        try:
+            with connection:
+                yield node, connection
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            self.release(node, error)
+
+    @asynccontextmanager
+    async def aconnect(self):
+        """connect 的异步版本，yield (节点, AsyncConnection)"""
+        self._start_checker()
+        errors = []
+        for node in self._candidates():
+            self._acquire(node)
+            try:
+                connection = await node.async_engine.connect()
+            except SQLAlchemyError as e:
+                self.release(node)
+                if node.role == "primary":
+                    raise
+                self.mark_failed(node, e)
+                errors.append(f"{node.name}: {e}")
+                continue
+            break
+        else:
+            raise self._no_replica_error(errors)
+        error = None
+        try:
+            yield node, connection
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            try:
+                await connection.close()
+            finally:
+                self.release(node, error)
+
+    def node_for_engine(self, engine: Engine) -> ReplicaNode:
+        """根据连接所属的引擎（同步引擎或异步引擎的 sync_engine）找到所属节点
+
+        按引擎对象匹配而不是按主机和库名匹配，只在账号或连接参数上不同的节点也不会混淆。
+        """
+        for node in [self.primary, *self.replicas]:
+            if engine is node._engine or (node._async_engine is not None and engine is node._async_engine.sync_engine):
+                return node
+        raise ValueError(f"连接不属于副本路由中的任何节点: {engine.url.render_as_string(hide_password=True)}")
+
+    def check_health(self) -> None:
+        """探测每个副本的连通性和复制延迟，更新其状态"""
+        for node in self.replicas:
+            try:
+                with node.engine.connect() as connection:
+                    lag = self.lag_probe(connection)
+            except Exception as e:
+                self.mark_failed(node, e)
+                continue
+            lag = float("inf") if lag is None else lag
+            with self._lock:
+                was_usable = self._usable(node)
+                node.healthy = True
+                node.lag = lag
+                node.last_checked = time.monotonic()
+                usable = self._usable(node)
+            if lag != float("inf"):
+                metrics.observe("agent_replica_lag_seconds", lag, node=node.name)
+            # 只在可用状态变化时记录日志
+            if usable and not was_usable:
+                log.info(f"只读副本已恢复使用: {node.name}（复制延迟 {lag} 秒）")
+            elif not usable and was_usable:
+                log.warning(f"只读副本复制延迟 {lag} 秒超过上限 {self.max_lag} 秒，暂停使用: {node.name}")
+
+    def _start_checker(self) -> None:
+        if self.check_interval is None or self._checker is not None or not self.replicas:
+            return
+        with self._lock:
+            if self._checker is not None:
+                return
+
+            def check():
+                while True:
+                    try:
+                        self.check_health()
+                    except Exception as e:
+                        log.exception(e)
+                    if self._stop.wait(self.check_interval):
+                        return
+
+            self._checker = threading.Thread(target=check, name="replica-health-check", daemon=True)
+            self._checker.start()
+
+    def close(self) -> None:
+        """停止后台健康检查（之后再使用路由时会重新启动）"""
+        self._stop.set()
+        if self._checker is not None:
+            self._checker.join(timeout=5)
+            self._checker = None
+        self._stop = threading.Event()
+
+    async def aclose(self) -> None:
+        """停止后台健康检查并释放各副本的同步和异步连接池"""
+        self.close()
+        for node in self.replicas:
+            if node._engine is not None:
+                node._engine.dispose()
+            if node._async_engine is not None:
+                await node._async_engine.dispose()
+
+    def stats(self) -> List[Dict[str, Any]]:
+        """返回各节点的路由统计：健康状态、复制延迟、进行中的请求数和累计请求数"""
+        with self._lock:
+            return [node.stats() for node in [self.primary, *self.replicas]]
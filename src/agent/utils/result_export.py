@@ -0,0 +1,267 @@
+import csv
+import os
+from collections import Counter
+from datetime import date, datetime, time as dt_time
+from decimal import Decimal
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from agent.utils.format_utils import truncate_value
+
+EXPORT_FORMATS = ("parquet", "csv")
+NUMERIC_TYPES = (int, float, Decimal, np.number)
+ORDERED_TYPES = (str, date, datetime, dt_time, bytes)
+
+
+def parquet_available() -> bool:
+    """是否安装了写 Parquet 文件所需的 pyarrow"""
+    try:
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def default_export_format() -> str:
+    return "parquet" if parquet_available() else "csv"
+
+
+def _object_array(values: Sequence[Any]) -> np.ndarray:
+    # 先分配再赋值，避免元素本身是序列时被 numpy 展开为多维数组
+    array = np.empty(len(values), dtype=object)
+    array[:] = values
+    return array
+
+
+class ColumnSummary:
+    """单列的流式统计：行数、空值数、最小值 / 最大值（数值列还有均值）和出现次数最多的值
+
+    每批数据以 numpy 数组整体计算后合并；不同值超过 max_distinct 时只保留出现次数较多的一半，
+    之后的最常见值为近似结果。
+    """
+
+    def __init__(self, name: str, top_k: int = 5, max_distinct: int = 10000):
+        self.name = name
+        self.top_k = top_k
+        self.max_distinct = max_distinct
+        self.count = 0
+        self.nulls = 0
+        # "number"、"ordered"（字符串、日期等可比较的值）或 "other"，第一批非空值决定
+        self.kind: Optional[str] = None
+        self.min: Any = None
+        self.max: Any = None
+        self.sum = 0.0
+        self.numeric_count = 0
+        self.counts: Counter = Counter()
+        self.approximate = False
+
+    def _merge_range(self, low: Any, high: Any) -> None:
+        self.min = low if self.min is None or low < self.min else self.min
+        self.max = high if self.max is None or high > self.max else self.max
+
+    def update(self, values: np.ndarray) -> None:
+        """合并一批值（一维 object 数组）"""
+        nulls = np.equal(values, None)
+        self.count += len(values)
+        self.nulls += int(nulls.sum())
+        values = values[~nulls]
+        if not len(values):
+            return
+        if self.kind is None:
+            first = values[0]
+            self.kind = "number" if isinstance(first, NUMERIC_TYPES) and not isinstance(first, bool) else \
+                "ordered" if isinstance(first, ORDERED_TYPES) else "other"
+        if self.kind == "number":
+            try:
+                numbers = values.astype(np.float64)
+            except (TypeError, ValueError):
+                self.kind = "other"
+            else:
+                numbers = numbers[~np.isnan(numbers)]
+                if len(numbers):
+                    self._merge_range(float(numbers.min()), float(numbers.max()))
+                    self.sum += float(numbers.sum())
+                    self.numeric_count += len(numbers)
+        elif self.kind == "ordered":
+            try:
+                self._merge_range(values.min(), values.max())
+            except TypeError:
+                # 同一列中混有不可比较的类型
+                self.kind = "other"
+                self.min = self.max = None
+        uniques, counts = np.unique(values.astype(str), return_counts=True)
+        self.counts.update(dict(zip(uniques.tolist(), counts.tolist())))
+        if len(self.counts) > self.max_distinct:
+            self.counts = Counter(dict(self.counts.most_common(self.max_distinct // 2)))
+            self.approximate = True
+
+    def to_dict(self) -> Dict[str, Any]:
+        summary = {
+            "name": self.name,
+            "nulls": self.nulls,
+            "min": self.min,
+            "max": self.max,
+            "distinct": None if self.approximate else len(self.counts),
+            "top_values": self.counts.most_common(self.top_k),
+            "top_values_approximate": self.approximate,
+        }
+        if self.kind == "number" and self.numeric_count:
+            summary["mean"] = self.sum / self.numeric_count
+        return summary
+
+
+class _CsvWriter:
+    def __init__(self, path: str, columns: List[str]):
+        self._file = open(path, "w", newline="", encoding="utf-8")
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(columns)
+
+    def write(self, rows: List[Sequence[Any]], columns: List[np.ndarray]) -> None:
+        # NULL 写为空字段
+        self._writer.writerows(("" if value is None else value for value in row) for row in rows)
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class _ParquetWriter:
+    """按批写入 Parquet 文件：第一批数据确定每列的类型，之后的批次按该类型转换"""
+
+    def __init__(self, path: str, columns: List[str]):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ValueError("导出 Parquet 文件需要安装 pyarrow，或改用 csv 格式")
+        self._pa = pa
+        self._pq = pq
+        self._path = path
+        self._columns = columns
+        self._schema = None
+        self._writer = None
+
+    def _infer_type(self, values: np.ndarray):
+        pa = self._pa
+        inferred = pa.array(values, from_pandas=False).type
+        if pa.types.is_null(inferred):
+            # 第一批全为空值的列无法推断类型，按字符串写入
+            return pa.string()
+        if pa.types.is_decimal(inferred):
+            # 精度按第一批推断可能不够容纳后续的值，统一放宽到最大精度
+            return pa.decimal128(38, inferred.scale)
+        return inferred
+
+    def _array(self, values: np.ndarray, type_):
+        pa = self._pa
+        if pa.types.is_string(type_):
+            values = _object_array([None if v is None else str(v) for v in values])
+        try:
+            return pa.array(values, type=type_)
+        except (pa.ArrowInvalid, pa.ArrowTypeError) as e:
+            raise ValueError(f"导出 Parquet 时列的类型不一致（{type_}）: {e}")
+
+    def write(self, rows: List[Sequence[Any]], columns: List[np.ndarray]) -> None:
+        pa = self._pa
+        if self._schema is None:
+            self._schema = pa.schema([(name, self._infer_type(values))
+                                      for name, values in zip(self._columns, columns)])
+            self._writer = self._pq.ParquetWriter(self._path, self._schema, compression="zstd")
+        arrays = [self._array(values, field.type) for values, field in zip(columns, self._schema)]
+        self._writer.write_table(pa.Table.from_arrays(arrays, schema=self._schema))
+
+    def close(self) -> None:
+        if self._writer is None:
+            # 空结果也写出只有列名的文件
+            self._pq.write_table(self._pa.table({name: self._pa.array([], self._pa.string())
+                                                 for name in self._columns}), self._path)
+        else:
+            self._writer.close()
+
+
+class ResultExporter:
+    """把查询结果分批写入本地文件，并在同一遍读取中计算每列的统计信息，内存占用只与批大小有关"""
+
+    def __init__(self, path: str, output_format: str, columns: List[str], top_k: int = 5,
+                 max_distinct: int = 10000):
+        """初始化导出
+
+        Args:
+            path: 输出文件路径
+            output_format: 文件格式，取值见 EXPORT_FORMATS
+            columns: 列名
+            top_k: 每列统计的最常见值数量
+            max_distinct: 每列精确统计的不同值数量上限，超出后最常见值为近似结果
+        """
+        if output_format not in EXPORT_FORMATS:
+            raise ValueError(f"不支持的导出格式: {output_format}，可选值: {', '.join(EXPORT_FORMATS)}")
+        self.path = path
+        self.output_format = output_format
+        self.columns = columns
+        self.rows = 0
+        self.summaries = [ColumnSummary(name, top_k, max_distinct) for name in columns]
+        writer = _ParquetWriter if output_format == "parquet" else _CsvWriter
+        self._writer = writer(path, columns)
+
+    def write(self, rows: List[Sequence[Any]]) -> None:
+        """写入一批记录并更新统计"""
+        if not rows:
+            return
+        columns = [_object_array(values) for values in zip(*rows)]
+        self._writer.write(rows, columns)
+        for summary, values in zip(self.summaries, columns):
+            summary.update(values)
+        self.rows += len(rows)
+
+    def close(self) -> None:
+        self._writer.close()
+
+    def abort(self) -> None:
+        """导出失败时关闭并删除写了一半的文件"""
+        try:
+            self._writer.close()
+        except Exception:
+            pass
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "path": os.path.abspath(self.path),
+            "format": self.output_format,
+            "rows": self.rows,
+            "bytes": os.path.getsize(self.path) if os.path.exists(self.path) else 0,
+            "columns": [summary.to_dict() for summary in self.summaries],
+        }
+
+
+def _format_value(value: Any, max_width: int = 40) -> str:
+    if isinstance(value, float):
+        return f"{value:.6g}"
+    return truncate_value(str(value), max_width)
+
+
+def format_export_summary(summary: Dict[str, Any]) -> str:
+    """把导出结果渲染为提供给大模型的简短文本：文件位置、行数和每列的统计信息"""
+    lines = [f"查询结果已导出到文件: {summary['path']}（{summary['format']}，共 {summary['rows']} 行，"
+             f"{summary['bytes'] / 1024 / 1024:.2f} MB）"]
+    if summary.get("truncated"):
+        lines[0] += f"。注意：结果超过导出行数上限，只导出了前 {summary['rows']} 行"
+    if summary.get("warning"):
+        lines.append(summary["warning"])
+    lines.append("各列统计:")
+    for column in summary["columns"]:
+        parts = [f"空值 {column['nulls']}"]
+        if column["min"] is not None:
+            parts.append(f"最小值 {_format_value(column['min'])}")
+            parts.append(f"最大值 {_format_value(column['max'])}")
+        if "mean" in column:
+            parts.append(f"平均值 {_format_value(column['mean'])}")
+        if column["distinct"] is not None:
+            parts.append(f"不同值 {column['distinct']} 个")
+        if column["top_values"]:
+            approximate = "（近似）" if column["top_values_approximate"] else ""
+            parts.append(f"最常见{approximate}: " + ", ".join(
+                f"{_format_value(value)} ({count})" for value, count in column["top_values"]))
+        lines.append(f"- {column['name']}: {'；'.join(parts)}")
+    return "\n".join(lines)
@@ -0,0 +1,122 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Tuple
+
+
+class SchemaCacheEntry:
+    """缓存条目：同时保存结构化的元数据和渲染后的文本"""
+
+    __slots__ = ("metadata", "text", "version", "expires_at")
+
+    def __init__(self, metadata: Any, text: Optional[str], version: Hashable, expires_at: float):
+        self.metadata = metadata
+        self.text = text
+        self.version = version
+        self.expires_at = expires_at
+
+
+class SchemaCache:
+    """线程安全的表结构元数据缓存，支持 TTL 过期、LRU 淘汰以及基于版本号的失效"""
+
+    def __init__(self, ttl: float = 300.0, max_entries: int = 1024):
+        """初始化缓存
+
+        Args:
+            ttl: 条目的存活时间（秒），小于等于 0 表示永不过期
+            max_entries: 最多缓存的条目数，超出后按最近最少使用淘汰
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, SchemaCacheEntry]" = OrderedDict()
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key: Hashable, version: Hashable = None) -> Optional[SchemaCacheEntry]:
+        """读取缓存条目，过期或版本不一致时视为未命中并删除该条目"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if (self.ttl > 0 and entry.expires_at < time.monotonic()) or entry.version != version:
+                del self._entries[key]
+                self.invalidations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def contains(self, key: Hashable, version: Hashable = None) -> bool:
+        """判断是否存在有效的缓存条目，不计入命中统计，也不改变淘汰顺序"""
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry is not None and entry.version == version and \
+                (self.ttl <= 0 or entry.expires_at >= time.monotonic())
+
+    def put(self, key: Hashable, metadata: Any, text: Optional[str] = None, version: Hashable = None) -> SchemaCacheEntry:
+        """写入缓存条目"""
+        entry = SchemaCacheEntry(metadata, text, version, time.monotonic() + self.ttl)
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return entry
+
+    def invalidate(self, key: Optional[Hashable] = None) -> None:
+        """使指定条目失效，key 为 None 时清空整个缓存"""
+        with self._lock:
+            if key is None:
+                self.invalidations += len(self._entries)
+                self._entries.clear()
+            elif self._entries.pop(key, None) is not None:
+                self.invalidations += 1
+
+    def export_entries(self) -> List[Tuple[Hashable, Any, Optional[str], Hashable]]:
+        """导出所有未过期的条目 (key, metadata, text, version)，用于持久化快照"""
+        now = time.monotonic()
+        with self._lock:
+            return [(key, entry.metadata, entry.text, entry.version) for key, entry in self._entries.items()
+                    if self.ttl <= 0 or entry.expires_at >= now]
+
+    def load_entries(self, entries: Iterable[Tuple[Hashable, Any, Optional[str], Hashable]]) -> int:
+        """批量写入条目（例如从快照恢复），存活时间从写入时重新计算，返回写入的条目数"""
+        count = 0
+        for key, metadata, text, version in entries:
+            self.put(key, metadata, text, version)
+            count += 1
+        return count
+
+    def stats(self) -> Dict[str, Any]:
+        """返回缓存命中统计信息"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
+
+
+# 进程级缓存注册表：相同连接串的数据库管理器共享同一个缓存
+_schema_caches: Dict[str, SchemaCache] = {}
+_registry_lock = threading.Lock()
+
+
+def get_schema_cache(connection: str, ttl: float = 300.0, max_entries: int = 1024) -> SchemaCache:
+    """获取（或创建）指定连接串对应的进程级表结构缓存"""
+    with _registry_lock:
+        cache = _schema_caches.get(connection)
+        if cache is None:
+            cache = SchemaCache(ttl=ttl, max_entries=max_entries)
+            _schema_caches[connection] = cache
+        return cache
@@ -0,0 +1,233 @@
+import re
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import bindparam, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.types import NullType
+
+# MySQL information_schema.columns.COLUMN_TYPE，例如 "varchar(64)"、"bigint(20) unsigned"、"enum('0','1')"
+_re_mysql_column_type = re.compile(r"^(?P<name>\w+)(?:\((?P<args>.*)\))?(?P<unsigned> unsigned)?(?P<zerofill> zerofill)?", re.IGNORECASE)
+_re_mysql_enum_value = re.compile(r"'((?:''|[^'])*)'")
+
+
+def supports_bulk_introspection(dialect_name: str) -> bool:
+    """判断当前数据库方言是否支持批量读取表结构"""
+    return dialect_name in ("mysql", "sqlite")
+
+
+def load_tables_metadata_bulk(connection: Connection, table_names: List[str]) -> Dict[str, Dict[str, Any]]:
+    """以固定次数的查询批量读取多张表的结构化元数据
+
+    返回值与逐表调用 Inspector 得到的结构一致（columns / primary_keys / foreign_keys / indexes），
+    可以直接交给 MySQLDataBaseManager._render_table_schema 渲染。
+
+    Args:
+        connection: 数据库连接
+        table_names: 要读取的表名列表
+
+    Returns:
+        以表名为键的元数据字典，不存在的表不会出现在结果中
+    """
+    if not table_names:
+        return {}
+    dialect_name = connection.dialect.name
+    if dialect_name == "mysql":
+        return _load_mysql(connection, table_names)
+    if dialect_name == "sqlite":
+        return _load_sqlite(connection, table_names)
+    raise NotImplementedError(f"不支持批量读取 {dialect_name} 数据库的表结构")
+
+
+def _new_metadata(table_name: str) -> Dict[str, Any]:
+    return {"table_name": table_name, "columns": [], "primary_keys": [], "foreign_keys": [], "indexes": []}
+
+
+def _sort_indexes(metadata: Dict[str, Dict[str, Any]]) -> None:
+    # 与 SQLAlchemy Inspector.get_indexes 保持一致：按索引名排序
+    for table in metadata.values():
+        table["indexes"].sort(key=lambda d: d["name"] or "~")
+
+
+def _mysql_column_type(dialect, column_type: str):
+    """将 COLUMN_TYPE 还原为 SQLAlchemy MySQL 类型，规则与 SHOW CREATE TABLE 的反射解析一致"""
+    m = _re_mysql_column_type.match(column_type)
+    if m is None:
+        return NullType()
+    col_type = dialect.ischema_names.get(m.group("name").lower(), NullType)
+    args = m.group("args")
+    if not args:
+        type_args = []
+    elif args.startswith("'"):
+        type_args = [v.replace("''", "'") for v in _re_mysql_enum_value.findall(args)]
+    else:
+        type_args = [int(v) for v in re.findall(r"\d+", args)]
+
+    type_kw = {}
+    if col_type.__name__ in ("DATETIME", "TIME", "TIMESTAMP") and type_args:
+        type_kw["fsp"] = type_args.pop(0)
+    if m.group("unsigned"):
+        type_kw["unsigned"] = True
+    if m.group("zerofill"):
+        type_kw["zerofill"] = True
+    try:
+        return col_type(*type_args, **type_kw)
+    except TypeError:
+        return col_type()
+
+
+def _load_mysql(connection: Connection, table_names: List[str]) -> Dict[str, Dict[str, Any]]:
+    names = bindparam("names", expanding=True)
+    metadata: Dict[str, Dict[str, Any]] = {}
+
+    # 1. 所有列
+    columns = connection.execute(text("""
+            SELECT table_name, column_name, column_type, is_nullable, column_default, column_comment
+            FROM information_schema.columns
+            WHERE table_schema = DATABASE() AND table_name IN :names
+            ORDER BY table_name, ordinal_position
+    """).bindparams(names), {"names": table_names})
+    for table_name, column_name, column_type, is_nullable, default, comment in columns:
+        table = metadata.setdefault(table_name, _new_metadata(table_name))
+        table["columns"].append({
+            "name": column_name,
+            "type": _mysql_column_type(connection.dialect, column_type),
+            "nullable": is_nullable == "YES",
+            "default": default,
+            "comment": comment or None,
+        })
+
+    # 2. 主键和外键
+    key_usage = connection.execute(text("""
+            SELECT table_name, constraint_name, column_name, referenced_table_schema,
+                   referenced_table_name, referenced_column_name
+            FROM information_schema.key_column_usage
+            WHERE table_schema = DATABASE() AND table_name IN :names
+                AND (constraint_name = 'PRIMARY' OR referenced_table_name IS NOT NULL)
+            ORDER BY table_name, constraint_name, ordinal_position
+    """).bindparams(names), {"names": table_names})
+    foreign_keys: Dict[tuple, Dict[str, Any]] = {}
+    for table_name, constraint_name, column_name, ref_schema, ref_table, ref_column in key_usage:
+        table = metadata.get(table_name)
+        if table is None:
+            continue
+        if constraint_name == "PRIMARY":
+            table["primary_keys"].append(column_name)
+            continue
+        fk = foreign_keys.get((table_name, constraint_name))
+        if fk is None:
+            fk = {
+                "name": constraint_name,
+                "constrained_columns": [],
+                "referred_schema": None if ref_schema == connection.engine.url.database else ref_schema,
+                "referred_table": ref_table,
+                "referred_columns": [],
+            }
+            foreign_keys[(table_name, constraint_name)] = fk
+            table["foreign_keys"].append(fk)
+        fk["constrained_columns"].append(column_name)
+        fk["referred_columns"].append(ref_column)
+
+    # 3. 索引（不含主键）
+    statistics = connection.execute(text("""
+            SELECT table_name, index_name, non_unique, column_name
+            FROM information_schema.statistics
+            WHERE table_schema = DATABASE() AND table_name IN :names AND index_name <> 'PRIMARY'
+            ORDER BY table_name, index_name, seq_in_index
+    """).bindparams(names), {"names": table_names})
+    indexes: Dict[tuple, Dict[str, Any]] = {}
+    for table_name, index_name, non_unique, column_name in statistics:
+        table = metadata.get(table_name)
+        if table is None:
+            continue
+        index = indexes.get((table_name, index_name))
+        if index is None:
+            index = {"name": index_name, "column_names": [], "unique": not int(non_unique)}
+            indexes[(table_name, index_name)] = index
+            table["indexes"].append(index)
+        index["column_names"].append(column_name)
+
+    _sort_indexes(metadata)
+    return metadata
+
+
+def _load_sqlite(connection: Connection, table_names: List[str]) -> Dict[str, Dict[str, Any]]:
+    names = bindparam("names", expanding=True)
+    dialect = connection.dialect
+    metadata: Dict[str, Dict[str, Any]] = {}
+
+    # 1. 所有列（pk 为主键中的序号，0 表示非主键列）
+    columns = connection.execute(text("""
+            SELECT m.name, p.name, p.type, p."notnull", p.dflt_value, p.pk
+            FROM sqlite_master m JOIN pragma_table_info(m.name) p
+            WHERE m.type = 'table' AND m.name IN :names
+            ORDER BY m.name, p.cid
+    """).bindparams(names), {"names": table_names})
+    primary_keys: Dict[str, List[tuple]] = {}
+    for table_name, column_name, type_, notnull, default, pk in columns:
+        table = metadata.setdefault(table_name, _new_metadata(table_name))
+        table["columns"].append({
+            "name": column_name,
+            "type": dialect._resolve_type_affinity(type_),
+            "nullable": not notnull,
+            "default": default,
+        })
+        if pk:
+            primary_keys.setdefault(table_name, []).append((pk, column_name))
+    for table_name, pks in primary_keys.items():
+        metadata[table_name]["primary_keys"] = [name for _, name in sorted(pks)]
+
+    # 2. 外键
+    fk_rows = connection.execute(text("""
+            SELECT m.name, f.id, f."table", f."from", f."to"
+            FROM sqlite_master m JOIN pragma_foreign_key_list(m.name) f
+            WHERE m.type = 'table' AND m.name IN :names
+            ORDER BY m.name, f.id, f.seq
+    """).bindparams(names), {"names": table_names})
+    foreign_keys: Dict[tuple, Dict[str, Any]] = {}
+    for table_name, fk_id, ref_table, column_name, ref_column in fk_rows:
+        fk = foreign_keys.get((table_name, fk_id))
+        if fk is None:
+            fk = {"name": None, "constrained_columns": [], "referred_schema": None,
+                  "referred_table": ref_table, "referred_columns": []}
+            foreign_keys[(table_name, fk_id)] = fk
+            metadata[table_name]["foreign_keys"].append(fk)
+        fk["constrained_columns"].append(column_name)
+        fk["referred_columns"].append(ref_column)
+    for (table_name, _), fk in foreign_keys.items():
+        # 未显式指定参照列时参照的是被引用表的主键
+        if any(col is None for col in fk["referred_columns"]):
+            referred = metadata.get(fk["referred_table"])
+            if referred is not None:
+                fk["referred_columns"] = list(referred["primary_keys"])
+            else:
+                fk["referred_columns"] = list(connection.execute(
+                    text("SELECT name FROM pragma_table_info(:t) WHERE pk > 0 ORDER BY pk"),
+                    {"t": fk["referred_table"]},
+                ).scalars())
+
+    # 3. 索引（忽略 sqlite 自动创建的索引和表达式索引）
+    index_rows = connection.execute(text("""
+            SELECT m.name, il.name, il."unique", ii.name
+            FROM sqlite_master m
+                JOIN pragma_index_list(m.name) il
+                JOIN pragma_index_info(il.name) ii
+            WHERE m.type = 'table' AND m.name IN :names AND il.name NOT LIKE 'sqlite_autoindex%'
+            ORDER BY m.name, il.name, ii.seqno
+    """).bindparams(names), {"names": table_names})
+    indexes: Dict[tuple, Optional[Dict[str, Any]]] = {}
+    for table_name, index_name, unique, column_name in index_rows:
+        key = (table_name, index_name)
+        if key not in indexes:
+            indexes[key] = {"name": index_name, "column_names": [], "unique": unique}
+            metadata[table_name]["indexes"].append(indexes[key])
+        index = indexes[key]
+        if index is None:
+            continue
+        if column_name is None:
+            metadata[table_name]["indexes"].remove(index)
+            indexes[key] = None
+            continue
+        index["column_names"].append(column_name)
+
+    _sort_indexes(metadata)
+    return metadata
@@ -0,0 +1,519 @@
+import difflib
+import re
+import threading
+import time
+import uuid
+import zlib
+from typing import Any, Callable, Dict, Hashable, List, Optional
+
+import numpy as np
+
+from agent.utils.log_utils import log
+from agent.utils.perf_utils import metrics
+from agent.utils.sql_utils import extract_table_names, tokenize_sql
+
+_re_feature_word = re.compile(r"[a-z]+|[\u4e00-\u9fff]+")
+# 问题中的数字和引号内的文本：只在格式上不同的问题可以共享 SQL，取值不同的问题不行
+_re_literal = re.compile(r"\d+(?:\.\d+)?|'[^']*'|\"[^\"]*\"|“[^”]*”|‘[^’]*’")
+# 比较问题差异的词元：英文单词和数字取整词，中文按字
+_re_question_token = re.compile(r"[a-z0-9_]+|[\u4e00-\u9fff]")
+_re_term_word = re.compile(r"[a-z0-9]+")
+# 筛选子句：从 WHERE / HAVING / ON 开始，到下一个非筛选子句的关键字为止
+_FILTER_START = frozenset(("WHERE", "HAVING", "ON"))
+_FILTER_END = frozenset(("GROUP", "ORDER", "LIMIT", "UNION", "WINDOW", "JOIN", "SELECT", "FROM"))
+
+# 意思相反或限定不同的词（极值、状态、时间、比较、排序、聚合、否定）：
+# 问题之间只差这些词时 n-gram 相似度仍然很高，但不能共享 SQL；同一组内的词视为同义
+CONTRAST_TERMS = {
+    "most": "最多 最大 最高 最贵 最长 最晚 most max maximum highest largest biggest top",
+    "least": "最少 最小 最低 最便宜 最短 最早 least min minimum lowest smallest fewest bottom",
+    "asc": "升序 正序 从小到大 从低到高 从早到晚 ascending asc",
+    "desc": "降序 倒序 从大到小 从高到低 从晚到早 descending desc",
+    "gt": "大于 超过 高于 多于 以上 不少于 不低于 至少 above over more greater exceed exceeds exceeding",
+    "lt": "小于 低于 少于 不足 以下 不超过 不高于 至多 below under less fewer",
+    "eq": "等于 equal equals",
+    "increase": "增加 增长 上升 上涨 increase increased growth",
+    "decrease": "减少 下降 下跌 降低 decrease decreased decline",
+    "active": "正常 启用 有效 激活 在职 活跃 上架 active enabled valid",
+    "inactive": "停用 禁用 无效 失效 离职 冻结 下架 注销 inactive disabled invalid",
+    "success": "成功 success successful succeeded",
+    "failure": "失败 fail failed failure",
+    "deleted": "删除 已删 deleted removed",
+    "sum": "总和 合计 总计 总额 求和 sum total",
+    "avg": "平均 均值 average avg mean",
+    "count": "数量 多少 个数 条数 几 count number",
+    "distinct": "去重 不重复 不同的 distinct unique",
+    "first": "第一 首次 first",
+    "today": "今天 今日 当天 当日 today",
+    "yesterday": "昨天 昨日 yesterday",
+    "tomorrow": "明天 明日 tomorrow",
+    "this_week": "本周 这周 本星期 这星期",
+    "last_week": "上周 上星期 上个星期",
+    "next_week": "下周 下星期 下个星期",
+    "this_month": "本月 这个月 这月 当月",
+    "last_month": "上月 上个月",
+    "next_month": "下月 下个月",
+    "this_quarter": "本季度 这个季度 当季",
+    "last_quarter": "上季度 上个季度",
+    "this_year": "今年 本年 当年",
+    "last_year": "去年 上一年",
+    "next_year": "明年 下一年",
+    "this": "this current",
+    "last": "last previous prior past 最后",
+    "next": "next coming",
+    "recent": "最近 近期 recent recently latest",
+    "per": "每 each every per",
+    "day": "天 日 day days daily",
+    "week": "周 星期 week weeks weekly",
+    "month": "月 month months monthly",
+    "quarter": "季度 quarter quarters quarterly",
+    "year": "年 year years yearly annual",
+    "not": "不 没 无 未 非 别 除了 除 排除 以外 之外 not no never without except excluding exclude none "
+           "don't doesn't didn't isn't aren't wasn't weren't cannot can't",
+}
+_contrast_keys = {term: key for key, terms in CONTRAST_TERMS.items() for term in terms.split()}
+# 按长度从长到短匹配，"不超过" 不会被拆成 "不" 和 "超过"
+_re_contrast = re.compile("|".join(
+    re.escape(term) if not term.isascii() else rf"(?<![a-z_]){re.escape(term)}(?![a-z_])"
+    for term in sorted(_contrast_keys, key=len, reverse=True)))
+
+# 执行查询的工具，命中缓存时以这两个工具的成功调用作为可复用的 SQL
+QUERY_TOOL_NAMES = ("sql_db_query_checked", "sql_db_query")
+# 工具执行失败时返回的错误前缀（见 agent.tools.test_to_sql_tools）
+QUERY_ERROR_PREFIX = "执行SQL查询时出错"
+
+
+def question_literals(question: str) -> frozenset:
+    """提取问题中的数字和引号内的文本"""
+    return frozenset(m.group().strip("'\"“”‘’") for m in _re_literal.finditer(question))
+
+
+def question_contrasts(question: str) -> frozenset:
+    """提取问题中的对立词和限定词（见 CONTRAST_TERMS），同义词归为同一个键"""
+    return frozenset(_contrast_keys[m.group()] for m in _re_contrast.finditer(question.lower()))
+
+
+def question_tokens(question: str) -> List[str]:
+    """问题的词元序列，忽略大小写、空白和标点"""
+    return _re_question_token.findall(question.lower())
+
+
+def sql_filter_terms(sql: str) -> frozenset:
+    """SQL 中的字面量内容以及 WHERE / HAVING / ON 子句中的标识符（小写，下划线分隔的标识符同时拆成单词）"""
+    terms = set()
+    in_filter = False
+    for kind, value in tokenize_sql(sql):
+        word = value.upper()
+        if kind == "word" and word in _FILTER_START:
+            in_filter = True
+        elif kind == "word" and word in _FILTER_END:
+            in_filter = False
+        elif kind in ("string", "number") or (in_filter and kind in ("word", "quoted")):
+            term = value.strip("'\"`").lower()
+            terms.add(term)
+            terms.update(_re_term_word.findall(term))
+    terms.discard("")
+    return frozenset(terms)
+
+
+def differing_tokens(tokens: List[str], other: List[str]) -> List[str]:
+    """两个问题之间不同的词元，连续的中文字合并为一段"""
+    segments = []
+    matcher = difflib.SequenceMatcher(None, tokens, other, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            continue
+        for part in (tokens[i1:i2], other[j1:j2]):
+            chinese = ""
+            for token in part:
+                if "\u4e00" <= token <= "\u9fff":
+                    chinese += token
+                    continue
+                if chinese:
+                    segments.append(chinese)
+                    chinese = ""
+                segments.append(token)
+            if chinese:
+                segments.append(chinese)
+    return segments
+
+
+def _tokens_in_filter(segments: List[str], terms: frozenset) -> bool:
+    """不同的词元是否出现在 SQL 的字面量或筛选子句中：英文词元按整词匹配，中文按子串匹配"""
+    for segment in segments:
+        if segment.isascii():
+            if segment in terms:
+                return True
+        elif any(segment in term for term in terms):
+            return True
+    return False
+
+
+class HashedNgramVectorizer:
+    """基于哈希 n-gram 的本地文本向量
+
+    中文按字取 1~3-gram，英文单词取整词和字符 3-gram，特征经 crc32 哈希到固定维度（带符号以抵消碰撞），
+    词频取对数后做 L2 归一化，两个向量的点积即余弦相似度。crc32 在不同进程间结果一致。
+    """
+
+    def __init__(self, dim: int = 4096, max_n: int = 3):
+        self.dim = dim
+        self.max_n = max_n
+
+    def features(self, text: str) -> List[str]:
+        features = []
+        for word in _re_feature_word.findall(text.lower()):
+            if "\u4e00" <= word[0] <= "\u9fff":
+                for n in range(1, self.max_n + 1):
+                    features.extend(word[i:i + n] for i in range(len(word) - n + 1))
+            else:
+                features.append(word)
+                padded = f"#{word}#"
+                features.extend(f"~{padded[i:i + 3]}" for i in range(len(padded) - 2))
+        return features
+
+    def transform(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for feature in self.features(text):
+            h = zlib.crc32(feature.encode("utf-8"))
+            vector[h % self.dim] += 1.0 if h & 0x80000000 else -1.0
+        vector = np.sign(vector) * np.log1p(np.abs(vector))
+        norm = float(np.linalg.norm(vector))
+        return vector / norm if norm else vector
+
+
+class SemanticCacheEntry:
+    """语义缓存条目：问题、校验通过的 SQL、引用的表及其表结构版本"""
+
+    __slots__ = ("question", "sql", "tables", "versions", "literals", "contrasts", "tokens", "filter_terms",
+                 "loop_seconds", "created_at", "last_used", "hits")
+
+    def __init__(self, question: str, sql: str, tables: List[str], versions: Dict[str, Hashable],
+                 loop_seconds: float):
+        self.question = question
+        self.sql = sql
+        self.tables = tables
+        self.versions = versions
+        self.literals = question_literals(question)
+        self.contrasts = question_contrasts(question)
+        self.tokens = question_tokens(question)
+        self.filter_terms = sql_filter_terms(sql)
+        self.loop_seconds = loop_seconds
+        self.created_at = time.time()
+        self.last_used = time.monotonic()
+        self.hits = 0
+
+    def is_current(self, versions: Dict[str, Hashable]) -> bool:
+        """引用的表结构是否与写入时一致"""
+        return all(versions.get(table) == version for table, version in self.versions.items())
+
+
+class SemanticHit:
+    """一次语义缓存命中：匹配到的条目和相似度"""
+
+    __slots__ = ("entry", "similarity")
+
+    def __init__(self, entry: SemanticCacheEntry, similarity: float):
+        self.entry = entry
+        self.similarity = similarity
+
+
+class SemanticQueryCache:
+    """问题 → 已验证 SQL 的语义缓存
+
+    问题用 HashedNgramVectorizer 转为向量，查找时用 NumPy 对全部条目做一次矩阵乘法求余弦相似度，
+    相似度不低于 threshold，且问题中的数字、引号内文本以及对立词和限定词（最多/最少、正常/停用、
+    本月/上月、否定词等）完全相同时视为命中。
+    两个问题不同的词元出现在缓存 SQL 的字面量或筛选子句中时（例如未加引号的人名“若依”/“小明”），
+    说明问题的差别会改变 SQL，此时只有规范化后完全相同的问题才能命中。
+    条目记录写入时所引用表的表结构版本，版本变化或超过 ttl 的条目失效。
+    """
+
+    def __init__(self, threshold: float = 0.9, max_entries: int = 2000, ttl: Optional[float] = 86400.0,
+                 vectorizer: Optional[HashedNgramVectorizer] = None):
+        """初始化缓存
+
+        Args:
+            threshold: 命中所需的最低余弦相似度
+            max_entries: 最大条目数，超出时淘汰最久未使用的条目
+            ttl: 条目的存活时间（秒），None 表示只依赖表结构版本失效
+            vectorizer: 问题向量化方法，默认为 HashedNgramVectorizer()
+        """
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.vectorizer = vectorizer or HashedNgramVectorizer()
+        self._lock = threading.Lock()
+        self._vectors = np.zeros((0, self.vectorizer.dim), dtype=np.float32)
+        self._entries: List[Optional[SemanticCacheEntry]] = []
+        self._free_slots: List[int] = []
+        self._slots: Dict[str, int] = {}
+        self.hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    @staticmethod
+    def _key(question: str) -> str:
+        return " ".join(question.split())
+
+    def _remove(self, slot: int) -> None:
+        entry = self._entries[slot]
+        del self._slots[self._key(entry.question)]
+        self._entries[slot] = None
+        self._vectors[slot] = 0
+        self._free_slots.append(slot)
+
+    def _allocate(self) -> int:
+        if self._free_slots:
+            return self._free_slots.pop()
+        if len(self._slots) >= self.max_entries:
+            # 淘汰最久未使用的条目
+            slot = min(self._slots.values(), key=lambda s: self._entries[s].last_used)
+            self._remove(slot)
+            return self._free_slots.pop()
+        slot = len(self._entries)
+        self._entries.append(None)
+        if slot >= len(self._vectors):
+            # 按倍数扩容，避免逐个追加时反复复制矩阵
+            grow = np.zeros((max(16, len(self._vectors)), self.vectorizer.dim), dtype=np.float32)
+            self._vectors = np.concatenate([self._vectors, grow])
+        return slot
+
+    def match(self, question: str) -> Optional[SemanticHit]:
+        """查找与问题最相似的未过期条目，不计入命中统计；表结构版本由调用方通过 is_current 检查"""
+        vector = self.vectorizer.transform(question)
+        literals = question_literals(question)
+        contrasts = question_contrasts(question)
+        tokens = question_tokens(question)
+        with self._lock:
+            if not self._slots:
+                return None
+            scores = self._vectors[:len(self._entries)] @ vector
+            for slot in np.argsort(-scores)[:5]:
+                similarity = float(scores[slot])
+                if similarity < self.threshold:
+                    break
+                entry = self._entries[slot]
+                if entry is None or entry.literals != literals or entry.contrasts != contrasts:
+                    continue
+                if entry.tokens != tokens and _tokens_in_filter(differing_tokens(entry.tokens, tokens),
+                                                                entry.filter_terms):
+                    continue
+                if self.ttl is not None and time.time() - entry.created_at > self.ttl:
+                    self._remove(slot)
+                    continue
+                entry.last_used = time.monotonic()
+                return SemanticHit(entry, similarity)
+        return None
+
+    def put(self, question: str, sql: str, tables: List[str], versions: Dict[str, Hashable],
+            loop_seconds: float) -> None:
+        """写入问题和校验通过的 SQL，loop_seconds 为完整工具循环的耗时，用于估算命中节省的时间"""
+        entry = SemanticCacheEntry(question, sql, tables, versions, loop_seconds)
+        vector = self.vectorizer.transform(question)
+        with self._lock:
+            slot = self._slots.get(self._key(question))
+            if slot is None:
+                slot = self._allocate()
+                self._slots[self._key(question)] = slot
+            self._entries[slot] = entry
+            self._vectors[slot] = vector
+
+    def discard(self, entry: SemanticCacheEntry) -> None:
+        """删除失效的条目"""
+        with self._lock:
+            slot = self._slots.get(self._key(entry.question))
+            if slot is not None and self._entries[slot] is entry:
+                self._remove(slot)
+
+    def record_hit(self, hit: SemanticHit, seconds: float) -> None:
+        """记录一次命中，seconds 为命中路径（查找 + 执行 SQL）的耗时"""
+        saved = max(hit.entry.loop_seconds - seconds, 0.0)
+        with self._lock:
+            self.hits += 1
+            self.saved_seconds += saved
+            hit.entry.hits += 1
+        metrics.inc("agent_semantic_cache_requests_total", result="hit")
+        metrics.observe("agent_semantic_cache_saved_seconds", saved)
+
+    def record_miss(self) -> None:
+        with self._lock:
+            self.misses += 1
+        metrics.inc("agent_semantic_cache_requests_total", result="miss")
+
+    def clear(self) -> None:
+        with self._lock:
+            self._vectors = np.zeros((0, self.vectorizer.dim), dtype=np.float32)
+            self._entries.clear()
+            self._free_slots.clear()
+            self._slots.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """返回命中统计信息和累计节省的时间"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._slots),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "saved_seconds": self.saved_seconds,
+                "avg_saved_seconds": self.saved_seconds / self.hits if self.hits else 0.0,
+            }
+
+
+def single_question(messages: List[Any]) -> Optional[str]:
+    """对话中只有一个用户问题且它是最后一条消息时返回问题文本
+
+    多轮对话中的追问依赖上下文（例如“那上个月呢”），不使用语义缓存。
+    """
+    humans = [m for m in messages if getattr(m, "type", None) == "human"]
+    if len(humans) != 1 or messages[-1] is not humans[0] or not isinstance(humans[0].content, str):
+        return None
+    return humans[0].content
+
+
+def verified_sql(messages: List[Any]) -> Optional[str]:
+    """返回工具循环中最后一次成功执行的查询语句"""
+    results = {m.tool_call_id: m.content for m in messages if getattr(m, "type", None) == "tool"}
+    sql = None
+    for message in messages:
+        for call in getattr(message, "tool_calls", None) or []:
+            content = results.get(call["id"])
+            if call["name"] in QUERY_TOOL_NAMES and isinstance(content, str) \
+                    and not content.startswith(QUERY_ERROR_PREFIX):
+                sql = call["args"].get("query")
+    return sql
+
+
+def _hit_answer(hit: SemanticHit, result: str, output_format: str) -> str:
+    """命中时的最终回答：说明复用的问题和 SQL，并附上查询结果"""
+    answer = f"与此前的问题“{hit.entry.question}”相同，已直接执行当时验证过的SQL：\n```sql\n{hit.entry.sql}\n```\n"
+    if output_format == "markdown":
+        # Markdown 表格的前两行是列名和分隔行
+        rows = sum(1 for line in result.splitlines() if line.startswith("|")) - 2
+        if rows <= 0:
+            return answer + "查询没有返回任何记录。"
+        return answer + f"查询结果（{rows} 行）：\n\n{result}"
+    return answer + f"查询结果：\n{result}"
+
+
+def _hit_messages(hit: SemanticHit, result: str, output_format: str) -> List[Any]:
+    from langchain_core.messages import AIMessage, ToolMessage
+
+    call_id = f"call_{uuid.uuid4().hex[:12]}"
+    return [
+        AIMessage(content="", tool_calls=[{"name": QUERY_TOOL_NAMES[0], "args": {"query": hit.entry.sql},
+                                           "id": call_id}]),
+        ToolMessage(content=result, tool_call_id=call_id, name=QUERY_TOOL_NAMES[0]),
+        AIMessage(content=_hit_answer(hit, result, output_format),
+                  response_metadata={"semantic_cache": {"similarity": hit.similarity, "sql": hit.entry.sql}}),
+    ]
+
+
+def build_cached_graph(agent, manager, cache: SemanticQueryCache, output_format: str = "markdown",
+                       checkpointer=None, max_column_width: Optional[int] = None, max_tokens: Optional[int] = None):
+    """在 agent 图之前加一个语义缓存节点
+
+    命中时直接执行缓存的 SQL 并返回答案，不再调用模型和完整的工具循环；
+    未命中时运行 agent，结束后把最后一次成功执行的 SQL 写入缓存。
+    缓存的 SQL 执行失败或引用表的表结构版本变化时删除条目并回到完整的工具循环。
+
+    Args:
+        agent: create_agent 构建的图
+        manager: MySQLDataBaseManager，用于执行缓存的 SQL 和获取表结构版本
+        cache: 语义缓存
+        output_format: 命中时查询结果的格式，参见 MySQLDataBaseManager.execute_query；
+            结果直接作为回答展示给用户，默认使用 Markdown 表格
+        checkpointer: 外层图的 checkpointer，会话历史保存在外层图的状态中；
+            agent 应以 checkpointer=False 构建，避免每次调用再保存一份子图的 checkpoint
+        max_column_width: 单元格最大字符数，None 表示不截断
+        max_tokens: 查询结果的 token 预算，None 表示不限制
+    """
+    from langchain_core.runnables import RunnableLambda
+    from langgraph.graph import END, START, MessagesState, StateGraph
+
+    def lookup(state: dict) -> dict:
+        start = time.perf_counter()
+        question = single_question(state["messages"])
+        hit = cache.match(question) if question is not None else None
+        if hit is None:
+            return {}
+        try:
+            if not hit.entry.is_current(manager.get_schema_versions(hit.entry.tables)):
+                cache.discard(hit.entry)
+                return {}
+            result = manager.execute_query(hit.entry.sql, output_format, max_column_width, max_tokens)
+        except Exception as e:
+            log.warning(f"语义缓存的SQL执行失败，回到完整的工具循环: {e}")
+            cache.discard(hit.entry)
+            return {}
+        cache.record_hit(hit, time.perf_counter() - start)
+        return {"messages": _hit_messages(hit, result, output_format)}
+
+    async def alookup(state: dict) -> dict:
+        start = time.perf_counter()
+        question = single_question(state["messages"])
+        hit = cache.match(question) if question is not None else None
+        if hit is None:
+            return {}
+        try:
+            if not hit.entry.is_current(await manager.aget_schema_versions(hit.entry.tables)):
+                cache.discard(hit.entry)
+                return {}
+            result = await manager.aexecute_query(hit.entry.sql, output_format, max_column_width, max_tokens)
+        except Exception as e:
+            log.warning(f"语义缓存的SQL执行失败，回到完整的工具循环: {e}")
+            cache.discard(hit.entry)
+            return {}
+        cache.record_hit(hit, time.perf_counter() - start)
+        return {"messages": _hit_messages(hit, result, output_format)}
+
+    def _remember(question: Optional[str], messages: List[Any], seconds: float,
+                  get_versions: Callable[[List[str]], Dict[str, Hashable]]) -> None:
+        sql = verified_sql(messages)
+        if question is None or sql is None:
+            return
+        tables = extract_table_names(sql)
+        try:
+            cache.put(question, sql, tables, get_versions(tables), seconds)
+        except Exception as e:
+            log.warning(f"写入语义缓存失败: {e}")
+
+    def answer(state: dict, config) -> dict:
+        start = time.perf_counter()
+        question = single_question(state["messages"])
+        if question is not None:
+            cache.record_miss()
+        result = agent.invoke(state, config)
+        new_messages = result["messages"][len(state["messages"]):]
+        _remember(question, new_messages, time.perf_counter() - start, manager.get_schema_versions)
+        return {"messages": new_messages}
+
+    async def aanswer(state: dict, config) -> dict:
+        start = time.perf_counter()
+        question = single_question(state["messages"])
+        if question is not None:
+            cache.record_miss()
+        result = await agent.ainvoke(state, config)
+        new_messages = result["messages"][len(state["messages"]):]
+        seconds = time.perf_counter() - start
+        sql = verified_sql(new_messages)
+        if question is not None and sql is not None:
+            versions = await manager.aget_schema_versions(extract_table_names(sql))
+            _remember(question, new_messages, seconds, lambda _: versions)
+        return {"messages": new_messages}
+
+    def route(state: dict) -> str:
+        return END if state["messages"][-1].type == "ai" else "agent"
+
+    graph = StateGraph(MessagesState)
+    graph.add_node("semantic_cache", RunnableLambda(lookup, afunc=alookup))
+    graph.add_node("agent", RunnableLambda(answer, afunc=aanswer))
+    graph.add_edge(START, "semantic_cache")
+    graph.add_conditional_edges("semantic_cache", route, ["agent", END])
+    graph.add_edge("agent", END)
+    return graph.compile(checkpointer=checkpointer)
@@ -0,0 +1,421 @@
+import re
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+# SQL 词法单元：注释、字符串、反引号标识符、数字、单词、运算符
+# MySQL 中 -- 后面必须跟空白才是注释，1--1 是 1 - (-1)
+_re_token = re.compile(r"""
+    (?P<comment>--(?=\s|$)[^\n]*|\#[^\n]*|/\*.*?\*/)
+  | (?P<string>'(?:''|\\.|[^'\\])*'|"(?:""|\\.|[^"\\])*")
+  | (?P<quoted>`(?:``|[^`])*`)
+  | (?P<number>\d+(?:\.\d*)?(?:[eE][-+]?\d+)?|\.\d+(?:[eE][-+]?\d+)?)
+  | (?P<word>[^\W\d][\w$]*)
+  | (?P<space>\s+)
+  | (?P<op><=>|<=|>=|<>|!=|\|\||&&|[^\s\w])
+""", re.VERBOSE | re.DOTALL)
+
+SQL_KEYWORDS = frozenset("""
+    ALL AND ANY AS ASC BETWEEN BY CASE CAST COUNT CROSS CURRENT_DATE CURRENT_TIME CURRENT_TIMESTAMP
+    DATE DESC DISTINCT DIV ELSE END EXISTS FALSE FOR FROM FULL GROUP HAVING IF IN INNER INTERVAL IS
+    JOIN LEFT LIKE LIMIT MOD NATURAL NOT NULL OFFSET ON OR ORDER OUTER OVER PARTITION RECURSIVE REGEXP
+    RIGHT ROLLUP ROW ROWS SELECT SEPARATOR SOME STRAIGHT_JOIN THEN TRUE UNION USING WHEN WHERE WINDOW
+    WITH XOR AVG SUM MIN MAX GROUP_CONCAT IFNULL COALESCE CONCAT SUBSTRING DATE_FORMAT NOW YEAR MONTH DAY
+""".split())
+
+
+# 只读查询中不允许出现的写操作关键字，按所在位置判断（见 _is_write）
+WRITE_KEYWORDS = frozenset("""
+    INSERT UPDATE DELETE REPLACE MERGE UPSERT DROP ALTER CREATE TRUNCATE RENAME GRANT REVOKE
+    CALL LOAD HANDLER LOCK UNLOCK INTO OUTFILE DUMPFILE
+""".split())
+
+# 出现在只读查询子句中的写操作关键字（SELECT ... INTO OUTFILE / DUMPFILE、LOCK IN SHARE MODE），不论位置都拒绝；
+# 其余写操作关键字只在语句开头（包括括号内的子语句和 EXPLAIN 的目标语句）或 FOR UPDATE 中才是写操作
+CLAUSE_WRITE_KEYWORDS = frozenset(("INTO", "OUTFILE", "DUMPFILE", "LOCK"))
+EXPLAIN_STATEMENTS = frozenset(("EXPLAIN", "DESCRIBE", "DESC"))
+
+# 聚合函数：不含 GROUP BY 的聚合查询只输出一行
+AGGREGATE_FUNCTIONS = frozenset("""
+    COUNT SUM AVG MIN MAX GROUP_CONCAT STRING_AGG ARRAY_AGG JSON_ARRAYAGG JSON_OBJECTAGG
+    BIT_AND BIT_OR BIT_XOR STD STDDEV STDDEV_POP STDDEV_SAMP VARIANCE VAR_POP VAR_SAMP TOTAL
+""".split())
+
+# 顶层出现这些关键字时，查询要读完全部输入才能输出，LIMIT 不能提前结束扫描
+BLOCKING_KEYWORDS = frozenset(("ORDER", "GROUP", "DISTINCT", "UNION", "INTERSECT", "EXCEPT", "OVER", "WINDOW"))
+
+# 除 SELECT / WITH 外允许执行的只读语句，这些语句不注入 LIMIT，也不做 EXPLAIN 成本检查
+READ_STATEMENTS = frozenset(("SELECT", "SHOW", "DESCRIBE", "DESC", "EXPLAIN"))
+
+
+def _scan_sql(query: str) -> List[Tuple[str, str, int, int]]:
+    """将 SQL 拆分为 (类型, 文本, 起始位置, 结束位置) 词法单元，忽略空白和注释"""
+    tokens = []
+    for m in _re_token.finditer(query):
+        kind = m.lastgroup
+        if kind in ("space", "comment"):
+            continue
+        tokens.append((kind, m.group(), m.start(), m.end()))
+    return tokens
+
+
+def tokenize_sql(query: str) -> List[tuple]:
+    """将 SQL 拆分为 (类型, 文本) 词法单元，忽略空白和注释"""
+    return [(kind, value) for kind, value, _, _ in _scan_sql(query)]
+
+
+def _normalize_string(value: str) -> str:
+    # 统一使用单引号表示字符串字面量
+    if value.startswith('"'):
+        body = value[1:-1].replace('""', '"').replace("'", "''")
+        return f"'{body}'"
+    return value
+
+
+def normalize_sql(query: str) -> str:
+    """规范化 SQL 文本，用作缓存键
+
+    去除注释和多余空白、关键字统一大写、字符串字面量统一使用单引号、去掉末尾分号，
+    使只在格式上不同的查询得到相同的结果。标识符的大小写和数字字面量保持原样：
+    1 和 1.0 的查询结果类型不同，不能共享缓存。
+    """
+    parts = []
+    for kind, value in tokenize_sql(query):
+        if kind == "word" and value.upper() in SQL_KEYWORDS:
+            value = value.upper()
+        elif kind == "string":
+            value = _normalize_string(value)
+        parts.append(value)
+    while parts and parts[-1] == ";":
+        parts.pop()
+
+    normalized = ""
+    previous = None
+    for part in parts:
+        # 统一空白：词法单元之间保留一个空格，逗号、点号和括号两侧不留空格
+        if previous is not None and part not in (",", ")", ".") and previous not in ("(", ".") \
+                and not (part == "(" and previous[-1:].isalnum()):
+            normalized += " "
+        normalized += part
+        previous = part
+    return normalized
+
+
+# 每次执行结果可能不同的函数，使用它们的查询不能缓存结果
+NONDETERMINISTIC_FUNCTIONS = frozenset("""
+    NOW SYSDATE CURDATE CURTIME CURRENT_DATE CURRENT_TIME CURRENT_TIMESTAMP LOCALTIME LOCALTIMESTAMP
+    UTC_DATE UTC_TIME UTC_TIMESTAMP UNIX_TIMESTAMP RAND RANDOM UUID UUID_SHORT CONNECTION_ID LAST_INSERT_ID
+    FOUND_ROWS ROW_COUNT CURRENT_USER USER SESSION_USER SYSTEM_USER DATABASE SCHEMA VERSION SLEEP BENCHMARK
+    GET_LOCK IS_FREE_LOCK IS_USED_LOCK RELEASE_LOCK
+""".split())
+
+
+def is_deterministic(query: str) -> bool:
+    """查询是否不使用 NOW()、RAND()、UUID()、CURRENT_DATE 等每次执行结果可能不同的函数"""
+    for kind, value in tokenize_sql(query):
+        if kind == "word" and value.upper() in NONDETERMINISTIC_FUNCTIONS:
+            # CURRENT_DATE 等可以不带括号使用，同名的列名会被误判为不确定，只影响是否缓存
+            return False
+    return True
+
+
+def _table_references(query: str) -> List[Tuple[str, Optional[str]]]:
+    """提取查询中 FROM / JOIN 之后引用的 (表名, 别名) 列表"""
+    references = []
+    tokens = tokenize_sql(query)
+    for i, (kind, value) in enumerate(tokens):
+        if kind != "word" or value.upper() not in ("FROM", "JOIN"):
+            continue
+        j = i + 1
+        while j < len(tokens):
+            next_kind, next_value = tokens[j]
+            if next_kind not in ("word", "quoted") or next_value.upper() in SQL_KEYWORDS:
+                break
+            name = next_value.strip("`")
+            # 跳过 schema 前缀，例如 db.table
+            if j + 2 < len(tokens) and tokens[j + 1][1] == "." and tokens[j + 2][0] in ("word", "quoted"):
+                name = tokens[j + 2][1].strip("`")
+                j += 2
+            # 跳过可选的别名（a x / a AS x），FROM a, b 形式时继续读取下一张表
+            alias = None
+            k = j + 1
+            if k < len(tokens) and tokens[k][1].upper() == "AS":
+                k += 1
+            if k < len(tokens) and tokens[k][0] in ("word", "quoted") and tokens[k][1].upper() not in SQL_KEYWORDS:
+                alias = tokens[k][1].strip("`")
+                k += 1
+            references.append((name, alias))
+            if k < len(tokens) and tokens[k][1] == ",":
+                j = k + 1
+                continue
+            break
+    return references
+
+
+def extract_table_names(query: str) -> List[str]:
+    """提取查询中 FROM / JOIN 之后引用的表名（去重并保持出现顺序）"""
+    tables = []
+    for name, _ in _table_references(query):
+        if name not in tables:
+            tables.append(name)
+    return tables
+
+
+def extract_table_aliases(query: str) -> Dict[str, str]:
+    """提取查询中的表别名映射 {别名: 表名}，没有别名的表映射到自身"""
+    aliases = {}
+    for name, alias in _table_references(query):
+        aliases[name] = name
+        if alias is not None:
+            aliases[alias] = name
+    return aliases
+
+
+class QueryAnalysis:
+    """查询语句的分析结果
+
+    Attributes:
+        statement_type: 语句类型（首个关键字，WITH 语句为其主查询的关键字），无法识别时为 None
+        error: 不允许执行的原因，为 None 表示是单条只读查询
+        limit: 顶层 LIMIT 的行数，没有 LIMIT 或行数不是数字字面量时为 None
+        has_limit: 是否有顶层 LIMIT 子句
+        limit_span: 顶层 LIMIT 行数在原文中的位置 (start, end)
+        end: 最后一个有效词法单元的结束位置（去掉末尾的分号和注释）
+    """
+
+    __slots__ = ("statement_type", "error", "limit", "has_limit", "limit_span", "end")
+
+    def __init__(self, statement_type: Optional[str], error: Optional[str], limit: Optional[int] = None,
+                 has_limit: bool = False, limit_span: Optional[Tuple[int, int]] = None, end: int = 0):
+        self.statement_type = statement_type
+        self.error = error
+        self.limit = limit
+        self.has_limit = has_limit
+        self.limit_span = limit_span
+        self.end = end
+
+    @property
+    def is_read(self) -> bool:
+        return self.error is None
+
+    @property
+    def is_select(self) -> bool:
+        """是否为只读的 SELECT / WITH 查询（不包括 SHOW、DESCRIBE、EXPLAIN）"""
+        return self.error is None and self.statement_type == "SELECT"
+
+
+def _statement_type(tokens: List[Tuple[str, str, int, int]]) -> Optional[str]:
+    depth = 0
+    first = None
+    for kind, value, _, _ in tokens:
+        if value == "(":
+            depth += 1
+        elif value == ")":
+            depth -= 1
+        elif kind == "word":
+            word = value.upper()
+            if first is None:
+                first = word
+                if first != "WITH":
+                    return first
+            elif depth == 0 and word in ("SELECT", "INSERT", "UPDATE", "DELETE", "REPLACE", "VALUES", "TABLE"):
+                # WITH 语句跳过公共表表达式，取主查询的关键字
+                return word
+    return first
+
+
+def _comment_error(query: str) -> Optional[str]:
+    """检查 MySQL 会执行的注释：/*! ... */ 可执行注释直接拒绝，/*+ ... */ 优化器提示中不允许出现写操作关键字"""
+    for m in _re_token.finditer(query):
+        if m.lastgroup != "comment":
+            continue
+        comment = m.group()
+        if comment.startswith("/*!"):
+            return "出于安全考虑，不允许使用 MySQL 可执行注释 /*! ... */"
+        if comment.startswith("/*+"):
+            for kind, value, _, _ in _scan_sql(comment[3:-2]):
+                if value == ";" or (kind == "word" and value.upper() in WRITE_KEYWORDS):
+                    return f"出于安全考虑，优化器提示中不允许出现 {value.upper()}"
+    return None
+
+
+def _is_write(tokens: List[Tuple[str, str, int, int]], i: int, statement_type: str, depth: int) -> bool:
+    """第 i 个词法单元（WRITE_KEYWORDS 中的单词）是否为写操作
+
+    AS 之后的别名、t.update 形式的限定名和 REPLACE() 等同名函数不是写操作；
+    select 列表、WHERE 等表达式位置上的 handler、merge 等列名也不是。
+    """
+    previous = tokens[i - 1][1].upper() if i > 0 else None
+    following = tokens[i + 1][1] if i + 1 < len(tokens) else None
+    if previous in ("AS", ".") or following in ("(", "."):
+        return False
+    word = tokens[i][1].upper()
+    if word in CLAUSE_WRITE_KEYWORDS:
+        return True
+    if word == "UPDATE" and previous == "FOR":
+        return True
+    # EXPLAIN 的目标语句前可能有 ANALYZE、FORMAT=JSON 等选项，顶层出现的写操作关键字都视为目标语句
+    return previous in (None, "(", ";") or (statement_type in EXPLAIN_STATEMENTS and depth == 0)
+
+
+def _explain_target(tokens: List[Tuple[str, str, int, int]]) -> Tuple[bool, Optional[int]]:
+    """EXPLAIN 语句的选项中是否有 ANALYZE（会实际执行目标查询），以及目标 SELECT / WITH 在词法单元中的下标"""
+    analyze = False
+    depth = 0
+    for i, (kind, value, _, _) in enumerate(tokens[1:], 1):
+        if value == "(":
+            depth += 1
+        elif value == ")":
+            depth -= 1
+        elif kind == "word":
+            word = value.upper()
+            if word in ("ANALYZE", "ANALYSE"):
+                analyze = True
+            elif depth == 0 and word in ("SELECT", "WITH"):
+                return analyze, i
+    return analyze, None
+
+
+@lru_cache(maxsize=4096)
+def analyze_query(query: str) -> QueryAnalysis:
+    """基于词法单元分析查询语句：语句类型、是否只读、是否包含多条语句以及顶层 LIMIT
+
+    字符串、注释和反引号标识符中的内容不会被当作关键字，create_time、update_by 等列名也不会被误判。
+    MySQL 会执行的可执行注释和优化器提示单独检查。结果按查询文本缓存，重复的查询只需一次字典查找。
+    """
+    tokens = _scan_sql(query)
+    while tokens and tokens[-1][1] == ";":
+        tokens.pop()
+    if not tokens:
+        return QueryAnalysis(None, "查询语句为空")
+    end = tokens[-1][3]
+    statement_type = _statement_type(tokens)
+    if any(value == ";" for _, value, _, _ in tokens):
+        return QueryAnalysis(statement_type, "出于安全考虑，一次只能执行一条SQL语句", end=end)
+    if statement_type not in READ_STATEMENTS:
+        return QueryAnalysis(statement_type, "仅允许执行 SELECT、WITH、SHOW、DESCRIBE 或 EXPLAIN 语句", end=end)
+    comment_error = _comment_error(query)
+    if comment_error is not None:
+        return QueryAnalysis(statement_type, comment_error, end=end)
+
+    depth = 0
+    limit_index = None
+    for i, (kind, value, _, _) in enumerate(tokens):
+        if value == "(":
+            depth += 1
+        elif value == ")":
+            depth -= 1
+        elif kind == "word":
+            word = value.upper()
+            if word in WRITE_KEYWORDS and _is_write(tokens, i, statement_type, depth):
+                return QueryAnalysis(statement_type, f"出于安全考虑，禁止执行数据修改操作的SQL语句（{word}）", end=end)
+            if word == "FOR" and i + 1 < len(tokens) and tokens[i + 1][1].upper() == "SHARE":
+                # FOR UPDATE / LOCK IN SHARE MODE 已被上面的关键字检查拒绝
+                return QueryAnalysis(statement_type, "出于安全考虑，禁止执行加锁读取（FOR SHARE）", end=end)
+            if word == "LIMIT" and depth == 0:
+                limit_index = i
+    if statement_type in EXPLAIN_STATEMENTS:
+        analyze, target = _explain_target(tokens)
+        if analyze and target is None:
+            return QueryAnalysis(statement_type, "EXPLAIN ANALYZE 会实际执行语句，只允许分析 SELECT 或 WITH 查询", end=end)
+
+    if limit_index is None:
+        return QueryAnalysis(statement_type, None, end=end)
+    # LIMIT n / LIMIT offset, n / LIMIT n OFFSET m
+    count_index = limit_index + 1
+    if count_index + 2 < len(tokens) and tokens[count_index + 1][1] == ",":
+        count_index += 2
+    if count_index >= len(tokens) or tokens[count_index][0] != "number":
+        return QueryAnalysis(statement_type, None, has_limit=True, end=end)
+    _, value, start, stop = tokens[count_index]
+    try:
+        limit = int(value)
+    except ValueError:
+        return QueryAnalysis(statement_type, None, has_limit=True, end=end)
+    return QueryAnalysis(statement_type, None, limit, True, (start, stop), end)
+
+
+@lru_cache(maxsize=4096)
+def apply_limit(query: str, max_rows: int) -> str:
+    """在查询的顶层注入 LIMIT，已有的 LIMIT 超过 max_rows 时收紧为 max_rows
+
+    只处理 analyze_query 判定为只读的单条 SELECT / WITH 查询，加锁读取已被拒绝，LIMIT 总是位于语句末尾；
+    末尾的分号和注释会被去掉，避免注入的 LIMIT 被注释掉。SHOW、DESCRIBE、EXPLAIN 语句不注入 LIMIT。
+    """
+    analysis = analyze_query(query)
+    if analysis.error is not None:
+        return query
+    if not analysis.is_select:
+        return query[:analysis.end]
+    if not analysis.has_limit:
+        return f"{query[:analysis.end]} LIMIT {max_rows}"
+    if analysis.limit is not None and analysis.limit > max_rows:
+        start, stop = analysis.limit_span
+        return f"{query[:start]}{max_rows}{query[stop:analysis.end]}"
+    return query[:analysis.end]
+
+
+@lru_cache(maxsize=4096)
+def executed_select(query: str) -> Optional[str]:
+    """查询实际执行的 SELECT / WITH 语句，用于执行前的成本检查
+
+    SELECT / WITH 查询是其本身；EXPLAIN ANALYZE 会实际执行被分析的查询，返回该查询；
+    SHOW、DESCRIBE 和不带 ANALYZE 的 EXPLAIN 不执行查询，返回 None。
+    """
+    analysis = analyze_query(query)
+    if analysis.is_select:
+        return query[:analysis.end]
+    if analysis.error is not None or analysis.statement_type not in EXPLAIN_STATEMENTS:
+        return None
+    tokens = _scan_sql(query[:analysis.end])
+    analyze, target = _explain_target(tokens)
+    return query[tokens[target][2]:analysis.end] if analyze else None
+
+
+@lru_cache(maxsize=4096)
+def estimate_row_cap(query: str) -> Optional[int]:
+    """查询最多需要处理的行数，用于截断 EXPLAIN 按表行数得出的估算，无法确定时返回 None
+
+    不含 GROUP BY 的单表聚合查询只输出一行；顶层没有 ORDER BY、GROUP BY、DISTINCT 等子句时，
+    读到 LIMIT（加上 OFFSET）行即可结束。
+    """
+    analysis = analyze_query(query)
+    if not analysis.is_select:
+        return None
+    tokens = _scan_sql(query[:analysis.end])
+    depth = 0
+    select_index = None
+    in_select_list = False
+    aggregate = False
+    blocking = False
+    limit_index = None
+    for i, (kind, value, _, _) in enumerate(tokens):
+        if value == "(":
+            depth += 1
+        elif value == ")":
+            depth -= 1
+        elif kind == "word" and depth == 0:
+            word = value.upper()
+            if word == "SELECT" and select_index is None:
+                select_index = i
+                in_select_list = True
+            elif word == "FROM":
+                in_select_list = False
+            elif word in BLOCKING_KEYWORDS:
+                blocking = True
+            elif word == "LIMIT":
+                limit_index = i
+            if in_select_list and word in AGGREGATE_FUNCTIONS and i + 1 < len(tokens) and tokens[i + 1][1] == "(":
+                aggregate = True
+
+    words = {value.upper() for kind, value, _, _ in tokens if kind == "word"}
+    if aggregate and not words & {"GROUP", "UNION", "INTERSECT", "EXCEPT"} and len(extract_table_names(query)) == 1:
+        return 1
+    if blocking or analysis.limit is None:
+        return None
+    # LIMIT offset, n / LIMIT n OFFSET m 需要先跳过 offset 行
+    offset = "0"
+    if tokens[limit_index + 2:limit_index + 3] and tokens[limit_index + 2][1] == ",":
+        offset = tokens[limit_index + 1][1]
+    elif tokens[limit_index + 2:limit_index + 3] and tokens[limit_index + 2][1].upper() == "OFFSET":
+        offset = tokens[limit_index + 3][1] if limit_index + 3 < len(tokens) else ""
+    return analysis.limit + int(offset) if offset.isdigit() else None
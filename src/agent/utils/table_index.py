@@ -0,0 +1,163 @@
+import math
+import re
+import threading
+from collections import Counter
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+import numpy as np
+
+_re_word = re.compile(r"[A-Za-z]+|\d+|[\u4e00-\u9fff]+")
+_re_camel = re.compile(r"(?<=[a-z])(?=[A-Z])")
+
+# 表名、表注释、列名、列注释在文档中的权重（通过重复词项实现）
+TABLE_NAME_WEIGHT = 3
+TABLE_COMMENT_WEIGHT = 2
+COLUMN_WEIGHT = 1
+
+
+def tokenize_text(value: Optional[str]) -> List[str]:
+    """将标识符或自然语言拆分为检索词项
+
+    英文标识符按下划线、驼峰拆分并转为小写；中文没有分词器，使用单字加相邻双字（bigram）。
+    """
+    if not value:
+        return []
+    tokens = []
+    for word in _re_word.findall(_re_camel.sub(" ", str(value))):
+        if "\u4e00" <= word[0] <= "\u9fff":
+            tokens.extend(word)
+            tokens.extend(word[i:i + 2] for i in range(len(word) - 1))
+        else:
+            tokens.append(word.lower())
+    return tokens
+
+
+def table_document(metadata: Dict[str, Any], comment: Optional[str] = None) -> List[str]:
+    """根据表的结构化元数据生成检索文档的词项列表"""
+    tokens = tokenize_text(metadata["table_name"]) * TABLE_NAME_WEIGHT
+    tokens += tokenize_text(comment) * TABLE_COMMENT_WEIGHT
+    for column in metadata["columns"]:
+        tokens += tokenize_text(column["name"]) * COLUMN_WEIGHT
+        tokens += tokenize_text(column.get("comment")) * COLUMN_WEIGHT
+    return tokens
+
+
+class TableRelevanceIndex:
+    """基于 BM25 的表检索索引
+
+    每张表对应一篇文档，文档带有版本号，update 时只重建版本发生变化的表，
+    删除的表从索引中移除。打分时使用 NumPy 在倒排表上做向量化累加。
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.RLock()
+        self._slots: Dict[str, int] = {}
+        self._names: List[Optional[str]] = []
+        self._free_slots: List[int] = []
+        self._doc_len = np.zeros(0, dtype=np.float64)
+        self._doc_terms: Dict[int, Counter] = {}
+        self._versions: Dict[str, Hashable] = {}
+        # 倒排表：词项 -> {文档槽位: 词频}
+        self._postings: Dict[str, Dict[int, int]] = {}
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def version_of(self, table_name: str) -> Hashable:
+        return self._versions.get(table_name)
+
+    def _remove(self, table_name: str) -> None:
+        slot = self._slots.pop(table_name)
+        for term in self._doc_terms.pop(slot):
+            postings = self._postings[term]
+            del postings[slot]
+            if not postings:
+                del self._postings[term]
+        self._names[slot] = None
+        self._doc_len[slot] = 0
+        self._free_slots.append(slot)
+        self._versions.pop(table_name, None)
+
+    def _add(self, table_name: str, tokens: List[str], version: Hashable) -> None:
+        if self._free_slots:
+            slot = self._free_slots.pop()
+        else:
+            slot = len(self._names)
+            self._names.append(None)
+            if slot >= len(self._doc_len):
+                # 按倍数扩容，避免逐个追加时反复复制数组
+                self._doc_len = np.concatenate([self._doc_len, np.zeros(max(16, len(self._doc_len)))])
+        terms = Counter(tokens)
+        self._slots[table_name] = slot
+        self._names[slot] = table_name
+        self._doc_len[slot] = len(tokens)
+        self._doc_terms[slot] = terms
+        self._versions[table_name] = version
+        for term, tf in terms.items():
+            self._postings.setdefault(term, {})[slot] = tf
+
+    def update(self, documents: Dict[str, Tuple[Hashable, List[str]]]) -> int:
+        """增量更新索引
+
+        Args:
+            documents: 表名 -> (版本号, 词项列表)，未出现在其中的表会被移除
+
+        Returns:
+            本次新增或重建的表数量
+        """
+        with self._lock:
+            for table_name in [name for name in self._slots if name not in documents]:
+                self._remove(table_name)
+            changed = 0
+            for table_name, (version, tokens) in documents.items():
+                if table_name in self._slots:
+                    if self._versions.get(table_name) == version:
+                        continue
+                    self._remove(table_name)
+                self._add(table_name, tokens, version)
+                changed += 1
+            return changed
+
+    def search(self, query: str, top_k: int = 5) -> List[Tuple[str, float]]:
+        """检索与问题最相关的表，返回 (表名, 分数) 列表，按分数从高到低排列"""
+        if top_k <= 0:
+            return []
+        terms = set(tokenize_text(query))
+        with self._lock:
+            doc_count = len(self._slots)
+            if not doc_count or not terms:
+                return []
+            avg_len = float(self._doc_len.sum()) / doc_count
+            scores = np.zeros(len(self._doc_len), dtype=np.float64)
+            for term in terms:
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                slots = np.fromiter(postings.keys(), dtype=np.int64, count=len(postings))
+                tf = np.fromiter(postings.values(), dtype=np.float64, count=len(postings))
+                idf = math.log(1 + (doc_count - len(postings) + 0.5) / (len(postings) + 0.5))
+                norm = self.k1 * (1 - self.b + self.b * self._doc_len[slots] / avg_len)
+                scores[slots] += idf * tf * (self.k1 + 1) / (tf + norm)
+
+            candidates = np.flatnonzero(scores > 0)
+            if candidates.size > top_k:
+                candidates = candidates[np.argpartition(-scores[candidates], top_k - 1)[:top_k]]
+            ranked = sorted(candidates, key=lambda slot: -scores[slot])
+            return [(self._names[slot], float(scores[slot])) for slot in ranked]
+
+
+# 进程级索引注册表：相同连接串的数据库管理器共享同一个索引
+_table_indexes: Dict[str, TableRelevanceIndex] = {}
+_registry_lock = threading.Lock()
+
+
+def get_table_index(connection: str) -> TableRelevanceIndex:
+    """获取（或创建）指定连接串对应的进程级表检索索引"""
+    with _registry_lock:
+        index = _table_indexes.get(connection)
+        if index is None:
+            index = TableRelevanceIndex()
+            _table_indexes[connection] = index
+        return index
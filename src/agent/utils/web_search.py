@@ -0,0 +1,364 @@
+import hashlib
+import math
+import random
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from agent.utils.log_utils import log
+from agent.utils.perf_utils import metrics
+
+# 搜索后端：输入查询字符串和请求超时时间（秒，关键字参数 timeout），返回结果列表，
+# 每条结果是包含 title、link、content 的字典；超过 timeout 时应放弃请求并抛出异常，以免长期占用线程池
+SearchBackend = Callable[..., List[Dict[str, str]]]
+
+_re_space = re.compile(r"\s+")
+
+
+def normalize_query(query: str) -> str:
+    """规范化查询字符串：合并空白并转为小写，只在空白和大小写上不同的查询视为同一个"""
+    return _re_space.sub(" ", query).strip().casefold()
+
+
+def zhipuai_search_backend(client=None, search_engine: str = "search_pro") -> SearchBackend:
+    """智谱 web_search 接口的搜索后端，client 为 None 时在第一次搜索时使用 agent.my_llm.zhipuai_client"""
+
+    def search(query: str, timeout: Optional[float] = None) -> List[Dict[str, str]]:
+        nonlocal client
+        if client is None:
+            from agent.my_llm import zhipuai_client
+            client = zhipuai_client
+        # 请求超时由 HTTP 客户端执行，超时的调用会结束并释放线程池中的线程
+        kwargs = {"timeout": timeout} if timeout is not None else {}
+        resp = client.web_search.web_search(search_engine=search_engine, search_query=query, **kwargs)
+        return [{"title": getattr(d, "title", None) or "", "link": getattr(d, "link", None) or "",
+                 "content": d.content or ""} for d in resp.search_result or []]
+
+    return search
+
+
+def _is_timeout(error: BaseException) -> bool:
+    # 后端的请求超时：TimeoutError、httpx.TimeoutException、zhipuai 的 APITimeoutError 等
+    return isinstance(error, TimeoutError) or "Timeout" in type(error).__name__
+
+
+class FakeSearchBackend:
+    """离线的模拟搜索后端，用于在没有网络的环境中压测延迟和缓存命中率
+
+    每次搜索按固定延迟（加随机抖动）返回 results_per_query 条由查询决定的结果；
+    结果从 corpus_size 篇模拟文档中选取，不同查询的结果会有重叠，用于检验合并去重。
+    延迟超过请求超时时间时与真实的 HTTP 客户端一样在超时后抛出 TimeoutError。
+    """
+
+    def __init__(self, latency: float = 0.3, jitter: float = 0.0, results_per_query: int = 5,
+                 corpus_size: int = 200, error_rate: float = 0.0, seed: int = 42):
+        self.latency = latency
+        self.jitter = jitter
+        self.results_per_query = results_per_query
+        self.corpus_size = corpus_size
+        self.error_rate = error_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.active = 0
+        self.max_active = 0
+
+    def __call__(self, query: str, timeout: Optional[float] = None) -> List[Dict[str, str]]:
+        with self._lock:
+            self.calls += 1
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+            delay = self.latency + self._random.uniform(0, self.jitter)
+            failed = self._random.random() < self.error_rate
+        try:
+            if timeout is not None and delay > timeout:
+                time.sleep(timeout)
+                raise TimeoutError(f"模拟搜索超时: {query}")
+            time.sleep(delay)
+            if failed:
+                raise ConnectionError(f"模拟搜索失败: {query}")
+            # 按查询中的词选择文档，共享词的查询返回部分相同的文档
+            words = normalize_query(query).split() or [""]
+            results = []
+            for i in range(self.results_per_query):
+                word = words[i % len(words)]
+                doc = int(hashlib.md5(f"{word}:{i // len(words)}".encode("utf-8")).hexdigest(), 16) \
+                    % self.corpus_size
+                results.append({"title": f"文档 {doc}", "link": f"https://example.com/doc/{doc}",
+                                "content": f"文档 {doc} 的摘要，与“{word}”相关。"})
+            return results
+        finally:
+            with self._lock:
+                self.active -= 1
+
+
+class SearchBatch:
+    """一次批量搜索的结果：合并去重后的结果、每个查询的原始结果和结果数、出错和超时的查询"""
+
+    def __init__(self, queries: List[str]):
+        self.queries = queries
+        self.results: List[Dict[str, Any]] = []
+        self.per_query: Dict[str, List[Dict[str, str]]] = {}
+        self.counts: Dict[str, int] = {}
+        self.errors: Dict[str, str] = {}
+        self.timed_out: List[str] = []
+        self.cache_hits = 0
+
+
+class WebSearcher:
+    """带缓存的并行搜索
+
+    一批查询先规范化去重，命中缓存的直接返回，其余提交到容量为 max_workers 的线程池并行执行，
+    每个调用从开始执行起最多等待 timeout 秒，超时的查询在结果中标记；timeout 同时作为请求超时传给后端，
+    卡住的调用最多占用线程 timeout 秒，不会长期占满线程池。
+    同一查询正在执行时，其他请求等待同一个调用而不是重复发起。成功的结果按 LRU 缓存 cache_ttl 秒。
+    """
+
+    def __init__(self, backend: SearchBackend, max_workers: int = 4, timeout: float = 10.0,
+                 cache_ttl: Optional[float] = 600.0, cache_size: int = 512):
+        """初始化搜索
+
+        Args:
+            backend: 搜索后端，参见 SearchBackend
+            max_workers: 同时进行的搜索调用数上限
+            timeout: 单个搜索调用的超时时间（秒）
+            cache_ttl: 结果的缓存时间（秒），None 或 0 表示不缓存
+            cache_size: 最多缓存的查询数，超出时淘汰最久未使用的条目
+        """
+        self.backend = backend
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.cache_ttl = cache_ttl
+        self.cache_size = cache_size
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="web-search")
+        self._lock = threading.Lock()
+        self._cache: "OrderedDict[str, Tuple[List[Dict[str, str]], float]]" = OrderedDict()
+        self._inflight: Dict[str, Future] = {}
+        # 调用开始执行的时间，排队中的调用不计入超时
+        self._started: Dict[Future, float] = {}
+        self.hits = 0
+        self.misses = 0
+        self.calls = 0
+
+    def _cache_get(self, key: str) -> Optional[List[Dict[str, str]]]:
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is not None and entry[1] < time.time():
+                del self._cache[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._cache.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def _cache_put(self, key: str, results: List[Dict[str, str]]) -> None:
+        if not self.cache_ttl:
+            return
+        with self._lock:
+            self._cache[key] = (results, time.time() + self.cache_ttl)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def _call(self, key: str, query: str, future: Future) -> List[Dict[str, str]]:
+        with self._lock:
+            self._started[future] = time.monotonic()
+        start = time.perf_counter()
+        try:
+            results = self.backend(query, timeout=self.timeout)
+        except Exception as e:
+            metrics.inc("agent_web_search_calls_total", result="timeout" if _is_timeout(e) else "error")
+            raise
+        else:
+            metrics.inc("agent_web_search_calls_total", result="ok")
+            # 先写缓存再移出进行中的调用，之后到达的请求总能命中其中之一
+            self._cache_put(key, results)
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+                self._started.pop(future, None)
+            metrics.observe("agent_web_search_seconds", time.perf_counter() - start)
+        return results
+
+    def _submit(self, key: str, query: str) -> Future:
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is None:
+                future = Future()
+                self._inflight[key] = future
+                self.calls += 1
+                submit = True
+            else:
+                submit = False
+        if submit:
+            def run():
+                if not future.set_running_or_notify_cancel():
+                    return
+                try:
+                    future.set_result(self._call(key, query, future))
+                except BaseException as e:
+                    future.set_exception(e)
+
+            self._executor.submit(run)
+        return future
+
+    def _wait(self, futures: Dict[Future, str]) -> Tuple[Dict[str, List[Dict[str, str]]], Dict[str, str], List[str]]:
+        """等待全部调用完成或超时；排队中的调用最多等待 timeout × 排队的轮数"""
+        results, errors, timed_out = {}, {}, []
+        pending = set(futures)
+        queue_deadline = time.monotonic() + self.timeout * math.ceil(len(futures) / self.max_workers)
+        while pending:
+            now = time.monotonic()
+            with self._lock:
+                deadlines = {f: self._started[f] + self.timeout if f in self._started else queue_deadline
+                             for f in pending}
+            expired = {f for f in pending if deadlines[f] <= now and not f.done()}
+            # 调用本身结束时由 _call 计入 agent_web_search_calls_total，这里不重复计数
+            for future in expired:
+                timed_out.append(futures[future])
+            pending -= expired
+            if not pending:
+                break
+            done, pending = wait(pending, timeout=max(min(deadlines[f] for f in pending) - now, 0.001),
+                                 return_when=FIRST_COMPLETED)
+            for future in done:
+                query = futures[future]
+                try:
+                    results[query] = future.result()
+                except Exception as e:
+                    if _is_timeout(e):
+                        timed_out.append(query)
+                        continue
+                    log.warning(f"搜索“{query}”失败: {e}")
+                    errors[query] = str(e)
+        return results, errors, timed_out
+
+    def search(self, query: str) -> List[Dict[str, str]]:
+        """搜索单个查询，返回后端的原始结果列表，出错或超时时抛出异常"""
+        batch = self.search_many([query])
+        if batch.errors:
+            raise RuntimeError(next(iter(batch.errors.values())))
+        if batch.timed_out:
+            raise TimeoutError(f"搜索超时（{self.timeout} 秒）")
+        return batch.per_query.get(batch.queries[0], []) if batch.queries else []
+
+    def search_many(self, queries: List[str]) -> SearchBatch:
+        """并行搜索多个查询，合并结果并按链接和内容去重"""
+        unique: Dict[str, str] = {}
+        for query in queries:
+            if query and query.strip():
+                unique.setdefault(normalize_query(query), query.strip())
+        batch = SearchBatch(list(unique.values()))
+        per_query: Dict[str, List[Dict[str, str]]] = {}
+        futures: Dict[Future, str] = {}
+        for key, query in unique.items():
+            cached = self._cache_get(key)
+            if cached is not None:
+                per_query[query] = cached
+                batch.cache_hits += 1
+            else:
+                futures[self._submit(key, query)] = query
+        if futures:
+            results, errors, timed_out = self._wait(futures)
+            per_query.update(results)
+            batch.errors = {query: errors[query] for query in batch.queries if query in errors}
+            batch.timed_out = [query for query in batch.queries if query in timed_out]
+        metrics.inc("agent_web_search_cache_total", len(unique) - len(futures), result="hit")
+        metrics.inc("agent_web_search_cache_total", len(futures), result="miss")
+        batch.per_query = per_query
+        batch.results = merge_results(batch.queries, per_query)
+        batch.counts = {query: len(per_query.get(query, [])) for query in batch.queries}
+        return batch
+
+    def clear(self) -> None:
+        with self._lock:
+            self._cache.clear()
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._cache),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "calls": self.calls,
+                "inflight": len(self._inflight),
+            }
+
+
+def _content_key(content: str) -> str:
+    return _re_space.sub(" ", content).strip()[:200]
+
+
+def merge_results(queries: List[str], per_query: Dict[str, List[Dict[str, str]]]) -> List[Dict[str, Any]]:
+    """按查询顺序轮流取各查询的结果合并，链接或内容相同的结果只保留第一条，并记录它对应的查询"""
+    merged: List[Dict[str, Any]] = []
+    seen: Dict[str, Dict[str, Any]] = {}
+    lists = [(query, per_query.get(query) or []) for query in queries]
+    for i in range(max((len(results) for _, results in lists), default=0)):
+        for query, results in lists:
+            if i >= len(results):
+                continue
+            result = results[i]
+            keys = [key for key in (result.get("link"), _content_key(result.get("content") or "")) if key]
+            existing = next((seen[key] for key in keys if key in seen), None)
+            if existing is not None:
+                if query not in existing["queries"]:
+                    existing["queries"].append(query)
+                continue
+            item = {**result, "queries": [query]}
+            merged.append(item)
+            for key in keys:
+                seen[key] = item
+    return merged
+
+
+def format_search_batch(batch: SearchBatch) -> str:
+    """把搜索结果渲染为提供给大模型的文本
+
+    单个查询时与原来的格式一致（每条结果的内容占一行）；多个查询时每条结果标注标题、链接和对应的查询。
+    """
+    notes = [f"搜索“{query}”出错: {error}" for query, error in batch.errors.items()]
+    notes += [f"搜索“{query}”超时，未返回结果" for query in batch.timed_out]
+    if len(batch.queries) <= 1:
+        lines = [result["content"] for result in batch.results]
+    else:
+        lines = [f"共搜索 {len(batch.queries)} 个查询，合并去重后 {len(batch.results)} 条结果"]
+        for i, result in enumerate(batch.results, 1):
+            title = result.get("title") or "无标题"
+            link = f" {result['link']}" if result.get("link") else ""
+            lines.append(f"[{i}] {title}{link}（查询: {'；'.join(result['queries'])}）\n{result['content']}")
+    if not batch.results:
+        lines.append("未找到相关搜索结果。")
+    return "\n".join(notes + lines)
+
+
+_registry_lock = threading.Lock()
+_searcher: Optional[WebSearcher] = None
+
+
+def get_web_searcher() -> WebSearcher:
+    """获取进程级的搜索实例，后端和参数来自环境变量 WEB_SEARCH_*"""
+    global _searcher
+    from agent.env_utils import (
+        WEB_SEARCH_BACKEND,
+        WEB_SEARCH_CACHE_TTL,
+        WEB_SEARCH_TIMEOUT,
+        WEB_SEARCH_WORKERS,
+    )
+
+    with _registry_lock:
+        if _searcher is None:
+            backend = FakeSearchBackend() if WEB_SEARCH_BACKEND == "fake" else zhipuai_search_backend()
+            _searcher = WebSearcher(backend, max_workers=WEB_SEARCH_WORKERS, timeout=WEB_SEARCH_TIMEOUT,
+                                    cache_ttl=WEB_SEARCH_CACHE_TTL)
+        return _searcher
@@ -0,0 +1,8 @@
+import os
+import sys
+
+# 与 benchmarks 相同，测试直接从源码目录导入 agent 包，并复用 benchmarks.fixtures 中的测试库
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (os.path.join(ROOT, "src"), ROOT):
+    if path not in sys.path:
+        sys.path.insert(0, path)
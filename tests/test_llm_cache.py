@@ -0,0 +1,89 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+from agent.utils.llm_cache import CachedChatModel, LLMResponseCache, StubChatModel
+from benchmarks.fake_models import ScriptedChatModel
+
+
+def _cached(model, **kwargs):
+    return CachedChatModel(model=model, response_cache=LLMResponseCache(**kwargs))
+
+
+def test_identical_request_is_served_from_cache():
+    stub = StubChatModel()
+    model = _cached(stub)
+    first = model.invoke([HumanMessage("t_0001 表有多少条记录")])
+    second = model.invoke([HumanMessage("t_0001 表有多少条记录")])
+    assert stub.calls == 1
+    assert second.content == first.content
+    assert second.response_metadata["llm_cache"] == "hit"
+    assert second.usage_metadata["total_tokens"] == 0
+    model.invoke([HumanMessage("t_0002 表有多少条记录")])
+    assert stub.calls == 2
+
+
+def test_cache_file_is_shared_between_instances(tmp_path):
+    path = str(tmp_path / "llm_cache.db")
+    stub = StubChatModel()
+    _cached(stub, path=path).invoke([HumanMessage("列出所有表")])
+    reply = _cached(stub, path=path).invoke([HumanMessage("列出所有表")])
+    assert stub.calls == 1
+    assert reply.response_metadata["llm_cache"] == "hit"
+
+
+def test_concurrent_identical_requests_are_coalesced():
+    stub = StubChatModel(latency=0.2)
+    model = CachedChatModel(model=stub)
+    with ThreadPoolExecutor(max_workers=5) as executor:
+        replies = list(executor.map(lambda _: model.invoke([HumanMessage("统计每个部门的人数")]), range(5)))
+    assert stub.calls == 1
+    assert model.stats()["coalesced"] == 4
+    assert sorted(reply.response_metadata.get("llm_cache", "miss") for reply in replies) == ["coalesced"] * 4 + ["miss"]
+    assert len({reply.content for reply in replies}) == 1
+
+
+def test_concurrent_identical_async_requests_are_coalesced():
+    stub = StubChatModel(latency=0.2)
+    model = CachedChatModel(model=stub)
+
+    async def ask():
+        return await asyncio.gather(*(model.ainvoke([HumanMessage("统计每个部门的人数")]) for _ in range(5)))
+
+    replies = asyncio.run(ask())
+    assert stub.calls == 1
+    assert model.stats()["coalesced"] == 4
+    assert model.stats()["inflight"] == 0
+    assert len({reply.content for reply in replies}) == 1
+
+
+def test_replayed_tool_calls_get_fresh_ids():
+    question = "t_0001 表有多少条记录"
+    scripted = ScriptedChatModel(script={question: [("sql_db_query", {"query": "SELECT count(*) FROM t_0001"})]})
+    model = _cached(scripted)
+    first = model.invoke([HumanMessage(question)])
+    second = model.invoke([HumanMessage(question)])
+    assert scripted.calls == 1
+    assert second.response_metadata["llm_cache"] == "hit"
+    assert [call["args"] for call in second.tool_calls] == [call["args"] for call in first.tool_calls]
+    assert second.tool_calls[0]["id"] != first.tool_calls[0]["id"]
+    third = model.invoke([HumanMessage(question)])
+    assert third.tool_calls[0]["id"] not in (first.tool_calls[0]["id"], second.tool_calls[0]["id"])
+
+
+def test_replayed_provider_tool_calls_use_the_same_fresh_ids():
+    message = AIMessage(
+        content="",
+        tool_calls=[{"name": "sql_db_query", "args": {"query": "SELECT 1"}, "id": "call_original"}],
+        additional_kwargs={"tool_calls": [{
+            "id": "call_original",
+            "type": "function",
+            "function": {"name": "sql_db_query", "arguments": '{"query": "SELECT 1"}'},
+        }]},
+    )
+    reply = CachedChatModel._reused(message, "hit").generations[0].message
+    new_id = reply.tool_calls[0]["id"]
+    assert new_id != "call_original"
+    assert reply.additional_kwargs["tool_calls"][0]["id"] == new_id
+    assert message.tool_calls[0]["id"] == "call_original"
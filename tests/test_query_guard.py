@@ -0,0 +1,70 @@
+import time
+
+import pytest
+
+from agent.utils.db_options import GuardOptions
+from agent.utils.db_utils import MySQLDataBaseManager
+from benchmarks.fixtures import create_sqlite_fixture
+
+ROWS = 20000
+# 两张表的笛卡尔积：估算约 4 亿行，实际执行需要数秒
+EXPENSIVE_QUERY = "SELECT count(*) FROM t_0000 a CROSS JOIN t_0001 b WHERE a.name <> b.name"
+
+
+@pytest.fixture(scope="module")
+def connection(tmp_path_factory):
+    return create_sqlite_fixture(2, rows_per_table=ROWS, path=str(tmp_path_factory.mktemp("guard") / "guard.db"))
+
+
+def _manager(connection, **guard):
+    return MySQLDataBaseManager(connection, guard=GuardOptions(**guard))
+
+
+def test_reject_mode_refuses_expensive_query_without_running_it(connection):
+    manager = _manager(connection, cost_guard="reject", max_estimated_rows=100_000)
+    start = time.perf_counter()
+    with pytest.raises(ValueError, match="查询成本过高"):
+        manager.execute_query(EXPENSIVE_QUERY)
+    assert time.perf_counter() - start < 1.0
+
+
+def test_warn_mode_runs_query_and_prepends_hint(connection):
+    manager = _manager(connection, cost_guard="warn", max_estimated_rows=1000)
+    result = manager.execute_query("SELECT name FROM t_0000 WHERE status = '1' ORDER BY name LIMIT 3")
+    assert result.startswith("（注意：执行计划估算需要处理约 20,000 行")
+    assert "name_" in result
+
+
+@pytest.mark.parametrize("query", [
+    "SELECT name FROM t_0000 LIMIT 5",
+    "SELECT count(*) FROM t_0000",
+    "SELECT sum(amount) FROM t_0000 WHERE status = '1'",
+])
+def test_limit_and_single_table_aggregate_are_not_counted_as_full_scans(connection, query):
+    manager = _manager(connection, cost_guard="reject", max_estimated_rows=1000)
+    assert manager.get_query_plan(query)["estimated_rows"] <= 5
+    assert manager.execute_query(query)
+
+
+def test_explain_analyze_is_guarded_like_its_select(connection):
+    manager = _manager(connection, cost_guard="reject", max_estimated_rows=100_000)
+    # SQLite 不支持 EXPLAIN ANALYZE，但成本检查在执行前就会拒绝被分析的查询
+    with pytest.raises(ValueError, match="查询成本过高"):
+        manager.execute_query(f"EXPLAIN ANALYZE {EXPENSIVE_QUERY}")
+    with pytest.raises(ValueError, match="只允许分析 SELECT"):
+        manager.execute_query("EXPLAIN ANALYZE TABLE t_0000")
+
+
+def test_statement_timeout_interrupts_expensive_query(connection):
+    manager = _manager(connection, statement_timeout=0.3)
+    start = time.perf_counter()
+    with pytest.raises(ValueError, match="已被取消"):
+        manager.execute_query(EXPENSIVE_QUERY)
+    assert time.perf_counter() - start < 2.0
+    # 被中断的连接归还连接池后可以继续使用
+    assert manager.execute_query("SELECT count(*) FROM t_0001 WHERE id < 100") == "(99,)"
+
+
+def test_unknown_cost_guard_mode_is_rejected():
+    with pytest.raises(ValueError, match="不支持的成本检查模式"):
+        GuardOptions(cost_guard="block")
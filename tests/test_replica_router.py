@@ -0,0 +1,63 @@
+import asyncio
+import shutil
+import sqlite3
+
+import pytest
+from sqlalchemy import create_engine, event
+
+from agent.utils.db_options import RoutingOptions
+from agent.utils.db_utils import MySQLDataBaseManager
+from benchmarks.fixtures import create_sqlite_fixture
+
+
+@pytest.fixture
+def manager(tmp_path):
+    primary = create_sqlite_fixture(2, rows_per_table=10, path=str(tmp_path / "primary.db"))
+    replicas = []
+    for i in range(2):
+        path = tmp_path / f"replica_{i}.db"
+        shutil.copy(tmp_path / "primary.db", path)
+        replicas.append(f"sqlite:///file:{path}?mode=ro&uri=true")
+    manager = MySQLDataBaseManager(primary, routing=RoutingOptions(replicas, check_interval=None))
+    yield manager
+    asyncio.run(manager.aclose())
+
+
+def _break_first_replica(manager):
+    """让第一个副本（同步和异步引擎）执行语句时失败并被判定为连接断开，同时保证它是下一个被选中的副本"""
+    broken, healthy = manager.router.replicas
+
+    def disconnect(*args):
+        raise sqlite3.OperationalError("disk I/O error")
+
+    for engine in (broken.engine, broken.async_engine.sync_engine):
+        engine.dialect.is_disconnect = lambda error, connection, cursor: True
+        event.listen(engine, "before_cursor_execute", disconnect)
+    broken.outstanding = 0
+    healthy.outstanding = 5
+    return broken, healthy
+
+
+def test_read_query_is_retried_on_a_healthy_node_after_disconnect(manager):
+    broken, healthy = _break_first_replica(manager)
+    assert manager.execute_query("SELECT count(*) FROM t_0000") == "(10,)"
+    assert not broken.healthy
+    assert healthy.healthy
+    stats = {node["name"]: node for node in manager.get_replica_stats()}
+    assert stats[healthy.name]["requests"] >= 1
+
+
+def test_async_read_query_is_retried_on_a_healthy_node_after_disconnect(manager):
+    broken, healthy = _break_first_replica(manager)
+    assert asyncio.run(manager.aexecute_query("SELECT count(*) FROM t_0001")) == "(10,)"
+    assert not broken.healthy
+
+
+def test_connections_are_mapped_to_their_node_by_engine(manager):
+    with manager._connect() as get_connection:
+        connection = get_connection()
+        node = manager.router.node_for_engine(connection.engine)
+        assert node.role == "replica"
+        assert manager._kill_engine(connection) is node.engine
+    with pytest.raises(ValueError):
+        manager.router.node_for_engine(create_engine("sqlite://"))
@@ -0,0 +1,65 @@
+import pytest
+from sqlalchemy import create_engine, text
+
+from agent.utils.db_utils import MySQLDataBaseManager
+from agent.utils.format_utils import SCHEMA_FORMATS
+from benchmarks.fixtures import count_round_trips, create_sqlite_fixture
+
+
+@pytest.fixture
+def connection(tmp_path):
+    connection = create_sqlite_fixture(12, path=str(tmp_path / "schema.db"))
+    # 在基础测试库之外补充联合主键、唯一约束、多列外键和列默认值，覆盖批量读取的各个分支
+    engine = create_engine(connection)
+    with engine.begin() as conn:
+        conn.execute(text("""
+            CREATE TABLE order_item (
+                order_id INTEGER NOT NULL,
+                line_no INTEGER NOT NULL,
+                sku VARCHAR(32) NOT NULL UNIQUE,
+                quantity INTEGER DEFAULT 1,
+                PRIMARY KEY (order_id, line_no)
+            )
+        """))
+        conn.execute(text("""
+            CREATE TABLE order_item_note (
+                id INTEGER PRIMARY KEY,
+                order_id INTEGER,
+                line_no INTEGER,
+                note TEXT,
+                FOREIGN KEY (order_id, line_no) REFERENCES order_item (order_id, line_no)
+            )
+        """))
+        conn.execute(text("CREATE INDEX ix_note_order ON order_item_note (order_id, line_no)"))
+    engine.dispose()
+    return connection
+
+
+def _schema(connection, bulk, table_names, output_format):
+    manager = MySQLDataBaseManager(connection, bulk_introspection=bulk)
+    # 两种模式共享同一个进程级表结构缓存，读取前先清空
+    manager.schema_cache.invalidate()
+    try:
+        return manager.get_table_schema(table_names, output_format)
+    finally:
+        manager.engine.dispose()
+
+
+@pytest.mark.parametrize("output_format", SCHEMA_FORMATS)
+@pytest.mark.parametrize("table_names", [None, ["order_item", "t_0003", "order_item_note"]])
+def test_bulk_introspection_matches_inspector(connection, table_names, output_format):
+    bulk = _schema(connection, True, table_names, output_format)
+    inspector = _schema(connection, False, table_names, output_format)
+    assert bulk == inspector
+    assert "order_item_note" in bulk
+
+
+def test_bulk_introspection_uses_fixed_round_trips(tmp_path):
+    round_trips = []
+    for table_count in (5, 50):
+        manager = MySQLDataBaseManager(create_sqlite_fixture(table_count, path=str(tmp_path / f"{table_count}.db")))
+        with count_round_trips(manager.engine) as counter:
+            manager.get_table_schema(None)
+        manager.engine.dispose()
+        round_trips.append(counter.count)
+    assert round_trips[0] == round_trips[1]